@@ -9,8 +9,10 @@ from groq import Groq
 import os
 import json
 from datetime import datetime, timedelta
-from pymongo import MongoClient
+import sys
 from dotenv import load_dotenv
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from supplier_intelligence.mongo_manager import get_client
 
 # Load environment variables
 load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
@@ -23,12 +25,29 @@ groq_client = Groq(api_key=os.getenv('GROQ_API_KEY'))
 
 # MongoDB connection
 MONGODB_URI = os.getenv('MONGODB_URI')
-client = MongoClient(MONGODB_URI)
-db = client['inventroops']
-products_collection = db['products']
-depots_collection = db['depots']
-transactions_collection = db['transactions']
-forecasts_collection = db['forecasts']
+
+
+# Handles are looked up on every use so a forked worker never reuses the
+# parent's client (mongo_manager resets its clients after fork)
+def mongo_db():
+    return get_client(MONGODB_URI)['inventroops']
+
+
+def products_collection():
+    return mongo_db()['products']
+
+
+def depots_collection():
+    return mongo_db()['depots']
+
+
+def transactions_collection():
+    return mongo_db()['transactions']
+
+
+def forecasts_collection():
+    return mongo_db()['forecasts']
+
 
 # Conversation memory (in production, use Redis or database)
 conversation_history = {}
@@ -47,7 +66,7 @@ def get_low_stock_products(threshold: int = None):
         else:
             query = {"$expr": {"$lt": ["$stock", "$reorderPoint"]}}
         
-        products = list(products_collection.find(query).limit(50))
+        products = list(products_collection().find(query).limit(50))
         
         result = []
         for p in products:
@@ -73,7 +92,7 @@ def get_products_running_out(days: int = 7):
     """Get products that will run out in the next N days based on current inventory"""
     try:
         # Get products from inventory with low stock or critical status
-        products = list(products_collection.find({
+        products = list(products_collection().find({
             "$or": [
                 {"status": {"$in": ["low-stock", "out-of-stock"]}},
                 {"$expr": {"$lte": ["$stock", {"$multiply": ["$reorderPoint", 1.5]}]}}
@@ -132,7 +151,7 @@ def get_reorder_recommendations():
     """Get AI-powered reorder recommendations from inventory"""
     try:
         # Get products with low stock or below reorder point from products collection
-        products = list(products_collection.find({
+        products = list(products_collection().find({
             "$or": [
                 {"status": {"$in": ["low-stock", "out-of-stock"]}},
                 {"$expr": {"$lt": ["$stock", "$reorderPoint"]}}
@@ -195,7 +214,7 @@ def search_products(query: str, category: str = None, limit: int = 10):
         if category:
             search_filter["category"] = category
         
-        products = list(products_collection.find(search_filter).limit(limit))
+        products = list(products_collection().find(search_filter).limit(limit))
         
         result = []
         for p in products:
@@ -221,16 +240,16 @@ def search_products(query: str, category: str = None, limit: int = 10):
 def get_product_details(sku: str):
     """Get detailed information about a specific product"""
     try:
-        product = products_collection.find_one({"sku": sku})
+        product = products_collection().find_one({"sku": sku})
         
         if not product:
             return {"success": False, "error": f"Product {sku} not found"}
         
         # Get forecast data
-        forecast = forecasts_collection.find_one({"sku": sku})
+        forecast = forecasts_collection().find_one({"sku": sku})
         
         # Get recent transactions
-        transactions = list(transactions_collection.find(
+        transactions = list(transactions_collection().find(
             {"productSku": sku}
         ).sort("timestamp", -1).limit(5))
         
@@ -257,7 +276,7 @@ def get_depot_info(depot_name: str = None):
     """Get information about depots"""
     try:
         if depot_name:
-            depot = depots_collection.find_one({"name": {"$regex": depot_name, "$options": "i"}})
+            depot = depots_collection().find_one({"name": {"$regex": depot_name, "$options": "i"}})
             if not depot:
                 return {"success": False, "error": f"Depot '{depot_name}' not found"}
             
@@ -273,7 +292,7 @@ def get_depot_info(depot_name: str = None):
                 }
             }
         else:
-            depots = list(depots_collection.find().limit(10))
+            depots = list(depots_collection().find().limit(10))
             return {
                 "success": True,
                 "count": len(depots),
@@ -291,10 +310,10 @@ def get_depot_info(depot_name: str = None):
 def get_inventory_stats():
     """Get overall inventory statistics"""
     try:
-        total_products = products_collection.count_documents({})
-        low_stock = products_collection.count_documents({"status": "low-stock"})
-        out_of_stock = products_collection.count_documents({"status": "out-of-stock"})
-        in_stock = products_collection.count_documents({"status": "in-stock"})
+        total_products = products_collection().count_documents({})
+        low_stock = products_collection().count_documents({"status": "low-stock"})
+        out_of_stock = products_collection().count_documents({"status": "out-of-stock"})
+        in_stock = products_collection().count_documents({"status": "in-stock"})
         
         # Get total inventory value
         pipeline = [
@@ -304,7 +323,7 @@ def get_inventory_stats():
                 "totalUnits": {"$sum": "$stock"}
             }}
         ]
-        value_result = list(products_collection.aggregate(pipeline))
+        value_result = list(products_collection().aggregate(pipeline))
         
         return {
             "success": True,
@@ -330,7 +349,7 @@ def add_product(sku: str, name: str, category: str, stock: int, price: float,
     """Add a new product to inventory"""
     try:
         # Check if product already exists
-        existing = products_collection.find_one({"sku": sku})
+        existing = products_collection().find_one({"sku": sku})
         if existing:
             return {"success": False, "error": f"Product with SKU {sku} already exists"}
         
@@ -359,7 +378,7 @@ def add_product(sku: str, name: str, category: str, stock: int, price: float,
         }
         
         # Insert into database
-        result = products_collection.insert_one(product)
+        result = products_collection().insert_one(product)
         
         # Create initial stock-in transaction
         transaction = {
@@ -375,7 +394,7 @@ def add_product(sku: str, name: str, category: str, stock: int, price: float,
             "performedBy": "AI Assistant",
             "timestamp": datetime.now()
         }
-        transactions_collection.insert_one(transaction)
+        transactions_collection().insert_one(transaction)
         
         return {
             "success": True,
@@ -395,7 +414,7 @@ def move_stock(sku: str, from_depot: str, to_depot: str, quantity: int):
     """Transfer stock between depots"""
     try:
         # Get product
-        product = products_collection.find_one({"sku": sku})
+        product = products_collection().find_one({"sku": sku})
         if not product:
             return {"success": False, "error": f"Product {sku} not found"}
         
@@ -407,8 +426,8 @@ def move_stock(sku: str, from_depot: str, to_depot: str, quantity: int):
             }
         
         # Get depot IDs
-        from_depot_doc = depots_collection.find_one({"name": {"$regex": from_depot, "$options": "i"}})
-        to_depot_doc = depots_collection.find_one({"name": {"$regex": to_depot, "$options": "i"}})
+        from_depot_doc = depots_collection().find_one({"name": {"$regex": from_depot, "$options": "i"}})
+        to_depot_doc = depots_collection().find_one({"name": {"$regex": to_depot, "$options": "i"}})
         
         if not from_depot_doc:
             return {"success": False, "error": f"Source depot '{from_depot}' not found"}
@@ -433,7 +452,7 @@ def move_stock(sku: str, from_depot: str, to_depot: str, quantity: int):
             "performedBy": "AI Assistant",
             "timestamp": datetime.now()
         }
-        transactions_collection.insert_one(transaction)
+        transactions_collection().insert_one(transaction)
         
         return {
             "success": True,
@@ -453,7 +472,7 @@ def update_stock(sku: str, quantity: int, operation: str = "add", reason: str =
     """Update product stock (add, remove, or set)"""
     try:
         # Get product
-        product = products_collection.find_one({"sku": sku})
+        product = products_collection().find_one({"sku": sku})
         if not product:
             return {"success": False, "error": f"Product {sku} not found"}
         
@@ -484,7 +503,7 @@ def update_stock(sku: str, quantity: int, operation: str = "add", reason: str =
             status = "in-stock"
         
         # Update product
-        products_collection.update_one(
+        products_collection().update_one(
             {"sku": sku},
             {"$set": {
                 "stock": new_stock,
@@ -507,7 +526,7 @@ def update_stock(sku: str, quantity: int, operation: str = "add", reason: str =
             "performedBy": "AI Assistant",
             "timestamp": datetime.now()
         }
-        transactions_collection.insert_one(transaction)
+        transactions_collection().insert_one(transaction)
         
         return {
             "success": True,
@@ -528,7 +547,7 @@ def update_product_details(sku: str, **updates):
     """Update product information (price, supplier, reorder point, etc.)"""
     try:
         # Get product
-        product = products_collection.find_one({"sku": sku})
+        product = products_collection().find_one({"sku": sku})
         if not product:
             return {"success": False, "error": f"Product {sku} not found"}
         
@@ -546,7 +565,7 @@ def update_product_details(sku: str, **updates):
         update_doc["updatedAt"] = datetime.now()
         
         # Update product
-        products_collection.update_one(
+        products_collection().update_one(
             {"sku": sku},
             {"$set": update_doc}
         )
@@ -565,9 +584,9 @@ def generate_report(report_type: str = "inventory_summary"):
     try:
         if report_type == "inventory_summary":
             # Overall inventory summary
-            total_products = products_collection.count_documents({})
-            low_stock = products_collection.count_documents({"status": "low-stock"})
-            out_of_stock = products_collection.count_documents({"status": "out-of-stock"})
+            total_products = products_collection().count_documents({})
+            low_stock = products_collection().count_documents({"status": "low-stock"})
+            out_of_stock = products_collection().count_documents({"status": "out-of-stock"})
             
             # Top categories
             pipeline = [
@@ -579,7 +598,7 @@ def generate_report(report_type: str = "inventory_summary"):
                 {"$sort": {"totalValue": -1}},
                 {"$limit": 5}
             ]
-            top_categories = list(products_collection.aggregate(pipeline))
+            top_categories = list(products_collection().aggregate(pipeline))
             
             return {
                 "success": True,
@@ -600,7 +619,7 @@ def generate_report(report_type: str = "inventory_summary"):
         
         elif report_type == "recent_transactions":
             # Recent transactions
-            transactions = list(transactions_collection.find()
+            transactions = list(transactions_collection().find()
                               .sort("timestamp", -1)
                               .limit(10))
             
@@ -1,22 +1,47 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 import joblib
 import xgboost as xgb
-from pymongo import MongoClient
 from datetime import datetime, timedelta
-from sklearn.preprocessing import LabelEncoder
 from statsmodels.tsa.arima.model import ARIMA
 from statsmodels.tools.sm_exceptions import ConvergenceWarning
 import warnings
 import os
+import json
+import time
 from bson import ObjectId
 import traceback
 import sys
+from functools import partial
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__))))
 from supplier_intelligence.supplier_routes import supplier_routes, init_db
-from supplier_intelligence.risk_score_engine import get_all_supplier_scores, get_supplier_history
+from supplier_intelligence.risk_score_engine import RiskScoreEngine, get_supplier_history
+from supplier_intelligence.risk_snapshot import get_snapshot as get_supplier_risk_snapshot
+from supplier_intelligence.snapshot_store import get_snapshot_store as get_supplier_history_store
+from supplier_intelligence.model_registry import registry as supplier_model_registry
+from supplier_intelligence.single_flight import SingleFlight
+from supplier_intelligence.mongo_manager import get_database, pool_stats as mongo_pool_stats, health as mongo_health
+from forecast_engine import search_arima_order
+from forecast_cache import cache_from_env
+from series_generator import generate_history_batch, generate_fallback_batch
+from batch_inference import (
+    MicroBatcher, NUMERIC_FEATURES, CATEGORICAL_FEATURES,
+    InvalidRowError, rows_to_columns, build_feature_matrix, rule_based_status
+)
+from encoders import compile_encoders
+from metrics import init_app as init_metrics, registry as metrics_registry, timed, log_event
+from scenario_sweep import scenario_grid, run_sweep
+from simulation import simulate_stockout
+from forecast_batch import generate_alerts_batch, generate_forecast_data_batch, parse_base_date
+from forecast_refresh import ForecastRefresher, WARMUP_HORIZON_HOURS, WARMUP_LIMIT
+from catalogue_version import CatalogueVersion
+from bulk_forecast import (
+    start_bulk_job, get_job_status as get_bulk_job_status, JOBS_COLLECTION as BULK_JOBS_COLLECTION,
+    DEFAULT_BATCH_SIZE as BULK_DEFAULT_BATCH_SIZE, DEFAULT_WORKERS as BULK_DEFAULT_WORKERS,
+    MAX_WORKERS as BULK_MAX_WORKERS
+)
 
 warnings.filterwarnings('ignore', category=ConvergenceWarning)
 warnings.filterwarnings('ignore', category=FutureWarning)
@@ -40,6 +65,8 @@ for path in env_paths:
 app = Flask(__name__)
 # Allow CORS for all domains in development, or restrict based on env
 CORS(app, resources={r"/api/*": {"origins": "*"}})
+# Per-route latency histograms (served on /api/metrics)
+init_metrics(app)
 
 # MongoDB Configuration
 # Require MONGODB_URI from environment — never hardcode credentials in source
@@ -49,15 +76,32 @@ if not MONGODB_URI:
         "MONGODB_URI environment variable is not set. "
         "Please configure your .env file before starting the server."
     )
-client = MongoClient(MONGODB_URI)
-db = client.get_database() # Uses database name from URI or defaults
-if not db.name or db.name == 'test':
-    db = client['animesh']
+# Database name from the URI, or 'animesh' when it names none (no connection is made here)
+MONGO_DB_NAME = get_database(MONGODB_URI, default_name='animesh').name
 
-print(f" Connected to MongoDB Database: {db.name}")
+print(f" Using MongoDB Database: {MONGO_DB_NAME}")
 
-forecasts_collection = db['forecasts']
-products_collection = db['products']
+
+# Handles are looked up on every use so each gunicorn worker talks through its
+# own pooled client (mongo_manager drops clients inherited across fork);
+# module-level collections would stay bound to the parent's client.
+def mongo_db():
+    return get_database(MONGODB_URI, default_name=MONGO_DB_NAME)
+
+
+def forecasts_collection():
+    return mongo_db()['forecasts']
+
+
+def products_collection():
+    return mongo_db()['products']
+
+# Upper bound on rows accepted by /api/ml/predict/batch
+MAX_PREDICT_BATCH_ROWS = int(os.getenv("ML_PREDICT_BATCH_MAX_ROWS", "10000"))
+
+# /api/supplier/predict-risk/batch: rows accepted per request, rows scored per streamed batch
+SUPPLIER_PREDICT_MAX_ROWS = int(os.getenv("SUPPLIER_PREDICT_MAX_ROWS", "50000"))
+SUPPLIER_PREDICT_CHUNK_ROWS = int(os.getenv("SUPPLIER_PREDICT_CHUNK_ROWS", "2000"))
 
 # Global variables
 ml_model = None
@@ -95,9 +139,19 @@ def load_models():
             print(" Loaded ML model from Pickle")
         
         if os.path.exists(ENCODERS_PATH):
-            target_encoders = joblib.load(ENCODERS_PATH)
+            # Compiled once into immutable lookup tables shared by all threads
+            # (and by forked gunicorn workers when loaded from wsgi.py)
+            target_encoders = compile_encoders(joblib.load(ENCODERS_PATH))
             print(" Loaded label encoders")
         
+        # Supplier risk forests: loaded once here so forked workers share them
+        supplier_models = supplier_model_registry.preload()
+        print(f" Supplier risk models loaded: {supplier_models}")
+
+        # The supplier history index is ensured by the first history request in
+        # each worker (snapshot_store.py): nothing here may connect to MongoDB,
+        # since wsgi.py runs this before gunicorn forks
+
         # if os.path.exists(ARIMA_PATH):
         #     arima_models = joblib.load(ARIMA_PATH)
         #     print(" Loaded ARIMA models")
@@ -109,51 +163,34 @@ def load_models():
         return False
 
 
+@timed("preprocess")
 def preprocess_data(df):
     """Preprocess the input data"""
-    global target_encoders
-
-    features = [
-        "current_stock",
-        "daily_sales",
-        "weekly_sales",
-        "reorder_level",
-        "lead_time",
-        "days_to_empty",
-    ]
+    features = list(NUMERIC_FEATURES)
     
-    categorical = ["brand", "category", "location", "supplier_name"]
-
     if target_encoders is None:
-        print(" Warning: target_encoders not loaded, using fresh LabelEncoders.")
-        target_encoders = {}
-
-    for col in categorical:
-        df[col] = df[col].astype(str)
+        log_event("encoders_missing")
 
-        if col in target_encoders:
-            le = target_encoders[col]
-            
-            if "Unknown" not in le.classes_:
-                le.classes_ = np.append(le.classes_, "Unknown")
+    for col in CATEGORICAL_FEATURES:
+        values = df[col].astype(str).to_numpy(dtype=object)
 
-            df[col] = df[col].apply(lambda x: x if x in le.classes_ else "Unknown")
-            df[col] = le.transform(df[col])
+        if target_encoders is not None and col in target_encoders:
+            # O(1) hash lookup with "Unknown" fallback; shared encoders are never mutated
+            df[col] = target_encoders[col].transform(values)
         else:
-            le = LabelEncoder()
-            df[col] = le.fit_transform(df[col])
-            target_encoders[col] = le
+            df[col] = pd.factorize(values, sort=True)[0]
         
         features.append(col)
     
     return df, features
 
 
+@timed("inference")
 def predict_stock_status(X_test):
     """Predict stock status and priority"""
     # FALLBACK if model is not loaded
     if ml_model is None:
-        print(" Using fallback rule-based prediction (Models not loaded)")
+        log_event("rule_based_prediction")
         current_stock = X_test['current_stock'].iloc[0]
         reorder_level = X_test['reorder_level'].iloc[0]
         days_to_empty = X_test['days_to_empty'].iloc[0]
@@ -176,46 +213,68 @@ def predict_stock_status(X_test):
             "stock_status_pred": [status],
             "priority_pred": [priority]
         })
+    # One booster call per micro-batch; concurrent requests share it
+    y_pred_numeric = micro_batcher.predict(X_test.to_numpy(dtype=np.float32))
+    stock_status, priority = decode_stock_predictions(y_pred_numeric)
+    
+    return pd.DataFrame({
+        "stock_status_pred": stock_status,
+        "priority_pred": priority
+    })
+
+
+def predict_numeric(X):
+    """
+    Raw model output for a float32 feature matrix.
+    
+    Uses Booster.inplace_predict on the NumPy array directly, so no DMatrix
+    is built per call.
+    """
     if use_xgb_native:
-        dtest = xgb.DMatrix(X_test)
-        y_pred_numeric = ml_model.predict(dtest)
+        y_pred_numeric = ml_model.inplace_predict(X)
         if y_pred_numeric.ndim > 1:
             y_pred_numeric = np.argmax(y_pred_numeric, axis=1)
-    else:
-        y_pred_numeric = ml_model.predict(X_test)
+        return y_pred_numeric
+    return ml_model.predict(X)
+
+
+def decode_stock_predictions(y_pred_numeric):
+    """
+    Split raw model output into (stock_status, priority) label arrays.
     
-    if isinstance(y_pred_numeric, np.ndarray):
-        if y_pred_numeric.ndim == 1:
-            # WARNING: Model returned a single 1D output — both columns will share the same values.
-            # This likely means the model only predicts one target. Verify model output format.
-            print(" Warning: Model returned 1D output; stock_status_pred and priority_pred will be identical.")
-            y_pred = pd.DataFrame({
-                "stock_status_pred": y_pred_numeric,
-                "priority_pred": y_pred_numeric
-            })
-        elif y_pred_numeric.shape[1] == 2:
-            y_pred = pd.DataFrame(
-                y_pred_numeric, columns=["stock_status_pred", "priority_pred"]
-            )
-        else:
-            raise ValueError(f"Unexpected model output shape: {y_pred_numeric.shape}")
-    else:
+    Returns:
+        Tuple of two 1-D object arrays
+    """
+    if not isinstance(y_pred_numeric, np.ndarray):
         raise ValueError("Model prediction returned unexpected type")
     
-    for col in ["stock_status_pred", "priority_pred"]:
-        encoder_key = col.replace("_pred", "")
-        if encoder_key in target_encoders:
-            encoder = target_encoders[encoder_key]
-            try:
-                y_pred[col] = encoder.inverse_transform(y_pred[col].astype(int))
-            except (ValueError, KeyError) as e:
-                print(f" Could not decode {col}: {e}")
-                y_pred[col] = "Unknown"
+    if y_pred_numeric.ndim == 1:
+        # WARNING: Model returned a single 1D output — both columns will share the same values.
+        # This likely means the model only predicts one target. Verify model output format.
+        log_event("model_output_1d", rows=len(y_pred_numeric))
+        columns = [y_pred_numeric, y_pred_numeric]
+    elif y_pred_numeric.shape[1] == 2:
+        columns = [y_pred_numeric[:, 0], y_pred_numeric[:, 1]]
+    else:
+        raise ValueError(f"Unexpected model output shape: {y_pred_numeric.shape}")
     
-    return y_pred
+    decoded = []
+    for encoder_key, values in zip(["stock_status", "priority"], columns):
+        if target_encoders and encoder_key in target_encoders:
+            values = target_encoders[encoder_key].inverse_transform(values)
+        decoded.append(values)
+    return decoded[0], decoded[1]
+
 
+# Coalesces concurrent predictions into a single booster call
+micro_batcher = MicroBatcher(
+    predict_numeric,
+    max_batch_rows=int(os.getenv("ML_MICRO_BATCH_ROWS", "4096")),
+    max_wait_ms=float(os.getenv("ML_MICRO_BATCH_WAIT_MS", "2"))
+)
 
-def generate_historical_sales_from_inputs(daily_sales, weekly_sales, num_days=60):
+
+def generate_historical_sales_from_inputs(daily_sales, weekly_sales, num_days=60, rng=None):
     """
     Generate synthetic historical sales data based on user inputs.
     This creates a realistic time series that ARIMA can learn from.
@@ -224,33 +283,13 @@ def generate_historical_sales_from_inputs(daily_sales, weekly_sales, num_days=60
         daily_sales: Average daily sales rate
         weekly_sales: Average weekly sales rate
         num_days: Number of historical days to generate
+        rng: Optional seeded np.random.Generator for reproducible output
     
     Returns:
         Array of historical sales values
     """
-    # Calculate base sales from both metrics
-    avg_from_daily = daily_sales
-    avg_from_weekly = weekly_sales / 7
-    base_sales = (avg_from_daily * 0.4 + avg_from_weekly * 0.6)
-    
-    historical_sales = []
-    
-    for i in range(num_days):
-        # Weekly seasonality (higher on weekdays, lower on weekends)
-        day_of_week = i % 7
-        seasonality = 1.15 if day_of_week < 5 else 0.75
-        
-        # Add some trend (slight growth over time)
-        trend = 1 + (i / num_days) * 0.1
-        
-        # Random noise (±20% variation)
-        noise = np.random.uniform(0.8, 1.2)
-        
-        # Generate realistic sales value
-        sales_value = base_sales * seasonality * trend * noise
-        historical_sales.append(max(0, sales_value))
-    
-    return np.array(historical_sales)
+    # Weekday/weekend seasonality, slight growth trend and ±20% noise
+    return generate_history_batch(daily_sales, weekly_sales, num_days=num_days, rng=rng)[0]
 
 
 def fit_arima_model(historical_sales, order=(1, 1, 1)):
@@ -265,11 +304,11 @@ def fit_arima_model(historical_sales, order=(1, 1, 1)):
         Tuple of (fitted_model, model_info) or (None, None) if fitting fails
     """
     try:
-        print(f" Fitting ARIMA{order} model on {len(historical_sales)} data points...")
+        log_event("arima_fit_start", order=order, points=len(historical_sales))
         
         # Ensure data is suitable for ARIMA
         if len(historical_sales) < 10:
-            print(" Not enough data points for ARIMA, need at least 10")
+            log_event("arima_fit_skipped", reason="fewer than 10 data points")
             return None, None
         
         # Fit ARIMA model
@@ -284,7 +323,7 @@ def fit_arima_model(historical_sales, order=(1, 1, 1)):
             "params": fitted_model.params.tolist() if hasattr(fitted_model, 'params') else []
         }
         
-        print(f" ARIMA model fitted successfully (AIC: {fitted_model.aic:.2f})")
+        log_event("arima_fit_done", order=order, aic=round(float(fitted_model.aic), 2))
         return fitted_model, model_info
         
     except Exception as e:
@@ -292,7 +331,20 @@ def fit_arima_model(historical_sales, order=(1, 1, 1)):
         return None, None
 
 
-def forecast_with_arima(daily_sales, weekly_sales, steps=30):
+# Candidate orders for the ARIMA order search
+ARIMA_CANDIDATE_ORDERS = [
+    (1, 1, 1),  # Standard ARIMA
+    (2, 1, 1),  # More autoregressive terms
+    (1, 1, 2),  # More moving average terms
+    (2, 1, 2),  # More complex model
+    (0, 1, 1),  # Simple model
+]
+
+# Process-wide forecast memoization (in-process LRU + shared file tier)
+forecast_cache = cache_from_env()
+
+
+def forecast_with_arima(daily_sales, weekly_sales, steps=30, search_workers=None):
     """
     Generate forecast using ARIMA model trained on synthetic historical data.
     
@@ -300,10 +352,17 @@ def forecast_with_arima(daily_sales, weekly_sales, steps=30):
         daily_sales: User-provided daily sales rate
         weekly_sales: User-provided weekly sales rate
         steps: Number of days to forecast
+        search_workers: Process pool size for the order search (None = default)
     
     Returns:
         Tuple of (forecast_array, forecast_metadata)
     """
+    # Repeat requests for the same (quantized) inputs skip the ARIMA fit entirely
+    cache_key = forecast_cache.make_key(daily_sales, weekly_sales, steps, ARIMA_CANDIDATE_ORDERS)
+    cached = forecast_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     forecast_metadata = {
         "method": "Fallback",
         "arima_used": False,
@@ -319,39 +378,26 @@ def forecast_with_arima(daily_sales, weekly_sales, steps=30):
         
         # print(f"Historical sales stats: mean={historical_sales.mean():.2f}, std={historical_sales.std():.2f}")
         
-        # Try different ARIMA orders to find the best fit
-        orders_to_try = [
-            (1, 1, 1),  # Standard ARIMA
-            (2, 1, 1),  # More autoregressive terms
-            (1, 1, 2),  # More moving average terms
-            (2, 1, 2),  # More complex model
-            (0, 1, 1),  # Simple model
-        ]
+        # Candidates are fitted in parallel on the differenced series, warm-started
+        # from each other and abandoned once the AIC stops improving
+        with timed("arima_order_search"):
+            search = search_arima_order(
+                historical_sales, ARIMA_CANDIDATE_ORDERS, steps=steps, workers=search_workers
+            )
         
-        best_model = None
-        best_aic = float('inf')
-        best_model_info = None
-        best_order = None
-        
-        for order in orders_to_try:
-            model, model_info = fit_arima_model(historical_sales, order=order)
-            if model is not None:
-                if model_info["aic"] < best_aic:
-                    best_aic = model_info["aic"]
-                    best_model = model
-                    best_model_info = model_info
-                    best_order = order
-        
-        if best_model is None:
+        if search is None:
             # print(" All ARIMA models failed, using fallback method")
             forecast = generate_fallback_forecast(daily_sales, weekly_sales, steps)
+            forecast_cache.set(cache_key, forecast, forecast_metadata)
             return forecast, forecast_metadata
         
-        # print(f" Best ARIMA model selected: {best_order} (AIC: {best_aic:.2f}, BIC: {best_model_info['bic']:.2f})")
+        best_order = search["order"]
+        best_aic = search["aic"]
+        
+        # print(f" Best ARIMA model selected: {best_order} (AIC: {best_aic:.2f}, BIC: {search['bic']:.2f})")
         
         # Generate forecast
-        # print(f" Forecasting next {steps} days using ARIMA{best_order}...")
-        forecast = best_model.forecast(steps=steps)
+        forecast = search["forecast"]
         
         # Ensure non-negative values
         forecast = np.maximum(forecast, 0)
@@ -369,14 +415,25 @@ def forecast_with_arima(daily_sales, weekly_sales, steps=30):
             "model_details": {
                 "order": best_order,
                 "aic": best_aic,
-                "bic": best_model_info["bic"],
+                "bic": search["bic"],
                 "historical_points": len(historical_sales),
                 "forecast_mean": float(forecast.mean()),
-                "forecast_std": float(forecast.std())
+                "forecast_std": float(forecast.std()),
+                "orders_evaluated": search["orders_evaluated"],
+                "search_time_ms": search["search_time_ms"]
+            },
+            # Innovation model behind the Monte Carlo stock-out simulation
+            "error_model": {
+                "order": list(best_order),
+                "ar": search["ar"],
+                "ma": search["ma"],
+                "sigma2": search["sigma2"],
+                "source": "arima"
             },
             "historical_sales": historical_sales.tolist()
         })
         
+        forecast_cache.set(cache_key, forecast, forecast_metadata)
         return forecast, forecast_metadata
         
     except Exception as e:
@@ -388,148 +445,115 @@ def forecast_with_arima(daily_sales, weekly_sales, steps=30):
         return forecast, forecast_metadata
 
 
-def generate_fallback_forecast(daily_sales, weekly_sales, steps=30):
+def generate_fallback_forecast(daily_sales, weekly_sales, steps=30, rng=None):
     """
     Fallback forecasting method if ARIMA fails.
     Uses exponential smoothing with trend and seasonality.
     """
-    print(" Using fallback forecasting method (Exponential Smoothing)")
-    print(" This happens when ARIMA model fails to converge or fit properly")
+    # Happens when the ARIMA models fail to converge or fit properly
+    log_event("fallback_forecast", steps=steps)
     
-    avg_from_daily = daily_sales
-    avg_from_weekly = weekly_sales / 7
-    base_sales = (avg_from_daily * 0.4 + avg_from_weekly * 0.6)
-    
-    forecast = []
-    for i in range(steps):
-        # Trend component
-        trend = 1 + (i / steps) * 0.05
-        
-        # Seasonality (weekly pattern)
-        day_of_week = i % 7
-        seasonality = 1.1 if day_of_week < 5 else 0.85
-        
-        # Random variation
-        noise = np.random.uniform(0.9, 1.1)
-        
-        value = base_sales * trend * seasonality * noise
-        forecast.append(max(0, value))
-    
-    return np.array(forecast)
+    return generate_fallback_batch(daily_sales, weekly_sales, steps=steps, rng=rng)[0]
 
 
+@timed("alerts")
 def generate_alerts(row, forecast_sales_data=None, initial_stock=0):
     """Generate professional, decision-oriented alerts based on predictions"""
-    insights = {
-        "status": "Healthy",
-        "eta_days": None,
-        "recommended_reorder": 0,
-        "risk_level": "Low",
-        "message": "Stock levels are optimal."
-    }
-    
     current_stock = initial_stock if initial_stock > 0 else row.get("current_stock", 0)
     lead_time = row.get("lead_time", 7)
     
-    if forecast_sales_data is not None and len(forecast_sales_data) > 0:
-        total_forecasted = sum(forecast_sales_data)
-        
-        # Calculate ETA based on daily projections if available
-        # Find the day where stock runs out
-        eta = None
-        temp_stock = current_stock
-        for i, daily_sale in enumerate(forecast_sales_data):
-            temp_stock -= daily_sale
-            if temp_stock <= 0:
-                eta = i + 1
-                break
-        
-        # Fallback to average if it doesn't run out in the forecast window
-        if eta is None:
-            avg_daily_forecast = total_forecasted / len(forecast_sales_data)
-            if avg_daily_forecast > 0:
-                eta = current_stock / avg_daily_forecast
-                insights["eta_days"] = round(eta, 1)
-            else:
-                insights["eta_days"] = 999
-        else:
-            insights["eta_days"] = round(eta, 1)
-            
-        # Decision Logic
-        if current_stock <= 0:
-            insights["status"] = "OUT OF STOCK"
-            insights["risk_level"] = "Critical"
-            insights["recommended_reorder"] = round(total_forecasted * 1.2)
-            insights["message"] = f"Immediate restock required. Recommended: {insights['recommended_reorder']} units."
-        elif insights["eta_days"] < lead_time:
-            insights["status"] = "At Risk"
-            insights["risk_level"] = "High"
-            insights["recommended_reorder"] = round((total_forecasted - current_stock) * 1.1)
-            insights["message"] = f"Stock-out predicted in {insights['eta_days']} days. Reorder {insights['recommended_reorder']} units now."
-        elif insights["eta_days"] < 30:
-            insights["status"] = "Warning"
-            insights["risk_level"] = "Medium"
-            # Calculate reorder even for warnings so the modal isn't empty
-            insights["recommended_reorder"] = round(total_forecasted * 0.8)
-            insights["message"] = f"Inventory sufficient for {insights['eta_days']} days. Plan reorder soon."
-
-        # Add additional fields for modal - Ensure they are always set
-        insights["avg_daily_demand"] = round(total_forecasted / len(forecast_sales_data), 2)
-        insights["reorder_point"] = round(insights["avg_daily_demand"] * lead_time * 1.5)
-        
-        # Calculate predicted stock out date
-        if insights["eta_days"] and insights["eta_days"] < 365:
-            insights["predicted_stock_out_date"] = (datetime.now() + timedelta(days=insights["eta_days"])).strftime('%Y-%m-%d')
-        else:
-            insights["predicted_stock_out_date"] = "N/A"
-    else:
-        # Fallback if no forecast data
-        insights["avg_daily_demand"] = 0
-        insights["reorder_point"] = 0
-        insights["predicted_stock_out_date"] = "N/A"
-            
-    return insights
+    # Single-row case of the vectorized version used by bulk callers
+    forecast = forecast_sales_data if forecast_sales_data is not None else []
+    return generate_alerts_batch([np.asarray(forecast, dtype=float)], [current_stock], [lead_time])[0]
 
 
 def generate_forecast_data(future_sales, current_date, initial_stock=0):
     """Generate forecast data points with confidence intervals and projected stock"""
-    forecast_data = []
-    try:
-        if isinstance(current_date, str):
-            # Try YYYY-MM-DD
-            try:
-                base_date = datetime.strptime(current_date, '%Y-%m-%d')
-            except ValueError:
-                # Try ISO format
-                base_date = datetime.fromisoformat(current_date.replace('Z', '+00:00'))
-        else:
-            base_date = current_date
-    except Exception:
-        print(f" Date parsing failed for {current_date}, using today")
+    base_date = parse_base_date(current_date)
+    if base_date is None:
+        log_event("date_parse_failed", value=current_date)
         base_date = datetime.now()
     
-    running_stock = initial_stock
+    return generate_forecast_data_batch(
+        [np.asarray(future_sales, dtype=float)], base_date, [initial_stock]
+    )[0]
+
+
+def simulate_forecast_stockout(forecast_data, future_sales, current_stock, lead_time, metadata):
+    """
+    Monte Carlo stock-out simulation for one forecast (see simulation.py).
+    Adds each day's stock-out probability to its forecast_data point.
+    """
+    with timed("simulation"):
+        simulation = simulate_stockout(
+            future_sales, current_stock, lead_time, error_model=metadata.get("error_model")
+        )
+    if simulation is not None:
+        for point, probability in zip(forecast_data, simulation["stockout_probability"]):
+            point["stockout_probability"] = probability
+    return simulation
+
+
+def build_product_forecast_doc(product, steps=30, search_workers=None):
+    """
+    Build the stored forecast document for one product record.
+    
+    Shared by the per-SKU modal route and the bulk catalogue job, so it only
+    computes — callers decide how to persist the result.
     
-    for i, predicted_val in enumerate(future_sales):
-        forecast_date = base_date + timedelta(days=i+1)
-        
-        # Confidence decreases over time (more uncertainty in distant future)
-        base_confidence = 0.95
-        time_decay = 0.004 * i
-        confidence = max(0.75, base_confidence - time_decay)
-        
-        # Calculate projected stock
-        running_stock = max(0, running_stock - predicted_val)
-        
-        forecast_data.append({
-            "date": forecast_date.strftime('%Y-%m-%d'),
-            "predicted": float(predicted_val),
-            "projected_stock": float(running_stock),
-            "actual": None,
-            "confidence": float(confidence)
-        })
+    Args:
+        product: Product document (matching schema from server.js)
+        steps: Number of days to forecast
+        search_workers: Process pool size for the ARIMA order search
+    
+    Returns:
+        Forecast document ready to be upserted into the forecasts collection
+    """
+    sku = product.get('sku')
+    
+    # Extract params (matching schema from server.js)
+    current_stock = float(product.get('stock', 0))
+    daily_sales = float(product.get('dailySales', 5))
+    weekly_sales = float(product.get('weeklySales', 35))
+    lead_time = float(product.get('leadTime', 7))
+    reorder_level = float(product.get('reorderPoint', 10))
+    
+    # Generate forecast (using our standard internal logic)
+    future_sales, metadata = forecast_with_arima(
+        daily_sales, weekly_sales, steps=steps, search_workers=search_workers
+    )
+    insights = generate_alerts({
+        'current_stock': current_stock,
+        'lead_time': lead_time
+    }, forecast_sales_data=future_sales, initial_stock=current_stock)
     
-    return forecast_data
+    current_date = datetime.now().strftime('%Y-%m-%d')
+    forecast_data = generate_forecast_data(future_sales, current_date, initial_stock=current_stock)
+    simulation = simulate_forecast_stockout(forecast_data, future_sales, current_stock, lead_time, metadata)
+    
+    # Build the document
+    return {
+        "sku": sku,
+        "productName": product.get('name', sku),
+        "currentStock": int(current_stock),
+        "stockStatusPred": insights.get('status', 'Healthy'),
+        "priorityPred": insights.get('risk_level', 'Low'),
+        "alert": insights.get('message', ''),
+        "aiInsights": insights,
+        "forecastData": forecast_data,
+        "stockoutSimulation": simulation,
+        "historicalData": metadata.get("historical_sales", []),
+        "inputParams": {
+            "dailySales": daily_sales,
+            "weeklySales": weekly_sales,
+            "reorderLevel": reorder_level,
+            "leadTime": lead_time,
+            "brand": product.get('brand', 'Generic'),
+            "category": product.get('category', 'Misc')
+        },
+        "forecastMethod": metadata["method"],
+        "updatedAt": datetime.now()
+    }
 
 
 @app.route('/api/health', methods=['GET'])
@@ -538,37 +562,108 @@ def health_check():
     return jsonify({
         "status": "OK",
         "timestamp": datetime.now().isoformat(),
-        "models_loaded": ml_model is not None and target_encoders is not None
+        "models_loaded": ml_model is not None and target_encoders is not None,
+        "mongo": mongo_health(MONGODB_URI)
     })
 
 
+# Largest page /api/ml/products returns per request (?limit=)
+PRODUCTS_MAX_PAGE = int(os.getenv("ML_PRODUCTS_MAX_PAGE", "1000"))
+PRODUCTS_STREAM_CHUNK = 500
+
+# Fields sent to the product picker; 'location' falls back to depotName when missing or empty
+PRODUCT_LIST_PROJECTION = {
+    '_id': 1,
+    'sku': 1,
+    'name': 1,
+    'category': 1,
+    'stock': 1,
+    'supplier': 1,
+    'depotName': 1,
+    'location': {'$cond': [
+        {'$in': [{'$ifNull': ['$location', None]}, [None, '']]},
+        {'$ifNull': ['$depotName', 'General Warehouse']},
+        '$location'
+    ]}
+}
+
+# ETag source for the product list (see catalogue_version.py)
+catalogue_version = CatalogueVersion(products_collection)
+
+
+def product_list_cursor(after=None, limit=None):
+    """Products in _id order, optionally after a cursor and limited to one page"""
+    pipeline = []
+    if after is not None:
+        pipeline.append({'$match': {'_id': {'$gt': after}}})
+    pipeline.append({'$sort': {'_id': 1}})
+    if limit:
+        pipeline.append({'$limit': limit})
+    pipeline.append({'$project': PRODUCT_LIST_PROJECTION})
+    return products_collection().aggregate(pipeline, batchSize=PRODUCTS_STREAM_CHUNK)
+
+
 @app.route('/api/ml/products', methods=['GET'])
 def get_available_products():
-    """Get all products from MongoDB for selection"""
+    """
+    Get products from MongoDB for selection.
+    
+    ?limit=N&after=<cursor> pages through the catalogue in _id order
+    (nextCursor is returned while more pages remain).  ?stream=json streams
+    the usual JSON body in chunks; if the database fails mid-stream the body
+    still closes, with "success": false and "error".  ?stream=ndjson (or
+    Accept: application/x-ndjson) streams one product per line followed by
+    one trailer line, told apart from products by its "type" key:
+    
+        {"type": "page", "count": n, "nextCursor": "..." | null}
+        {"type": "error", "count": n, "error": "..."}   (stream cut short)
+    
+    Responses carry an ETag derived from the catalogue version and the
+    normalized page (mode, limit, after); If-None-Match on an unchanged
+    catalogue gets a 304.
+    """
     try:
-        products = list(products_collection.find({}, {
-            '_id': 0,
-            'sku': 1,
-            'name': 1,
-            'category': 1,
-            'stock': 1,
-            'supplier': 1,
-            'location': 1,
-            'depotName': 1
-        }))
-        
-         # Ensure 'location' field is populated from 'depotName' if missing
-        processed_products = []
-        for p in products:
-            if 'location' not in p or not p['location']:
-                p['location'] = p.get('depotName', 'General Warehouse')
-            processed_products.append(p)
-
-        return jsonify({
-            "success": True,
-            "products": processed_products,
-            "count": len(processed_products)
-        })
+        limit = request.args.get('limit')
+        limit = max(1, min(int(limit), PRODUCTS_MAX_PAGE)) if limit else None
+        after = request.args.get('after')
+        after = ObjectId(after) if after else None
+    except Exception:
+        return jsonify({"success": False, "error": "limit must be an integer and after a cursor from nextCursor"}), 400
+    
+    mode = request.args.get('stream')
+    if mode is None and request.accept_mimetypes.best == 'application/x-ndjson':
+        mode = 'ndjson'
+    if mode not in (None, 'json', 'ndjson'):
+        return jsonify({"success": False, "error": "stream must be json or ndjson"}), 400
+    
+    try:
+        catalogue_version.ensure_watcher()
+        etag = f"catalogue-{catalogue_version.current()}-{mode or 'full'}-{limit or 'all'}-{after or 'start'}"
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        elif mode is None:
+            with timed("mongo"):
+                products = list(product_list_cursor(after, limit))
+            last_id = products[-1]['_id'] if products else None
+            for p in products:
+                del p['_id']
+            payload = {
+                "success": True,
+                "products": products,
+                "count": len(products)
+            }
+            if limit:
+                payload["nextCursor"] = str(last_id) if len(products) == limit else None
+            response = jsonify(payload)
+        else:
+            response = Response(
+                stream_product_list(product_list_cursor(after, limit), limit, mode),
+                mimetype='application/x-ndjson' if mode == 'ndjson' else 'application/json'
+            )
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept')
+        return response
     except Exception as e:
         print(f"Error fetching products: {e}")
         return jsonify({
@@ -577,6 +672,45 @@ def get_available_products():
         }), 500
 
 
+def stream_product_list(cursor, limit, mode):
+    """Serialize products as they come off the cursor, PRODUCTS_STREAM_CHUNK at a time"""
+    count = 0
+    last_id = None
+    chunk = []
+    error = None
+    
+    if mode == 'json':
+        yield '{"products": ['
+    try:
+        for product in cursor:
+            last_id = product.pop('_id')
+            line = json.dumps(product, default=str)
+            chunk.append(line if mode == 'ndjson' or count == 0 else ',' + line)
+            count += 1
+            if len(chunk) >= PRODUCTS_STREAM_CHUNK:
+                yield '\n'.join(chunk) + '\n' if mode == 'ndjson' else ''.join(chunk)
+                chunk = []
+    except Exception as e:
+        # Headers are already sent: report the failure in the body instead
+        print(f"Error streaming products: {e}")
+        traceback.print_exc()
+        error = str(e)
+    if chunk:
+        yield '\n'.join(chunk) + '\n' if mode == 'ndjson' else ''.join(chunk)
+    
+    next_cursor = str(last_id) if limit and count == limit else None
+    if mode == 'json':
+        tail = {"success": error is None, "count": count}
+        if error is not None:
+            tail["error"] = error
+        elif limit:
+            tail["nextCursor"] = next_cursor
+        yield '], ' + json.dumps(tail)[1:]
+    elif error is not None:
+        yield json.dumps({"type": "error", "count": count, "error": error}) + '\n'
+    else:
+        yield json.dumps({"type": "page", "count": count, "nextCursor": next_cursor}) + '\n'
+
 
 @app.route('/api/ml/predict/custom', methods=['POST', 'OPTIONS'])
 def predict_custom():
@@ -586,7 +720,7 @@ def predict_custom():
     
     try:
         data = request.json
-        print(f" Received prediction request: {data}")
+        log_event("predict_request", sku=data.get('sku'))
         
         # Extract user inputs
         sku = data.get('sku')
@@ -640,18 +774,15 @@ def predict_custom():
         }])
         
         # Preprocess and predict
-        print(" Preprocessing data...")
         processed_data, features = preprocess_data(input_data)
         X_test = processed_data[features]
         
-        print(" Running ML prediction for stock status...")
         y_pred = predict_stock_status(X_test)
         
         stock_status_pred = y_pred["stock_status_pred"].iloc[0]
         priority_pred = y_pred["priority_pred"].iloc[0]
         
         # Generate forecast using ARIMA trained on user inputs
-        print(f" Training ARIMA model and generating {forecast_days}-day forecast...")
         future_sales, forecast_metadata = forecast_with_arima(
             daily_sales=daily_sales,
             weekly_sales=weekly_sales,
@@ -659,7 +790,7 @@ def predict_custom():
         )
         
         # Log which method was used
-        print(f" Forecast method used: {forecast_metadata['method']}")
+        log_event("forecast_done", sku=sku, method=forecast_metadata['method'], steps=forecast_days)
         
         # Generate alerts
         row_data = {
@@ -674,6 +805,11 @@ def predict_custom():
         current_date = datetime.now().strftime('%Y-%m-%d')
         forecast_data = generate_forecast_data(future_sales, current_date, initial_stock=current_stock)
         
+        # Stock-out probability by day, ETA quantiles and service-level reorder sizes
+        simulation = simulate_forecast_stockout(
+            forecast_data, future_sales, current_stock, lead_time, forecast_metadata
+        )
+        
         # Create forecast document
         forecast_doc = {
             "userId": user_id,
@@ -686,6 +822,7 @@ def predict_custom():
             "alert": insights["message"],
             "aiInsights": insights, # New structured insights
             "forecastData": forecast_data,
+            "stockoutSimulation": simulation,
             "inputParams": {
                 "dailySales": daily_sales,
                 "weeklySales": weekly_sales,
@@ -704,14 +841,14 @@ def predict_custom():
         }
         
         # Save to MongoDB
-        print("Saving forecast to MongoDB...")
-        forecasts_collection.update_one(
-            {"sku": sku},
-            {"$set": forecast_doc},
-            upsert=True
-        )
+        with timed("mongo"):
+            forecasts_collection().update_one(
+                {"sku": sku},
+                {"$set": forecast_doc},
+                upsert=True
+            )
         
-        print(f" Prediction complete for {sku}")
+        log_event("predict_done", sku=sku)
         
         return jsonify({
             "success": True,
@@ -733,18 +870,126 @@ def predict_custom():
         }), 500
 
 
+@app.route('/api/ml/predict/batch', methods=['POST', 'OPTIONS'])
+def predict_batch():
+    """Classify stock status / priority for many rows in one request"""
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        rows = data.get('rows')
+        
+        if not isinstance(rows, list) or not rows:
+            return jsonify({
+                "success": False,
+                "error": "rows must be a non-empty list"
+            }), 400
+        
+        if len(rows) > MAX_PREDICT_BATCH_ROWS:
+            return jsonify({
+                "success": False,
+                "error": f"At most {MAX_PREDICT_BATCH_ROWS} rows per request"
+            }), 413
+        
+        try:
+            columns = rows_to_columns(rows)
+        except InvalidRowError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e),
+                "row": e.index,
+                "field": e.field
+            }), 400
+        
+        X = build_feature_matrix(columns, target_encoders)
+        
+        if ml_model is None:
+            stock_status, priority = rule_based_status(X)
+            method = "Rule-based"
+        else:
+            stock_status, priority = decode_stock_predictions(micro_batcher.predict(X))
+            method = "XGBoost Native" if use_xgb_native else "Scikit-learn"
+        
+        predictions = [
+            {"sku": row.get('sku'), "stockStatusPred": status, "priorityPred": prio}
+            for row, status, prio in zip(rows, stock_status.tolist(), priority.tolist())
+        ]
+        
+        return jsonify({
+            "success": True,
+            "count": len(predictions),
+            "method": method,
+            "predictions": predictions
+        })
+    
+    except Exception as e:
+        print(f"Error in batch prediction: {e}")
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+
+def scenario_sweep_response(sku, product_name, baseline, adjustments, sweep, forecast_days):
+    """Sweep mode of /api/ml/scenario-planning: one baseline fit, every scenario derived from it"""
+    if not isinstance(sweep, dict):
+        return jsonify({"success": False, "error": "sweep must be an object of axis -> list of values"}), 400
+    try:
+        grid = scenario_grid(sweep, adjustments)
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    baseline_future_sales, baseline_metadata = forecast_with_arima(
+        daily_sales=baseline['dailySales'],
+        weekly_sales=baseline['weeklySales'],
+        steps=forecast_days
+    )
+    baseline_insights = generate_alerts({
+        'current_stock': baseline['currentStock'],
+        'lead_time': baseline['leadTime']
+    }, forecast_sales_data=baseline_future_sales, initial_stock=baseline['currentStock'])
+
+    with timed("scenario_sweep"):
+        scenarios = run_sweep(baseline_future_sales, baseline, grid)
+
+    log_event("scenario_sweep_done", sku=sku, scenarios=len(scenarios['rows']))
+
+    return jsonify({
+        "success": True,
+        "mode": "sweep",
+        "sku": sku,
+        "productName": product_name,
+        "baseline": {
+            "parameters": baseline,
+            # Scenario forecast = forecast × demandMultiplier × salesSpike
+            "forecast": np.asarray(baseline_future_sales, dtype=float).tolist(),
+            "insights": baseline_insights,
+            "totalDemand": float(np.sum(baseline_future_sales)),
+            "stockoutRisk": baseline_insights.get('risk_level', 'Low'),
+            "method": baseline_metadata['method']
+        },
+        "scenarios": {"count": len(scenarios['rows']), **scenarios}
+    })
+
+
 @app.route('/api/ml/scenario-planning', methods=['POST', 'OPTIONS'])
 def scenario_planning():
     """
     Run what-if scenario analysis by adjusting forecast parameters.
     Allows users to simulate: demand changes, lead time variations, etc.
+    
+    With a "sweep" object ({demandMultiplier: [...], leadTimeDelta: [...],
+    stockDelta: [...], salesSpike: [...]}) every combination is evaluated
+    against a single baseline fit and returned as a compact matrix.
     """
     if request.method == 'OPTIONS':
         return '', 204
     
     try:
         data = request.json
-        print(f" Received scenario planning request: {data}")
+        log_event("scenario_request", sku=data.get('sku'))
         
         # Extract baseline data
         sku = data.get('sku')
@@ -778,10 +1023,14 @@ def scenario_planning():
                 "error": "Daily sales must be greater than 0"
             }), 400
         
-        print(f"Scenario: Demand x{demand_multiplier}, Lead Time {lead_time_delta:+d} days, Stock {stock_delta:+d} units")
+        if data.get('sweep') is not None:
+            return scenario_sweep_response(sku, product_name, baseline, adjustments,
+                                           data['sweep'], forecast_days)
+        
+        log_event("scenario_adjustments", demand_multiplier=demand_multiplier,
+                  lead_time_delta=lead_time_delta, stock_delta=stock_delta)
         
         # === BASELINE FORECAST ===
-        print(" Generating BASELINE forecast...")
         baseline_future_sales, baseline_metadata = forecast_with_arima(
             daily_sales=baseline['dailySales'],
             weekly_sales=baseline['weeklySales'],
@@ -795,7 +1044,6 @@ def scenario_planning():
         }, forecast_sales_data=baseline_future_sales, initial_stock=baseline['currentStock'])
         
         # === SCENARIO FORECAST ===
-        print(f"Generating SCENARIO forecast with adjustments...")
         scenario_daily_sales = baseline['dailySales'] * demand_multiplier * sales_spike
         scenario_weekly_sales = baseline['weeklySales'] * demand_multiplier * sales_spike
         scenario_current_stock = baseline['currentStock'] + stock_delta
@@ -887,7 +1135,7 @@ def scenario_planning():
             }
         }
         
-        print(f" Scenario planning complete. Demand change: {demand_change_percent:+.1f}%")
+        log_event("scenario_done", sku=sku, demand_change_percent=round(demand_change_percent, 1))
         
         return jsonify(response)
     
@@ -900,6 +1148,14 @@ def scenario_planning():
         }), 500
 
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Latency histograms per route and per phase (Prometheus text format, or ?format=json)"""
+    if request.args.get('format') == 'json':
+        return jsonify({"success": True, "metrics": metrics_registry.snapshot()})
+    return Response(metrics_registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/ml/status', methods=['GET'])
 def model_status():
     """Get status of loaded models"""
@@ -908,87 +1164,141 @@ def model_status():
         "ml_model_type": "XGBoost Native" if use_xgb_native else "Scikit-learn",
         "encoders_loaded": target_encoders is not None,
         "arima_models_loaded": arima_models is not None,
-        "arima_models_count": len(arima_models) if arima_models else 0
+        "arima_models_count": len(arima_models) if arima_models else 0,
+        "forecast_cache": forecast_cache.stats(),
+        "micro_batcher": micro_batcher.stats(),
+        "mongo_pool": mongo_pool_stats(),
+        "supplier_models": supplier_model_registry.stats(),
+        "supplier_risk_snapshot": get_supplier_risk_snapshot(MONGODB_URI).stats(),
+        "supplier_history_store": get_supplier_history_store(MONGODB_URI, MONGO_DB_NAME).stats(),
+        "forecast_refresher": forecast_refresher.stats(),
+        "catalogue_version": catalogue_version.stats()
     })
 
 
+@app.route('/api/ml/forecast/bulk', methods=['POST', 'OPTIONS'])
+def start_bulk_forecast():
+    """Start a background job that forecasts the whole product catalogue"""
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        # Optional filters: explicit SKU list and/or category
+        query = {'sku': {'$nin': [None, '']}}
+        if data.get('skus'):
+            query['sku'] = {'$in': [str(s) for s in data['skus']]}
+        if data.get('category'):
+            query['category'] = data['category']
+        
+        try:
+            steps = int(data.get('forecastDays', 30))
+            batch_size = int(data.get('batchSize', BULK_DEFAULT_BATCH_SIZE))
+            workers = int(data.get('workers', BULK_DEFAULT_WORKERS))
+        except (TypeError, ValueError):
+            return jsonify({
+                "success": False,
+                "error": "forecastDays, batchSize and workers must be integers"
+            }), 400
+        
+        forecast_fn = partial(
+            build_product_forecast_doc,
+            steps=steps,
+            search_workers=1  # parallelism comes from the job's pool, not the order search
+        )
+        job = start_bulk_job(
+            products_collection(), forecasts_collection(), mongo_db()[BULK_JOBS_COLLECTION], forecast_fn,
+            query=query,
+            batch_size=batch_size,
+            workers=max(1, min(workers, BULK_MAX_WORKERS))
+        )
+        if job is None:
+            return jsonify({
+                "success": False,
+                "error": "A bulk forecast job is already running"
+            }), 409
+        
+        return jsonify({
+            "success": True,
+            "jobId": job.job_id,
+            "status": job.snapshot()
+        }), 202
+    except Exception as e:
+        print(f"Error starting bulk forecast: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/ml/forecast/bulk/<job_id>', methods=['GET'])
+def get_bulk_forecast_status(job_id):
+    """Progress and throughput of a bulk forecast job"""
+    status = get_bulk_job_status(mongo_db()[BULK_JOBS_COLLECTION], job_id)
+    if status is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "status": status})
+
+
+# Expired forecasts are served stale and refreshed in the background (forecast_refresh.py)
+forecast_refresher = ForecastRefresher(build_product_forecast_doc, products_collection, forecasts_collection)
+# Concurrent first requests for a SKU with no stored forecast share one fit
+forecast_build_flight = SingleFlight()
+
+
+def build_and_store_forecast(sku):
+    """Synchronous path for SKUs with no stored forecast yet; None if the product is unknown"""
+    with timed("mongo"):
+        product = products_collection().find_one({"sku": sku})
+    if not product:
+        return None
+    
+    forecast_doc = build_product_forecast_doc(product)
+    
+    # Store for future use
+    with timed("mongo"):
+        forecasts_collection().update_one({"sku": sku}, {"$set": forecast_doc}, upsert=True)
+    if '_id' in forecast_doc: del forecast_doc['_id']
+    return forecast_doc
+
+
 @app.route('/api/ml/forecast/<sku>', methods=['GET'])
 def get_forecast_by_sku(sku):
-    """Fetch stored forecast or generate a fresh one for the modal"""
+    """Fetch stored forecast (stale ones are refreshed in the background) or generate one for the modal"""
     # Sanitize SKU: only allow alphanumeric characters, hyphens, and underscores
     import re
     if not re.match(r'^[a-zA-Z0-9_\-]{1,64}$', sku):
         return jsonify({"success": False, "error": "Invalid SKU format"}), 400
 
     try:
-        # 1. Check if we already have a fresh forecast in DB
-        # Only use it if it's less than 24 hours old
-        yesterday = datetime.now() - timedelta(hours=24)
-        forecast = forecasts_collection.find_one({
-            "sku": sku,
-            "updatedAt": {"$gte": yesterday},
-            "aiInsights.avg_daily_demand": {"$exists": True} # Force re-generate if missing new fields
-        })
+        forecast_refresher.ensure_warmup_thread()
+        
+        # 1. Serve any stored forecast immediately, whatever its age
+        with timed("mongo"):
+            forecast = forecasts_collection().find_one(
+                {
+                    "sku": sku,
+                    "aiInsights.avg_daily_demand": {"$exists": True} # Force re-generate if missing new fields
+                },
+                {"refreshClaimedAt": 0}
+            )
         
         if forecast:
             forecast['_id'] = str(forecast['_id'])
             if 'userId' in forecast: forecast['userId'] = str(forecast['userId'])
+            fresh = forecast_refresher.is_fresh(forecast)
+            # Older than FORECAST_TTL_HOURS: refit in the background, this caller doesn't wait
+            refreshing = False if fresh else forecast_refresher.schedule(sku)
             return jsonify({
                 "success": True,
                 "forecast": forecast,
-                "source": "cache"
+                "source": "cache" if fresh else "stale",
+                "refreshing": refreshing
             })
 
-        # 2. If no fresh forecast, get product details and generate one
-        product = products_collection.find_one({"sku": sku})
-        if not product:
+        # 2. Nothing stored yet: generate one (deduplicated across concurrent callers)
+        forecast_doc = forecast_build_flight.do(sku, build_and_store_forecast, sku)
+        if forecast_doc is None:
             return jsonify({"success": False, "error": "Product not found"}), 404
         
-        # Extract params (matching schema from server.js)
-        current_stock = float(product.get('stock', 0))
-        daily_sales = float(product.get('dailySales', 5))
-        weekly_sales = float(product.get('weeklySales', 35))
-        lead_time = float(product.get('leadTime', 7))
-        reorder_level = float(product.get('reorderPoint', 10))
-        
-        # Generate forecast (using our standard internal logic)
-        future_sales, metadata = forecast_with_arima(daily_sales, weekly_sales, steps=30)
-        insights = generate_alerts({
-            'current_stock': current_stock,
-            'lead_time': lead_time
-        }, forecast_sales_data=future_sales, initial_stock=current_stock)
-        
-        current_date = datetime.now().strftime('%Y-%m-%d')
-        forecast_data = generate_forecast_data(future_sales, current_date, initial_stock=current_stock)
-        
-        # Build the document
-        forecast_doc = {
-            "sku": sku,
-            "productName": product.get('name', sku),
-            "currentStock": int(current_stock),
-            "stockStatusPred": insights.get('status', 'Healthy'),
-            "priorityPred": insights.get('risk_level', 'Low'),
-            "alert": insights.get('message', ''),
-            "aiInsights": insights,
-            "forecastData": forecast_data,
-            "historicalData": metadata.get("historical_sales", []),
-            "inputParams": {
-                "dailySales": daily_sales,
-                "weeklySales": weekly_sales,
-                "reorderLevel": reorder_level,
-                "leadTime": lead_time,
-                "brand": product.get('brand', 'Generic'),
-                "category": product.get('category', 'Misc')
-            },
-            "forecastMethod": metadata["method"],
-            "updatedAt": datetime.now()
-        }
-        
-        # Store for future use
-        forecasts_collection.update_one({"sku": sku}, {"$set": forecast_doc}, upsert=True)
-        
-        # Return prepared doc
-        if '_id' in forecast_doc: del forecast_doc['_id']
         return jsonify({
             "success": True,
             "forecast": forecast_doc,
@@ -1000,6 +1310,26 @@ def get_forecast_by_sku(sku):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route('/api/ml/forecast/warmup', methods=['POST', 'OPTIONS'])
+def warm_up_forecasts():
+    """Refresh, in the background, stored forecasts that expire within horizonHours"""
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        result = forecast_refresher.warm_up(
+            horizon_hours=float(data.get('horizonHours', WARMUP_HORIZON_HOURS)),
+            limit=int(data.get('limit', WARMUP_LIMIT))
+        )
+        return jsonify({"success": True, **result, "refresher": forecast_refresher.stats()}), 202
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        print(f"Error in forecast warm-up: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 
 # Register Supplier Intelligence Routes
 # Pass the MongoDB db so supplier routes can read live products data
@@ -1007,11 +1337,16 @@ def get_forecast_by_sku(sku):
 # app.register_blueprint(supplier_routes, url_prefix='/api/supplier')
 
 # ─── ROUTE 1: All supplier risk scores ────────────────────────────────
+# Both routes read the materialized snapshot kept fresh by a background
+# refresher (supplier_intelligence/risk_snapshot.py) instead of re-scoring
 @app.route('/api/supplier/risk-overview', methods=['GET'])
 def supplier_risk_overview():
     try:
-        scores = get_all_supplier_scores(MONGODB_URI)
-        return jsonify(scores), 200
+        view = get_supplier_risk_snapshot(MONGODB_URI).get()
+        response = Response(view.scores_json, status=200, mimetype='application/json')
+        response.headers['X-Data-As-Of'] = view.as_of
+        response.headers['X-Data-Age-Seconds'] = str(round(time.time() - view.refreshed_at, 1))
+        return response
     except Exception as e:
         print("!!! ERROR IN risk-overview API !!!")
         traceback.print_exc()
@@ -1021,36 +1356,162 @@ def supplier_risk_overview():
 @app.route('/api/supplier/kpis', methods=['GET'])
 def supplier_kpis():
     try:
-        scores = get_all_supplier_scores(MONGODB_URI)
-        active_risk  = sum(1 for s in scores if s['status'] in ('HIGH','CRITICAL'))
-        
-        if scores:
-            # Normalized display factors for KPIs
-            avg_delay    = round(sum(s['delayRiskScore'] for s in scores) / len(scores) * 0.15, 1)
-            quality_fail = round(sum(s['qualityRiskScore'] for s in scores) / len(scores) * 0.05, 1)
-        else:
-            avg_delay, quality_fail = 0, 0
-            
-        loss_risk    = active_risk * 10000
-        return jsonify({
-            'activeRiskEvents':       active_risk,
-            'avgDeliveryDelayDays':   avg_delay,
-            'qualityFailurePercent':  quality_fail,
-            'procurementLossRiskINR': loss_risk,
-        }), 200
+        view = get_supplier_risk_snapshot(MONGODB_URI).get()
+        return jsonify({**view.kpis, 'asOf': view.as_of}), 200
     except Exception as e:
         print("!!! ERROR IN supplier-kpis API !!!")
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+# ─── ROUTE 2b: Scores + KPIs in one response ──────────────────────────
+@app.route('/api/supplier/dashboard', methods=['GET'])
+def supplier_dashboard():
+    """Risk overview and KPIs from the same snapshot; ?refresh=true forces a (coalesced) refresh first"""
+    try:
+        snapshot = get_supplier_risk_snapshot(MONGODB_URI)
+        if request.args.get('refresh', 'false').lower() == 'true':
+            snapshot.refresh()
+        view = snapshot.get()
+        response = Response(view.dashboard_json, status=200, mimetype='application/json')
+        response.headers['X-Data-As-Of'] = view.as_of
+        response.headers['X-Data-Age-Seconds'] = str(round(time.time() - view.refreshed_at, 1))
+        return response
+    except Exception as e:
+        print("!!! ERROR IN supplier-dashboard API !!!")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
 # ─── ROUTE 3: 30-day history for one supplier ─────────────────────────
 @app.route('/api/supplier/history/<supplier_name>', methods=['GET'])
 def supplier_history(supplier_name):
+    """Risk trend; ?days= (default 45) and ?bucket=auto|raw|day|week (long windows are downsampled)"""
+    try:
+        days = int(request.args.get('days', 45))
+        bucket = request.args.get('bucket', 'auto')
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
     try:
-        history = get_supplier_history(supplier_name.strip(), MONGODB_URI, db_name=db.name)
+        history = get_supplier_history(supplier_name.strip(), MONGODB_URI, db_name=MONGO_DB_NAME,
+                                       days=days, bucket=bucket)
         return jsonify({'trend': history}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+# ─── ROUTE 4: Bulk ML risk prediction (streamed NDJSON) ───────────────
+supplier_risk_engine = RiskScoreEngine()
+
+def _supplier_risk_columns(rows):
+    """Columns for RiskScoreEngine.predict_risk_batch (blueprint /predict-risk defaults) and per-row errors (None if valid)"""
+    is_dict = [isinstance(row, dict) for row in rows]
+    frame = pd.DataFrame.from_records([row if ok else {} for row, ok in zip(rows, is_dict)], index=range(len(rows)))
+    def column(name, default):
+        if name not in frame:
+            return pd.Series(default, index=frame.index, dtype=object)
+        return frame[name].where(frame[name].notna(), default)
+
+    supplier = column('supplier', 'Unknown').astype(str)
+    category = column('category', 'General').astype(str)
+    qty      = pd.to_numeric(column('qty', 100), errors='coerce')
+    price    = pd.to_numeric(column('price', 50), errors='coerce')
+    pay_risk = pd.to_numeric(column('payment_risk', 0), errors='coerce')
+
+    numeric = (qty.notna() & price.notna() & pay_risk.notna()).to_numpy()
+    errors = [
+        None if ok and is_num else
+        'row must be an object' if not ok else
+        'qty, price and payment_risk must be numeric'
+        for ok, is_num in zip(is_dict, numeric)
+    ]
+    return supplier, category, qty, price, pay_risk, errors
+
+
+@app.route('/api/supplier/predict-risk/batch', methods=['POST'])
+def supplier_predict_risk_batch():
+    """
+    ML risk scores for many {supplier, category, qty, price, payment_risk} rows.
+
+    Streams application/x-ndjson: one {"type": "result"} line per row (in input
+    order, with its "index"), a {"type": "batch"} timing line after every
+    ?batch_size rows, and a final {"type": "summary"} line.
+    """
+    data = request.get_json(silent=True)
+    rows = data.get('rows') if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'success': False, 'error': 'rows must be a non-empty list'}), 400
+    if len(rows) > SUPPLIER_PREDICT_MAX_ROWS:
+        return jsonify({'success': False, 'error': f'At most {SUPPLIER_PREDICT_MAX_ROWS} rows per request'}), 413
+
+    try:
+        batch_size = max(1, min(int(request.args.get('batch_size', SUPPLIER_PREDICT_CHUNK_ROWS)), SUPPLIER_PREDICT_MAX_ROWS))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'batch_size must be an integer'}), 400
+
+    if not all(supplier_model_registry.preload().values()):
+        return jsonify({'success': False, 'error': 'Supplier risk models not loaded'}), 503
+
+    try:
+        supplier, category, qty, price, pay_risk, errors = _supplier_risk_columns(rows)
+        valid = np.array([e is None for e in errors], dtype=bool)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    def generate():
+        started = time.perf_counter()
+        scored = 0
+        for batch_no, start in enumerate(range(0, len(rows), batch_size)):
+            stop = min(start + batch_size, len(rows))
+            batch_start = time.perf_counter()
+            ok = np.flatnonzero(valid[start:stop]) + start
+            try:
+                result = supplier_risk_engine.predict_risk_batch(
+                    supplier.iloc[ok], category.iloc[ok], qty.iloc[ok], price.iloc[ok], pay_risk.iloc[ok])
+            except Exception as e:
+                traceback.print_exc()
+                yield json.dumps({'type': 'error', 'batch': batch_no, 'error': str(e)}) + '\n'
+                return
+            inference_ms = (time.perf_counter() - batch_start) * 1000
+
+            lines = []
+            by_index = dict(zip(ok.tolist(), zip(
+                result['risk_score'].tolist(), result['label'].tolist(), result['delay'].tolist(),
+                result['quality'].tolist(), result['fulfillment'].tolist())))
+            for i in range(start, stop):
+                scores = by_index.get(i)
+                if scores is None:
+                    error = {'type': 'result', 'index': i, 'error': errors[i]}
+                    if isinstance(rows[i], dict):
+                        error['supplier'] = supplier.iat[i]
+                    lines.append(json.dumps(error))
+                    continue
+                risk_score, label, delay, quality, fulfillment = scores
+                lines.append(json.dumps({
+                    'type': 'result', 'index': i,
+                    'supplier': supplier.iat[i], 'category': category.iat[i],
+                    'risk_score': risk_score, 'label': label,
+                    'breakdown': {'delay': delay, 'quality': quality, 'fulfillment': fulfillment},
+                }))
+            scored += len(ok)
+            lines.append(json.dumps({
+                'type': 'batch', 'batch': batch_no, 'rows': stop - start, 'scored': len(ok),
+                'inference_ms': round(inference_ms, 2),
+                'total_ms': round((time.perf_counter() - batch_start) * 1000, 2),
+            }))
+            yield '\n'.join(lines) + '\n'
+
+        yield json.dumps({
+            'type': 'summary', 'rows': len(rows), 'scored': scored, 'failed': len(rows) - scored,
+            'batches': -(-len(rows) // batch_size),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+            'models': {name: v.get('version') for name, v in supplier_model_registry.versions().items()},
+        }) + '\n'
+
+    response = Response(generate(), status=200, mimetype='application/x-ndjson')
+    response.headers['X-Accel-Buffering'] = 'no'   # let proxies pass batches through as they are produced
+    return response
+
+
 if __name__ == '__main__':
     print("Starting ML Prediction API...")
 
@@ -0,0 +1,209 @@
+"""
+Batched stock-status inference helpers.
+
+- Feature matrices are built column-wise from many request rows at once.
+- Categoricals are encoded with the precompiled lookup tables from encoders.py
+  instead of LabelEncoder.transform plus a per-row apply.
+- MicroBatcher coalesces concurrent prediction calls into a single model call.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+import numpy as np
+
+NUMERIC_FEATURES = [
+    "current_stock",
+    "daily_sales",
+    "weekly_sales",
+    "reorder_level",
+    "lead_time",
+    "days_to_empty",
+]
+
+CATEGORICAL_FEATURES = ["brand", "category", "location", "supplier_name"]
+
+FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
+# Request payload key for each model feature
+REQUEST_FIELDS = {
+    "current_stock": ("currentStock", 0),
+    "daily_sales": ("dailySales", 0),
+    "weekly_sales": ("weeklySales", 0),
+    "reorder_level": ("reorderLevel", 0),
+    "lead_time": ("leadTime", 0),
+    "brand": ("brand", "Unknown"),
+    "category": ("category", "Unknown"),
+    "location": ("location", "Unknown"),
+    "supplier_name": ("supplierName", "Unknown"),
+}
+
+
+class InvalidRowError(ValueError):
+    """A request row that cannot be turned into model features."""
+
+    def __init__(self, index, field, message):
+        super().__init__(f"rows[{index}]: {message}")
+        self.index = index
+        self.field = field
+
+
+def _numeric_column(rows, key, default):
+    values = np.empty(len(rows), dtype=float)
+    for i, row in enumerate(rows):
+        value = row.get(key)
+        if value is None:
+            value = default
+        try:
+            values[i] = float(value)
+        except (TypeError, ValueError):
+            raise InvalidRowError(i, key, f"{key} must be a number, got {value!r}") from None
+    return values
+
+
+def rows_to_columns(rows):
+    """
+    Turn request rows (camelCase dicts) into model feature columns.
+
+    Raises:
+        InvalidRowError: A row is not an object or a numeric field does not
+            convert to float.
+    """
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            raise InvalidRowError(i, None, f"must be an object, got {type(row).__name__}")
+
+    columns = {}
+    for feature, (key, default) in REQUEST_FIELDS.items():
+        if feature in CATEGORICAL_FEATURES:
+            columns[feature] = np.array([str(row.get(key, default)) for row in rows], dtype=object)
+        else:
+            columns[feature] = _numeric_column(rows, key, default)
+
+    daily = columns["daily_sales"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns["days_to_empty"] = np.where(daily > 0, columns["current_stock"] / daily, 999.0)
+    return columns
+
+
+def build_feature_matrix(columns, encoders):
+    """
+    Stack feature columns into one float32 matrix in FEATURES order.
+
+    Args:
+        columns: Dict of feature name -> 1-D array (see rows_to_columns)
+        encoders: Mapping of feature name -> CompiledEncoder
+    """
+    n = len(columns["current_stock"])
+    X = np.empty((n, len(FEATURES)), dtype=np.float32)
+    for j, feature in enumerate(FEATURES):
+        if feature in CATEGORICAL_FEATURES:
+            encoder = (encoders or {}).get(feature)
+            if encoder is None:
+                # No fitted encoder: codes are only meaningful within this batch
+                _, codes = np.unique(columns[feature], return_inverse=True)
+                X[:, j] = codes
+            else:
+                X[:, j] = encoder.transform(columns[feature])
+        else:
+            X[:, j] = columns[feature]
+    return X
+
+
+def rule_based_status(X):
+    """Vectorized version of the rule-based fallback used when no model is loaded."""
+    stock = X[:, FEATURES.index("current_stock")]
+    reorder = X[:, FEATURES.index("reorder_level")]
+    days_to_empty = X[:, FEATURES.index("days_to_empty")]
+
+    out_of_stock = stock == 0
+    understock = ~out_of_stock & (stock < reorder)
+    overstock = ~out_of_stock & ~understock & (stock > reorder * 3)
+
+    status = np.select([out_of_stock, understock, overstock], ["Out of Stock", "Understock", "Overstock"], "In Stock")
+    priority = np.select(
+        [out_of_stock, understock & (days_to_empty < 7), understock, overstock],
+        ["Very High", "High", "Medium", "Low"],
+        "Medium",
+    )
+    return status, priority
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent predict calls into one call of `predict_fn`.
+
+    Callers submit a 2-D feature matrix and block on the returned Future.  A
+    single worker thread drains the queue, waiting up to `max_wait_ms` for more
+    work once the first request arrives (or until `max_batch_rows` are queued),
+    runs `predict_fn` on the stacked matrix and hands each caller its slice.
+    """
+
+    def __init__(self, predict_fn, max_batch_rows=4096, max_wait_ms=2.0):
+        self.predict_fn = predict_fn
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, X):
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((X, future))
+        return future
+
+    def predict(self, X, timeout=30):
+        return self.submit(X).result(timeout=timeout)
+
+    def _ensure_worker(self):
+        # Started lazily so it is (re)created inside each forked gunicorn worker
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            rows = len(pending[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while rows < self.max_batch_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except Empty:
+                    break
+                pending.append(item)
+                rows += len(item[0])
+            self._dispatch(pending)
+
+    def _dispatch(self, pending):
+        try:
+            X = pending[0][0] if len(pending) == 1 else np.vstack([x for x, _ in pending])
+            output = self.predict_fn(X)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.requests += len(pending)
+        start = 0
+        for x, future in pending:
+            end = start + len(x)
+            future.set_result(output[start:end])
+            start = end
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,329 @@
+"""
+Micro-benchmarks and load test for the ML prediction API.
+
+Times the hot functions (forecast_with_arima, predict_stock_status,
+generate_alerts, generate_forecast_data, RiskScoreEngine.predict_risk) at
+several batch sizes, then drives the Flask endpoints through app.test_client()
+against an in-memory mongomock database.  Reports p50/p95/p99 latency,
+throughput and peak RSS, and writes everything to JSON so runs from different
+commits can be compared.
+
+Usage:
+    python benchmark_ml_api.py                          # full run
+    python benchmark_ml_api.py --quick                  # fewer iterations
+    python benchmark_ml_api.py --output before.json
+    python benchmark_ml_api.py --compare before.json    # print deltas vs a previous run
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPT_DIR)
+
+BATCH_SIZES = [1, 10, 100]
+ROW_BATCH_SIZES = [1, 100, 1000]
+
+
+# ─── Environment ──────────────────────────────────────────────────────────────
+
+def import_app():
+    """Import app.py with MongoDB swapped for an in-memory mongomock client."""
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("mongomock is required for benchmarking: pip install mongomock")
+
+    import pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+    os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017/benchmark")
+    # Keep runs independent of the shared on-disk forecast cache
+    os.environ["FORECAST_CACHE_DIR"] = ""
+
+    sys.path.insert(0, SCRIPT_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+    import app as app_module
+    return app_module
+
+
+def seed_products(app_module, count, rng):
+    app_module.products_collection().delete_many({})
+    app_module.products_collection().insert_many([
+        {
+            "sku": f"BENCH-{i:05d}",
+            "name": f"Benchmark Product {i}",
+            "category": ["Electronics", "Hardware", "Packaging"][i % 3],
+            "supplier": ["Apex Logistics", "Alpha Parts", "Nova Logistics"][i % 3],
+            "stock": int(rng.integers(0, 500)),
+            "dailySales": float(rng.uniform(1, 20)),
+            "weeklySales": float(rng.uniform(7, 140)),
+            "leadTime": int(rng.integers(2, 15)),
+            "reorderPoint": int(rng.integers(10, 60)),
+            "depotName": "Main Depot",
+        }
+        for i in range(count)
+    ])
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 2)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+# ─── Timing ───────────────────────────────────────────────────────────────────
+
+def run_case(name, fn, batch_size, iterations, warmup=2):
+    """Time `fn` (which processes `batch_size` items per call) and summarize."""
+    for _ in range(warmup):
+        fn()
+
+    samples = np.empty(iterations)
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples[i] = (time.perf_counter() - t0) * 1000
+    wall = time.perf_counter() - started
+
+    result = {
+        "name": name,
+        "batch_size": batch_size,
+        "iterations": iterations,
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "mean_ms": round(float(samples.mean()), 3),
+        "throughput_per_s": round(batch_size * iterations / wall, 2) if wall > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(f"  {name:<38} n={batch_size:<5} p50={result['p50_ms']:>9.3f}ms "
+          f"p95={result['p95_ms']:>9.3f}ms p99={result['p99_ms']:>9.3f}ms "
+          f"{result['throughput_per_s']:>10} items/s")
+    return result
+
+
+# ─── Function benchmarks ──────────────────────────────────────────────────────
+
+def bench_functions(app_module, iterations, rng):
+    results = []
+    print("\nFunction benchmarks")
+
+    for n in BATCH_SIZES:
+        inputs = [(float(rng.uniform(1, 20)), float(rng.uniform(7, 140))) for _ in range(n)]
+
+        def forecast_cold():
+            app_module.forecast_cache.clear()
+            for daily, weekly in inputs:
+                app_module.forecast_with_arima(daily, weekly, steps=30)
+
+        def forecast_warm():
+            for daily, weekly in inputs:
+                app_module.forecast_with_arima(daily, weekly, steps=30)
+
+        results.append(run_case("forecast_with_arima (cold)", forecast_cold, n, max(3, iterations // 10)))
+        results.append(run_case("forecast_with_arima (cached)", forecast_warm, n, iterations))
+
+    for n in ROW_BATCH_SIZES:
+        frame = pd.DataFrame({
+            "current_stock": rng.uniform(0, 500, n),
+            "daily_sales": rng.uniform(1, 20, n),
+            "weekly_sales": rng.uniform(7, 140, n),
+            "reorder_level": rng.uniform(10, 60, n),
+            "lead_time": rng.uniform(2, 15, n),
+            "brand": ["Generic"] * n,
+            "category": ["Electronics"] * n,
+            "location": ["Main Depot"] * n,
+            "supplier_name": ["Apex Logistics"] * n,
+        })
+        frame["days_to_empty"] = frame["current_stock"] / frame["daily_sales"]
+
+        def predict():
+            processed, features = app_module.preprocess_data(frame.copy())
+            X = processed[features]
+            if app_module.ml_model is None:
+                # Rule-based fallback only looks at the first row
+                for i in range(len(X)):
+                    app_module.predict_stock_status(X.iloc[i:i + 1])
+            else:
+                app_module.predict_stock_status(X)
+
+        results.append(run_case("predict_stock_status", predict, n, iterations))
+
+    forecast = rng.uniform(1, 20, 30)
+    for n in ROW_BATCH_SIZES:
+        stocks = rng.uniform(0, 500, n)
+
+        def alerts():
+            for stock in stocks:
+                app_module.generate_alerts({"current_stock": stock, "lead_time": 7},
+                                           forecast_sales_data=forecast, initial_stock=stock)
+
+        def forecast_points():
+            today = datetime.now().strftime("%Y-%m-%d")
+            for stock in stocks:
+                app_module.generate_forecast_data(forecast, today, initial_stock=stock)
+
+        results.append(run_case("generate_alerts", alerts, n, iterations))
+        results.append(run_case("generate_forecast_data", forecast_points, n, iterations))
+
+    results.extend(bench_risk_engine(iterations, rng))
+    return results
+
+
+def bench_risk_engine(iterations, rng):
+    from supplier_intelligence.risk_score_engine import RiskScoreEngine
+
+    engine = RiskScoreEngine()
+    probe = engine.predict_risk("Apex Logistics", "Electronics", 500, 50)
+    if "error" in probe:
+        print(f"  RiskScoreEngine.predict_risk skipped: {probe['error']}")
+        return [{"name": "RiskScoreEngine.predict_risk", "skipped": probe["error"]}]
+
+    results = []
+    for n in BATCH_SIZES:
+        qty = rng.integers(50, 1000, n)
+
+        def predict():
+            for q in qty:
+                engine.predict_risk("Apex Logistics", "Electronics", int(q), 50)
+
+        results.append(run_case("RiskScoreEngine.predict_risk", predict, n, iterations))
+    return results
+
+
+# ─── Endpoint load test ───────────────────────────────────────────────────────
+
+def bench_endpoints(app_module, iterations, rng):
+    print("\nEndpoint benchmarks (Flask test client + mongomock)")
+    client = app_module.app.test_client()
+    results = []
+
+    def expect_ok(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.request.path} -> {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+    payload = {
+        "sku": "BENCH-00001", "productName": "Benchmark Product 1",
+        "currentStock": 120, "dailySales": 8, "weeklySales": 56,
+        "reorderLevel": 30, "leadTime": 7, "forecastDays": 30,
+    }
+
+    cases = [
+        ("GET /api/health", lambda: client.get("/api/health"), 1),
+        ("GET /api/ml/products", lambda: client.get("/api/ml/products"), 1),
+        ("POST /api/ml/predict/custom", lambda: client.post("/api/ml/predict/custom", json=payload), 1),
+        ("GET /api/ml/forecast/<sku>", lambda: client.get("/api/ml/forecast/BENCH-00002"), 1),
+        ("POST /api/ml/scenario-planning", lambda: client.post("/api/ml/scenario-planning", json={
+            **payload, "adjustments": {"demandMultiplier": 1.2, "leadTimeDelta": 2}
+        }), 1),
+    ]
+
+    for n in ROW_BATCH_SIZES:
+        rows = [{
+            "sku": f"BENCH-{i:05d}", "currentStock": float(rng.uniform(0, 500)),
+            "dailySales": float(rng.uniform(1, 20)), "weeklySales": float(rng.uniform(7, 140)),
+            "reorderLevel": 30, "leadTime": 7,
+        } for i in range(n)]
+        cases.append(("POST /api/ml/predict/batch",
+                      lambda rows=rows: client.post("/api/ml/predict/batch", json={"rows": rows}), n))
+
+    for name, call, batch_size in cases:
+        try:
+            expect_ok(call())
+        except Exception as e:
+            print(f"  {name:<38} skipped: {e}")
+            results.append({"name": name, "batch_size": batch_size, "skipped": str(e)})
+            continue
+        results.append(run_case(name, call, batch_size, iterations))
+    return results
+
+
+# ─── Reporting ────────────────────────────────────────────────────────────────
+
+def compare(current, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    previous = {(r["name"], r.get("batch_size")): r for r in baseline.get("results", []) if "p50_ms" in r}
+    print(f"\nComparison against {baseline_path} (commit {baseline.get('meta', {}).get('commit')})")
+    for r in current["results"]:
+        old = previous.get((r["name"], r.get("batch_size")))
+        if old is None or "p50_ms" not in r:
+            continue
+        change = (r["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0.0
+        flag = "  REGRESSION" if change > 20 else ""
+        print(f"  {r['name']:<38} n={r['batch_size']:<5} p50 {old['p50_ms']:>9.3f} -> {r['p50_ms']:>9.3f}ms ({change:+.1f}%){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--quick", action="store_true", help="10 iterations per case")
+    parser.add_argument("--products", type=int, default=500, help="products seeded into mongomock")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=os.path.join(SCRIPT_DIR, "benchmark_results.json"))
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    args = parser.parse_args()
+
+    iterations = 10 if args.quick else args.iterations
+    rng = np.random.default_rng(args.seed)
+    np.random.seed(args.seed)
+
+    app_module = import_app()
+    app_module.load_models()
+    seed_products(app_module, args.products, rng)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "models_loaded": app_module.ml_model is not None,
+            "iterations": iterations,
+            "products": args.products,
+        },
+        "results": [],
+    }
+    report["results"].extend(bench_functions(app_module, iterations, rng))
+    report["results"].extend(bench_endpoints(app_module, iterations, rng))
+    report["meta"]["peak_rss_mb"] = peak_rss_mb()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
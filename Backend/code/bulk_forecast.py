@@ -0,0 +1,299 @@
+"""
+Bulk catalogue forecasting.
+
+A job streams product documents out of MongoDB in batches, forecasts each
+batch across a process pool and writes the results back with unordered
+bulk_write upserts.  Jobs run on a background thread; their progress and
+throughput (SKUs/sec) can be polled while they run.
+
+- The pool's processes are started with BULK_FORECAST_START_METHOD
+  (forkserver where available, else spawn), never forked from the threaded
+  server, so they cannot inherit locks that another thread held at fork time
+  (forecast cache, metrics, Mongo pool).
+- Job status lives in the `bulk_forecast_jobs` collection so every gunicorn
+  worker can report it.  Only one job runs at a time across all workers: a
+  lock document is claimed atomically and kept alive by a heartbeat, so a
+  worker that dies mid-job releases it after BULK_FORECAST_STALE_SECONDS.
+  Finished jobs are dropped from memory (and expire from the collection after
+  BULK_FORECAST_JOB_TTL_DAYS).
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import repeat
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+# Only the fields the forecast builder reads are pulled from MongoDB
+PRODUCT_PROJECTION = {
+    '_id': 0,
+    'sku': 1,
+    'name': 1,
+    'stock': 1,
+    'dailySales': 1,
+    'weeklySales': 1,
+    'leadTime': 1,
+    'reorderPoint': 1,
+    'brand': 1,
+    'category': 1,
+}
+
+DEFAULT_BATCH_SIZE = int(os.getenv("BULK_FORECAST_BATCH_SIZE", "500"))
+DEFAULT_WORKERS = int(os.getenv("BULK_FORECAST_WORKERS", str(os.cpu_count() or 1)))
+MAX_WORKERS = os.cpu_count() or 1
+START_METHOD = os.getenv(
+    "BULK_FORECAST_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn",
+)
+STALE_SECONDS = float(os.getenv("BULK_FORECAST_STALE_SECONDS", "600"))
+JOB_TTL_DAYS = float(os.getenv("BULK_FORECAST_JOB_TTL_DAYS", "7"))
+
+JOBS_COLLECTION = "bulk_forecast_jobs"
+ACTIVE_LOCK_ID = "active"
+
+# Jobs running in this process (finished ones are only kept in MongoDB)
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class BulkForecastJob:
+    def __init__(self, query=None, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS):
+        self.job_id = uuid.uuid4().hex
+        self.query = query or {}
+        self.batch_size = max(1, int(batch_size))
+        self.workers = max(1, int(workers))
+
+        self.state = "queued"
+        self.total = None
+        self.processed = 0
+        self.written = 0
+        self.failed = 0
+        self.errors = []
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self._started = None
+        self._finished = None
+        self._lock = threading.Lock()
+
+    def record_batch(self, processed, written, failures):
+        with self._lock:
+            self.processed += processed
+            self.written += written
+            self.failed += len(failures)
+            # Keep a bounded sample of failures for the status endpoint
+            self.errors.extend(failures[:max(0, 20 - len(self.errors))])
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = 0.0
+            if self._started is not None:
+                end = self._finished if self._finished is not None else time.perf_counter()
+                elapsed = end - self._started
+            return {
+                "jobId": self.job_id,
+                "state": self.state,
+                "total": self.total,
+                "processed": self.processed,
+                "written": self.written,
+                "failed": self.failed,
+                "progressPercent": round(self.processed / self.total * 100, 1) if self.total else None,
+                "elapsedSeconds": round(elapsed, 2),
+                "skusPerSecond": round(self.processed / elapsed, 2) if elapsed > 0 else 0.0,
+                "batchSize": self.batch_size,
+                "workers": self.workers,
+                "errors": list(self.errors),
+                "error": self.error,
+                "createdAt": self.created_at.isoformat(),
+                "startedAt": self.started_at.isoformat() if self.started_at else None,
+                "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+            }
+
+    def _mark_started(self):
+        with self._lock:
+            self.state = "running"
+            self.started_at = datetime.now()
+            self._started = time.perf_counter()
+
+    def _mark_finished(self, state, error=None):
+        with self._lock:
+            self.state = state
+            self.error = error
+            self.finished_at = datetime.now()
+            self._finished = time.perf_counter()
+
+
+def _safe_forecast(forecast_fn, product):
+    """Pool task: returns (sku, doc, error) so one bad product never kills a batch."""
+    sku = product.get('sku')
+    try:
+        return sku, forecast_fn(product), None
+    except Exception as e:
+        return sku, None, str(e)
+
+
+def _iter_batches(cursor, batch_size):
+    batch = []
+    for product in cursor:
+        if not product.get('sku'):
+            continue
+        batch.append(product)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _claim_lock(jobs_collection, job_id):
+    """Atomically become the active bulk job; False if another live job holds the lock."""
+    now = datetime.now()
+    try:
+        jobs_collection.update_one(
+            {"_id": ACTIVE_LOCK_ID, "$or": [
+                {"jobId": None},
+                {"heartbeatAt": {"$lt": now - timedelta(seconds=STALE_SECONDS)}},
+            ]},
+            {"$set": {"jobId": job_id, "heartbeatAt": now}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # The lock document exists and is held by a live job
+        return False
+    return True
+
+
+def _release_lock(jobs_collection, job_id):
+    jobs_collection.update_one({"_id": ACTIVE_LOCK_ID, "jobId": job_id}, {"$set": {"jobId": None}})
+
+
+def _save(job, jobs_collection):
+    """Persist the job's status and refresh its hold on the lock."""
+    status = job.snapshot()
+    status["updatedAt"] = datetime.now()
+    if job.finished_at is not None:
+        status["expireAt"] = job.finished_at + timedelta(days=JOB_TTL_DAYS)
+    jobs_collection.update_one({"_id": job.job_id}, {"$set": status}, upsert=True)
+    if job.finished_at is None:
+        jobs_collection.update_one({"_id": ACTIVE_LOCK_ID, "jobId": job.job_id},
+                                   {"$set": {"heartbeatAt": status["updatedAt"]}})
+
+
+def _write_batch(job, forecasts_collection, batch, results):
+    """Collect one batch of pool results and upsert them in a single unordered bulk_write."""
+    operations = []
+    failures = []
+    for sku, doc, error in results:
+        if error is not None:
+            failures.append({"sku": sku, "error": error})
+        else:
+            operations.append(UpdateOne({"sku": sku}, {"$set": doc}, upsert=True))
+
+    written = 0
+    if operations:
+        result = forecasts_collection.bulk_write(operations, ordered=False)
+        written = result.upserted_count + result.matched_count
+    job.record_batch(len(batch), written, failures)
+
+
+def run_bulk_forecast(job, products_collection, forecasts_collection, jobs_collection, forecast_fn):
+    """
+    Forecast every product matching job.query and upsert the results.
+
+    Args:
+        job: BulkForecastJob tracking progress (must hold the active lock)
+        products_collection: Source products collection
+        forecasts_collection: Destination forecasts collection
+        jobs_collection: Job status / lock collection
+        forecast_fn: Picklable callable(product) -> forecast document
+    """
+    job._mark_started()
+    try:
+        job.total = products_collection.count_documents(job.query)
+        _save(job, jobs_collection)
+        cursor = products_collection.find(job.query, PRODUCT_PROJECTION).batch_size(job.batch_size)
+        chunksize = max(1, job.batch_size // (job.workers * 4))
+
+        context = multiprocessing.get_context(START_METHOD)
+        with ProcessPoolExecutor(max_workers=job.workers, mp_context=context) as pool:
+            # Submit batch N+1 before draining/writing batch N so the pool never
+            # sits idle while MongoDB absorbs a bulk_write
+            pending = None
+            for batch in _iter_batches(cursor, job.batch_size):
+                results = pool.map(_safe_forecast, repeat(forecast_fn), batch, chunksize=chunksize)
+                if pending is not None:
+                    _write_batch(job, forecasts_collection, *pending)
+                    _save(job, jobs_collection)
+                pending = (batch, results)
+            if pending is not None:
+                _write_batch(job, forecasts_collection, *pending)
+
+        job._mark_finished("completed")
+    except Exception as e:
+        traceback.print_exc()
+        job._mark_finished("failed", error=str(e))
+    finally:
+        try:
+            _save(job, jobs_collection)
+            _release_lock(jobs_collection, job.job_id)
+        except Exception:
+            traceback.print_exc()
+        with _jobs_lock:
+            _jobs.pop(job.job_id, None)
+
+
+def start_bulk_job(products_collection, forecasts_collection, jobs_collection, forecast_fn, **job_options):
+    """
+    Start a bulk job on a background thread.
+
+    Returns:
+        The new BulkForecastJob, or None if another job is still running
+        (in any worker)
+    """
+    job = BulkForecastJob(**job_options)
+    if not _claim_lock(jobs_collection, job.job_id):
+        return None
+    try:
+        jobs_collection.create_index("expireAt", expireAfterSeconds=0)
+        _save(job, jobs_collection)
+    except Exception:
+        _release_lock(jobs_collection, job.job_id)
+        raise
+    with _jobs_lock:
+        _jobs[job.job_id] = job
+
+    thread = threading.Thread(
+        target=run_bulk_forecast,
+        args=(job, products_collection, forecasts_collection, jobs_collection, forecast_fn),
+        name=f"bulk-forecast-{job.job_id[:8]}",
+        daemon=True,
+    )
+    thread.start()
+    return job
+
+
+def get_job_status(jobs_collection, job_id):
+    """Status of a job run by any worker (live figures if it runs in this one), or None."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is not None:
+        return job.snapshot()
+    if job_id == ACTIVE_LOCK_ID:
+        return None
+    status = jobs_collection.find_one({"_id": job_id}, {"_id": 0, "expireAt": 0})
+    if status is None:
+        return None
+    updated_at = status.pop("updatedAt", None)
+    if (status.get("state") in ("queued", "running") and isinstance(updated_at, datetime)
+            and updated_at < datetime.now() - timedelta(seconds=STALE_SECONDS)):
+        # The worker running it stopped reporting (crashed or was recycled)
+        status["state"] = "abandoned"
+    return status
@@ -0,0 +1,186 @@
+"""
+Version counter for the products catalogue, used as the ETag of /api/ml/products.
+
+The version lives in a counter document (`catalogue_versions`, one per
+collection), so every gunicorn worker and restart agrees on it.  It is bumped by
+a background watcher that each worker starts lazily:
+
+- On replica sets (Atlas) a change stream on the collection bumps the counter
+  once per burst of changes, whichever service (Node or Python) made them.
+- Standalone servers have no change streams; instead a cheap signature
+  (document count, newest _id, total stock, newest updatedAt) is compared with
+  the one stored next to the counter every CATALOGUE_POLL_SECONDS.  The
+  watcher also falls back to polling when watch() raises OperationFailure
+  (e.g. a user without the changeStream privilege) or after
+  CATALOGUE_WATCH_MAX_FAILURES consecutive failures of any other kind.
+
+The signature is also checked when the watcher starts, which catches changes
+made while no worker was running.  current() is cached for
+CATALOGUE_VERSION_CACHE_SECONDS, so a conditional GET on an unchanged list
+usually costs no database round trip at all.
+"""
+
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+COUNTER_COLLECTION = "catalogue_versions"
+POLL_SECONDS = float(os.getenv("CATALOGUE_POLL_SECONDS", "30"))
+VERSION_CACHE_SECONDS = float(os.getenv("CATALOGUE_VERSION_CACHE_SECONDS", "1"))
+RETRY_SECONDS = 5
+# Consecutive watcher failures before giving up on change streams
+WATCH_MAX_FAILURES = int(os.getenv("CATALOGUE_WATCH_MAX_FAILURES", "3"))
+
+
+class CatalogueVersion:
+    """
+    Args:
+        collection: zero-argument callable returning the catalogue collection,
+            looked up on every use so each process works through its own
+            MongoClient
+    """
+
+    def __init__(self, collection, poll_seconds=POLL_SECONDS, cache_seconds=VERSION_CACHE_SECONDS):
+        self._collection = collection
+        self.name = collection().name
+        self.poll_seconds = poll_seconds
+        self.cache_seconds = cache_seconds
+
+        self._lock = threading.Lock()
+        self._cached = None
+        self._cached_at = 0.0
+        self._thread = None
+        self.mode = None
+        self.bumps = 0
+        self.failures = 0
+        self.last_error = None
+
+    @property
+    def collection(self):
+        return self._collection()
+
+    @property
+    def counters(self):
+        return self.collection.database[COUNTER_COLLECTION]
+
+    # ── Reads ─────────────────────────────────────────────────────────
+
+    def current(self):
+        """Current catalogue version (int)."""
+        now = time.monotonic()
+        if self._cached is not None and now - self._cached_at < self.cache_seconds:
+            return self._cached
+        doc = self.counters.find_one({"_id": self.name}, {"version": 1})
+        version = doc["version"] if doc else self.bump()
+        self._cached, self._cached_at = version, now
+        return version
+
+    # ── Writes ────────────────────────────────────────────────────────
+
+    def bump(self, signature=None):
+        update = {"$inc": {"version": 1}, "$set": {"updatedAt": datetime.utcnow()}}
+        if signature is not None:
+            update["$set"]["signature"] = signature
+        doc = self.counters.find_one_and_update(
+            {"_id": self.name}, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        self.bumps += 1
+        self._cached, self._cached_at = doc["version"], time.monotonic()
+        return doc["version"]
+
+    def _signature(self):
+        rows = list(self.collection.aggregate([
+            {"$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "max_id": {"$max": "$_id"},
+                "stock": {"$sum": "$stock"},
+                "updated": {"$max": "$updatedAt"},
+            }}
+        ]))
+        if not rows:
+            return {"count": 0}
+        row = rows[0]
+        return {
+            "count": row["count"],
+            "max_id": str(row["max_id"]),
+            "stock": row["stock"],
+            "updated": row["updated"].isoformat() if isinstance(row["updated"], datetime) else None,
+        }
+
+    def check_signature(self):
+        """Bump the version if the catalogue signature differs from the stored one."""
+        signature = self._signature()
+        stored = self.counters.find_one({"_id": self.name}, {"signature": 1})
+        if stored is not None and stored.get("signature") == signature:
+            return False
+        self.bump(signature)
+        return True
+
+    # ── Watcher ───────────────────────────────────────────────────────
+
+    def ensure_watcher(self):
+        # Started lazily so each forked gunicorn worker runs its own
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="catalogue-version", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            self.check_signature()
+        except Exception as e:
+            self.last_error = str(e)
+        while True:
+            try:
+                if self.mode == "poll":
+                    time.sleep(self.poll_seconds)
+                    self.check_signature()
+                else:
+                    self._watch()
+                self.failures = 0
+            except Exception as e:
+                self.last_error = str(e)
+                self.failures += 1
+                if self.failures == 1:
+                    # Once per run of consecutive failures, not on every retry
+                    traceback.print_exc()
+                if self.mode == "poll":
+                    continue
+                if (isinstance(e, (OperationFailure, NotImplementedError))
+                        or self.failures >= WATCH_MAX_FAILURES):
+                    print(f" Catalogue change stream unavailable ({e}); "
+                          f"polling every {self.poll_seconds:g}s")
+                    self.mode = "poll"
+                    self.failures = 0
+                else:
+                    time.sleep(RETRY_SECONDS)
+
+    def _watch(self):
+        with self.collection.watch() as stream:
+            self.mode = "change_stream"
+            self.failures = 0
+            while stream.alive:
+                if stream.try_next() is None:
+                    time.sleep(0.5)
+                    continue
+                # Collapse a burst (e.g. a bulk import) into one bump
+                while stream.try_next() is not None:
+                    pass
+                self.bump()
+
+    def stats(self):
+        return {
+            "version": self._cached,
+            "mode": self.mode,
+            "bumps": self.bumps,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,86 @@
+"""
+Immutable, precompiled categorical encoders.
+
+load_models() compiles the fitted LabelEncoders once at startup.  The compiled
+form keeps a hash lookup (dict for single values, pd.Index for arrays), an
+"Unknown" fallback code and a read-only classes array, so transform and
+inverse_transform never scan or mutate shared state.  That makes them safe to
+share between request threads and, when compiled before gunicorn forks,
+between workers via copy-on-write.
+"""
+
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+UNKNOWN_LABEL = "Unknown"
+
+
+class CompiledEncoder:
+    __slots__ = ("classes_", "unknown_code", "_codes", "_index")
+
+    def __init__(self, classes, unknown_label=UNKNOWN_LABEL):
+        # Plain Python scalars so decoded labels serialize cleanly
+        classes = [c.item() if isinstance(c, np.generic) else c for c in classes]
+        codes = {label: i for i, label in enumerate(classes)}
+
+        # Unseen values map to "Unknown": its own code if the encoder was fitted
+        # with it, otherwise one past the last class (the code LabelEncoder
+        # produced once "Unknown" had been appended to classes_)
+        if unknown_label not in codes:
+            codes[unknown_label] = len(classes)
+            classes.append(unknown_label)
+
+        labels = np.empty(len(classes), dtype=object)
+        labels[:] = classes
+        labels.setflags(write=False)
+
+        object.__setattr__(self, "classes_", labels)
+        object.__setattr__(self, "unknown_code", codes[unknown_label])
+        object.__setattr__(self, "_codes", MappingProxyType(codes))
+        index = pd.Index(labels, dtype=object)
+        index.get_indexer(labels[:1])  # build the hash table now, not on first request
+        object.__setattr__(self, "_index", index)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledEncoder is immutable")
+
+    def __reduce__(self):
+        return (CompiledEncoder, (list(self.classes_),))
+
+    def __len__(self):
+        return len(self.classes_)
+
+    @classmethod
+    def from_label_encoder(cls, encoder):
+        return cls(encoder.classes_)
+
+    def transform_one(self, value):
+        """O(1) code for a single value."""
+        return self._codes.get(value, self.unknown_code)
+
+    def transform(self, values):
+        """Vectorized codes for an iterable of values."""
+        codes = self._index.get_indexer(np.asarray(values, dtype=object))
+        return np.where(codes < 0, self.unknown_code, codes)
+
+    def inverse_transform(self, codes):
+        """Vectorized labels; out-of-range codes decode to "Unknown"."""
+        codes = np.asarray(codes).astype(np.int64)
+        valid = (codes >= 0) & (codes < len(self.classes_))
+        labels = self.classes_[np.clip(codes, 0, len(self.classes_) - 1)]
+        return np.where(valid, labels, self.classes_[self.unknown_code])
+
+
+def compile_encoders(encoders):
+    """
+    Compile a dict of fitted LabelEncoders into a read-only mapping.
+
+    Returns:
+        MappingProxyType of name -> CompiledEncoder
+    """
+    return MappingProxyType({
+        name: encoder if isinstance(encoder, CompiledEncoder) else CompiledEncoder.from_label_encoder(encoder)
+        for name, encoder in encoders.items()
+    })
@@ -0,0 +1,237 @@
+"""
+Array-based alerts and forecast points for many SKUs at once.
+
+generate_alerts() and generate_forecast_data() in app.py are thin wrappers
+around these for a single forecast; bulk callers pass an (n_skus, steps)
+matrix of daily forecasts (one row per SKU, non-negative, same horizon).
+
+- Stock depletion is one cumulative difference per row: the first day the
+  remaining stock reaches zero is an argmax over the row, and projected stock
+  is that running remainder clipped at zero.  np.subtract.accumulate is used
+  rather than stock - np.cumsum(...) so every value is bit-identical to the
+  day-by-day loops it replaces.
+- The forecast dates and confidence decay are computed once per call, not
+  per SKU and day.
+- Values that the single-SKU code rounded with round(x, n) are still rounded
+  with Python's round(), so payloads are unchanged down to int vs float.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Horizon (days) beyond which no stock-out date is reported
+STOCK_OUT_DATE_HORIZON = 365
+
+# risk_level by alert_decisions() level index
+RISK_LEVELS = ("Low", "Medium", "High", "Critical")
+
+
+def _as_matrix(forecasts):
+    forecasts = np.asarray(forecasts, dtype=float)
+    return forecasts.reshape(1, -1) if forecasts.ndim == 1 else forecasts
+
+
+def _remaining_stock(forecasts, initial_stock):
+    """(n, steps) stock left after each day, computed exactly like `stock -= sale`."""
+    initial_stock = np.asarray(initial_stock, dtype=float).reshape(-1, 1)
+    return np.subtract.accumulate(np.hstack([initial_stock, forecasts]), axis=1)[:, 1:]
+
+
+def alert_arrays(forecasts, current_stock, lead_time):
+    """
+    Vectorized core of generate_alerts.
+
+    Returns:
+        Dict of (n,) arrays: total, avg, runs_out, first_day, coverage
+    """
+    forecasts = _as_matrix(forecasts)
+    steps = forecasts.shape[1]
+    current_stock = np.asarray(current_stock, dtype=float)
+
+    out = _remaining_stock(forecasts, current_stock) <= 0
+    runs_out = out.any(axis=1)
+    # Sequential sum, same order as sum() over the list
+    total = np.cumsum(forecasts, axis=1)[:, -1]
+    avg = total / steps
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coverage = np.where(avg > 0, current_stock / avg, 999.0)
+    return {
+        "total": total,
+        "avg": avg,
+        "runs_out": runs_out,
+        "first_day": out.argmax(axis=1) + 1,
+        "coverage": coverage,
+    }
+
+
+def alert_decisions(forecasts, current_stock, lead_time):
+    """
+    The generate_alerts() business rules on arrays: ETA, risk level, reorder
+    quantity and reorder point for every row.  generate_alerts_batch() and
+    the scenario sweep are both built on this, so the rules live in one place.
+
+    Args:
+        forecasts: (n, steps) daily forecasts, steps > 0
+        current_stock: (n,) stock on hand
+        lead_time: (n,) lead times in days
+
+    Returns:
+        Dict with total (n,) array, eta (list, int day or 1-dp float as
+        reported), eta_values (n,) float array, level (n,) int array indexing
+        RISK_LEVELS, recommended_reorder, avg_daily_demand and reorder_point
+        (lists)
+    """
+    forecasts = _as_matrix(forecasts)
+    n = forecasts.shape[0]
+    current_stock = np.broadcast_to(np.asarray(current_stock, dtype=float), (n,))
+    lead_time = np.broadcast_to(np.asarray(lead_time, dtype=float), (n,))
+
+    arrays = alert_arrays(forecasts, current_stock, lead_time)
+    total, runs_out = arrays["total"], arrays["runs_out"]
+
+    # ETA: whole day of the first stock-out, else stock / average demand (1 dp)
+    eta = [
+        int(day) if out else (round(float(cover), 1) if avg > 0 else 999)
+        for out, day, cover, avg in zip(runs_out.tolist(), arrays["first_day"].tolist(),
+                                        arrays["coverage"].tolist(), arrays["avg"].tolist())
+    ]
+    eta_values = np.asarray(eta, dtype=float)
+
+    critical = current_stock <= 0
+    high = ~critical & (eta_values < lead_time)
+    medium = ~critical & ~high & (eta_values < 30)
+    level = np.select([critical, high, medium], [3, 2, 1], 0)
+    reorder = np.select(
+        [critical, high, medium],
+        [np.rint(total * 1.2), np.rint((total - current_stock) * 1.1), np.rint(total * 0.8)],
+        0,
+    ).astype(int).tolist()
+
+    avg_daily = [round(v, 2) for v in arrays["avg"].tolist()]
+    reorder_point = np.rint(np.asarray(avg_daily) * lead_time * 1.5).astype(int).tolist()
+
+    return {
+        "total": total,
+        "eta": eta,
+        "eta_values": eta_values,
+        "level": level,
+        "recommended_reorder": reorder,
+        "avg_daily_demand": avg_daily,
+        "reorder_point": reorder_point,
+    }
+
+
+def generate_alerts_batch(forecasts, current_stock, lead_time, now=None):
+    """
+    generate_alerts() for many SKUs.
+
+    Args:
+        forecasts: (n, steps) daily forecasts (steps may be 0)
+        current_stock: (n,) stock on hand
+        lead_time: (n,) lead times in days
+        now: Reference time for predicted_stock_out_date (default datetime.now())
+
+    Returns:
+        List of n insights dicts, identical to generate_alerts()
+    """
+    forecasts = _as_matrix(forecasts)
+    n, steps = forecasts.shape
+    current_stock = np.broadcast_to(np.asarray(current_stock, dtype=float), (n,))
+    lead_time = np.broadcast_to(np.asarray(lead_time, dtype=float), (n,))
+
+    if steps == 0:
+        return [{
+            "status": "Healthy",
+            "eta_days": None,
+            "recommended_reorder": 0,
+            "risk_level": "Low",
+            "message": "Stock levels are optimal.",
+            "avg_daily_demand": 0,
+            "reorder_point": 0,
+            "predicted_stock_out_date": "N/A",
+        } for _ in range(n)]
+
+    decisions = alert_decisions(forecasts, current_stock, lead_time)
+    eta, eta_values, level = decisions["eta"], decisions["eta_values"], decisions["level"].tolist()
+    reorder = decisions["recommended_reorder"]
+
+    now = now or datetime.now()
+    has_date = (eta_values > 0) & (eta_values < STOCK_OUT_DATE_HORIZON)
+    offsets = np.rint(np.where(has_date, eta_values, 0) * 86400e6).astype("timedelta64[us]")
+    dates = (np.datetime64(now, "us") + offsets).astype("datetime64[D]").astype(str).tolist()
+
+    insights = []
+    for i in range(n):
+        if level[i] == 3:
+            status = "OUT OF STOCK"
+            message = f"Immediate restock required. Recommended: {reorder[i]} units."
+        elif level[i] == 2:
+            status = "At Risk"
+            message = f"Stock-out predicted in {eta[i]} days. Reorder {reorder[i]} units now."
+        elif level[i] == 1:
+            status = "Warning"
+            message = f"Inventory sufficient for {eta[i]} days. Plan reorder soon."
+        else:
+            status = "Healthy"
+            message = "Stock levels are optimal."
+        insights.append({
+            "status": status,
+            "eta_days": eta[i],
+            "recommended_reorder": reorder[i],
+            "risk_level": RISK_LEVELS[level[i]],
+            "message": message,
+            "avg_daily_demand": decisions["avg_daily_demand"][i],
+            "reorder_point": decisions["reorder_point"][i],
+            "predicted_stock_out_date": dates[i] if has_date[i] else "N/A",
+        })
+    return insights
+
+
+def parse_base_date(current_date):
+    """Forecast start date from a YYYY-MM-DD / ISO string or datetime (None if unparseable)."""
+    if not isinstance(current_date, str):
+        return current_date
+    try:
+        return datetime.strptime(current_date, '%Y-%m-%d')
+    except ValueError:
+        try:
+            return datetime.fromisoformat(current_date.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+
+
+def generate_forecast_data_batch(forecasts, base_date, initial_stock):
+    """
+    generate_forecast_data() for many SKUs sharing one start date.
+
+    Args:
+        forecasts: (n, steps) daily forecasts
+        base_date: datetime of the day before the first forecast day
+        initial_stock: (n,) starting stock
+
+    Returns:
+        List of n lists of forecast points
+    """
+    forecasts = _as_matrix(forecasts)
+    n, steps = forecasts.shape
+    initial_stock = np.broadcast_to(np.asarray(initial_stock, dtype=float), (n,))
+
+    dates = [(base_date + timedelta(days=i + 1)).strftime('%Y-%m-%d') for i in range(steps)]
+    # Confidence decreases over time (more uncertainty in distant future)
+    confidence = np.maximum(0.75, 0.95 - 0.004 * np.arange(steps)).tolist()
+    projected = np.maximum(_remaining_stock(forecasts, initial_stock), 0).tolist()
+
+    return [
+        [
+            {
+                "date": date,
+                "predicted": predicted,
+                "projected_stock": stock,
+                "actual": None,
+                "confidence": conf,
+            }
+            for date, predicted, stock, conf in zip(dates, row, stock_row, confidence)
+        ]
+        for row, stock_row in zip(forecasts.tolist(), projected)
+    ]
@@ -0,0 +1,243 @@
+"""
+Bounded LRU + TTL memoization cache for forecast_with_arima results.
+
+Two tiers:
+  1. In-process  – OrderedDict LRU, answers repeat requests in microseconds.
+  2. Shared      – one JSON file per key in a directory every gunicorn worker
+                   can see, so a forecast fitted by one worker is reused by the
+                   others.  Files are written atomically and pruned by mtime.
+                   The directory must be private to the current user (mode
+                   0700, owned by us); otherwise the shared tier is disabled,
+                   since anything in it is served as a forecast.
+
+Keys are built from the sales inputs quantized to a few significant digits,
+the horizon and the candidate ARIMA orders, so near-identical requests share
+one entry.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Part of every key; bump when the cached metadata changes shape so entries
+# written by an older version are not served
+KEY_VERSION = 2
+
+
+def _quantize(value, digits):
+    """Round to `digits` significant digits and return a stable string."""
+    return np.format_float_positional(float(value), precision=digits, unique=False, fractional=False, trim="-")
+
+
+class ForecastCache:
+    def __init__(self, max_entries=1024, ttl_seconds=900, shared_dir=None,
+                 shared_max_entries=10000, significant_digits=3):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared_dir = shared_dir
+        self.shared_max_entries = shared_max_entries
+        self.significant_digits = significant_digits
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "shared_evictions": 0,
+        }
+        self._shared_writes = 0
+
+        if self.shared_dir and not _private_dir(self.shared_dir):
+            print(f" Forecast cache: {self.shared_dir} is not a private directory owned by this user; "
+                  f"shared tier disabled")
+            self.shared_dir = None
+
+    # ─── Keys ────────────────────────────────────────────────────────────
+
+    def make_key(self, daily_sales, weekly_sales, steps, orders):
+        digits = self.significant_digits
+        order_part = ",".join("".join(str(x) for x in o) for o in orders)
+        return (f"v{KEY_VERSION}|{_quantize(daily_sales, digits)}|{_quantize(weekly_sales, digits)}|"
+                f"{int(steps)}|{order_part}")
+
+    # ─── Public API ──────────────────────────────────────────────────────
+
+    def get(self, key):
+        """Return (forecast, metadata) copies for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, forecast, metadata = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return forecast.copy(), copy.deepcopy(metadata)
+                del self._entries[key]
+                self._counters["expirations"] += 1
+
+        shared = self._read_shared(key, now)
+        with self._lock:
+            if shared is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["shared_hits"] += 1
+            self._store(key, shared[0], shared[1], shared[2])
+        return shared[1].copy(), copy.deepcopy(shared[2])
+
+    def set(self, key, forecast, metadata):
+        forecast = np.array(forecast, dtype=float)
+        forecast.setflags(write=False)
+        metadata = copy.deepcopy(metadata)
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, expires_at, forecast, metadata)
+        self._write_shared(key, forecast, metadata)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["shared_hits"]) / lookups, 4) if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["shared_tier"] = self.shared_dir is not None
+        return stats
+
+    # ─── Internals ───────────────────────────────────────────────────────
+
+    def _store(self, key, expires_at, forecast, metadata):
+        """Insert under the lock, evicting least-recently-used entries."""
+        self._entries[key] = (expires_at, forecast, metadata)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _shared_path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.shared_dir, f"{digest}.json")
+
+    def _read_shared(self, key, now):
+        if not self.shared_dir:
+            return None
+        path = self._shared_path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl_seconds <= now:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if payload.get("key") != key:
+            return None
+        forecast = np.array(payload["forecast"], dtype=float)
+        forecast.setflags(write=False)
+        return payload["expires_at"], forecast, payload["metadata"]
+
+    def _write_shared(self, key, forecast, metadata):
+        if not self.shared_dir:
+            return
+        payload = {
+            "key": key,
+            "expires_at": time.time() + self.ttl_seconds,
+            "forecast": forecast.tolist(),
+            "metadata": metadata,
+        }
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.shared_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(payload, f, default=_json_default)
+            os.replace(tmp_path, self._shared_path(key))
+        except (OSError, TypeError, ValueError):
+            return
+
+        with self._lock:
+            self._shared_writes += 1
+            prune = self._shared_writes % 100 == 0
+        if prune:
+            self._prune_shared()
+
+    def _prune_shared(self):
+        """Drop the oldest shared files once the directory exceeds its bound."""
+        try:
+            files = [e for e in os.scandir(self.shared_dir) if e.name.endswith(".json")]
+        except OSError:
+            return
+        excess = len(files) - self.shared_max_entries
+        if excess <= 0:
+            return
+        files.sort(key=lambda e: e.stat().st_mtime)
+        removed = 0
+        for entry in files[:excess]:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._counters["shared_evictions"] += removed
+
+
+def _private_dir(path):
+    """Create `path` with mode 0700 if needed and check nobody else can write to it."""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if not stat.S_ISDIR(st.st_mode):
+        return False
+    if hasattr(os, "getuid"):
+        if st.st_uid != os.getuid():
+            return False
+        if stat.S_IMODE(st.st_mode) & 0o077:
+            try:
+                os.chmod(path, 0o700)
+            except OSError:
+                return False
+    return True
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, tuple):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def cache_from_env():
+    """Build the process-wide cache from FORECAST_CACHE_* environment variables."""
+    # Per-user default so another local account cannot claim the directory first
+    user = os.getuid() if hasattr(os, "getuid") else os.getenv("USERNAME", "default")
+    shared_dir = os.getenv(
+        "FORECAST_CACHE_DIR",
+        os.path.join(tempfile.gettempdir(), f"sangrahak-forecast-cache-{user}"),
+    )
+    return ForecastCache(
+        max_entries=int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", "1024")),
+        ttl_seconds=int(os.getenv("FORECAST_CACHE_TTL_SECONDS", "900")),
+        shared_dir=shared_dir or None,
+        shared_max_entries=int(os.getenv("FORECAST_CACHE_SHARED_MAX_ENTRIES", "10000")),
+        significant_digits=int(os.getenv("FORECAST_CACHE_SIG_DIGITS", "3")),
+    )
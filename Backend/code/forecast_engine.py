@@ -0,0 +1,205 @@
+"""
+ARIMA order search engine used by forecast_with_arima.
+
+Every candidate order shares the same differencing, so the series is
+differenced once and each candidate is fitted as an ARMA(p, q) on the
+differenced data.  That is equivalent to ARIMA(p, d, q) with no trend up to
+initialization: statsmodels' diffuse start for the integrated model gives a
+slightly different likelihood / AIC, and the comparison between candidates is
+made on the differenced fits throughout.
+
+Candidates are evaluated in waves, one wave per complexity level (p + q,
+split into chunks of at most `workers`), simplest first, with the orders of a
+wave fitted in parallel on a process pool.  Each wave is warm-started from the
+best parameters found so far, and the search stops as soon as a wave no longer
+improves the AIC meaningfully, so with the default candidates a series that
+(0, 1, 1) already fits well costs two fits rather than five.
+
+The pool's processes are started with ARIMA_SEARCH_START_METHOD (forkserver
+where available, else spawn): the search runs on the server's request and
+background threads, and a forked worker could inherit a lock another thread
+held at fork time.
+"""
+
+import multiprocessing
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from statsmodels.tsa.arima.model import ARIMA
+
+# Minimum AIC gain a wave must deliver for the search to keep going.
+# A difference of ~2 AIC units is the usual threshold for "meaningfully better".
+MIN_AIC_GAIN = float(os.getenv("ARIMA_MIN_AIC_GAIN", "2.0"))
+DEFAULT_WORKERS = int(os.getenv("ARIMA_SEARCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+START_METHOD = os.getenv(
+    "ARIMA_SEARCH_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn",
+)
+
+_pool = None
+_pool_pid = None
+
+
+def _get_pool(workers):
+    """Return a process pool owned by the current process (recreated after fork)."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        context = multiprocessing.get_context(START_METHOD)
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def shutdown_pool():
+    """Release the search pool (used on shutdown and by tests/benchmarks)."""
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _pool_pid = None
+
+
+def _difference(series, d):
+    return np.diff(series, n=d) if d > 0 else series
+
+
+def _integrate(diff_forecast, series, d):
+    """Undo `d` rounds of differencing using the last observed values."""
+    forecast = np.asarray(diff_forecast, dtype=float)
+    for k in range(d, 0, -1):
+        level = _difference(series, k - 1)
+        forecast = level[-1] + np.cumsum(forecast)
+    return forecast
+
+
+def _warm_start(best, order):
+    """Pad/trim the best (ar, ma, sigma2) parameters to the shape of `order`."""
+    if best is None:
+        return None
+    p, d, q = order
+    if d != best["order"][1]:
+        return None
+    ar = np.zeros(p)
+    ma = np.zeros(q)
+    n = min(p, len(best["ar"]))
+    ar[:n] = best["ar"][:n]
+    n = min(q, len(best["ma"]))
+    ma[:n] = best["ma"][:n]
+    head = [best["const"]] if d == 0 else []
+    return np.concatenate([head, ar, ma, [best["sigma2"]]])
+
+
+def _fit_order(series, order, steps, start_params=None):
+    """
+    Fit one candidate on the (already differenced) series.
+
+    Runs inside a pool worker, so it only returns plain picklable data.
+    """
+    p, d, q = order
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model = ARIMA(series, order=(p, 0, q), trend="c" if d == 0 else "n")
+            fitted = model.fit(start_params=start_params)
+            diff_forecast = fitted.forecast(steps=steps)
+
+        params = np.asarray(fitted.params, dtype=float)
+        offset = 1 if d == 0 else 0
+        return {
+            "order": order,
+            "aic": float(fitted.aic),
+            "bic": float(fitted.bic),
+            "const": float(params[0]) if d == 0 else 0.0,
+            "ar": params[offset:offset + p].tolist(),
+            "ma": params[offset + p:offset + p + q].tolist(),
+            "sigma2": float(params[-1]),
+            "diff_forecast": np.asarray(diff_forecast, dtype=float).tolist(),
+        }
+    except Exception:
+        return None
+
+
+def search_arima_order(historical_sales, orders, steps=30, workers=None, min_aic_gain=MIN_AIC_GAIN):
+    """
+    Pick the lowest-AIC order from `orders` and forecast `steps` ahead with it.
+
+    Args:
+        historical_sales: 1-D array of historical sales values
+        orders: Candidate (p, d, q) orders
+        steps: Number of days to forecast
+        workers: Pool size; 1 (or a single candidate) runs in-process
+        min_aic_gain: Stop once a wave (one complexity level) improves the
+                      best AIC by less than this
+
+    Returns:
+        Dict with order, aic, bic, params (plus the split-out ar, ma and
+        sigma2), forecast, orders_evaluated and search_time_ms, or None if no
+        candidate could be fitted.
+    """
+    started = time.perf_counter()
+    series = np.asarray(historical_sales, dtype=float)
+    workers = DEFAULT_WORKERS if workers is None else max(1, int(workers))
+
+    if len(series) < 10:
+        return None
+
+    # Simplest models first so early stopping discards the expensive ones
+    candidates = sorted(orders, key=lambda o: (o[0] + o[2], o))
+    differenced = {d: _difference(series, d) for d in {o[1] for o in candidates}}
+
+    waves = []
+    for order in candidates:
+        level = order[0] + order[2]
+        if waves and waves[-1][0] == level and len(waves[-1][1]) < workers:
+            waves[-1][1].append(order)
+        else:
+            waves.append((level, [order]))
+
+    best = None
+    evaluated = 0
+
+    for _, wave in waves:
+        jobs = [(differenced[o[1]], o, steps, _warm_start(best, o)) for o in wave]
+
+        if workers > 1 and len(wave) > 1:
+            try:
+                pool = _get_pool(workers)
+                results = list(pool.map(_fit_order, *zip(*jobs)))
+            except Exception:
+                # Broken/unavailable pool (e.g. restricted sandbox) — fit in-process
+                shutdown_pool()
+                results = [_fit_order(*job) for job in jobs]
+        else:
+            results = [_fit_order(*job) for job in jobs]
+
+        evaluated += len(wave)
+        previous_aic = best["aic"] if best else float("inf")
+        for result in results:
+            if result is not None and (best is None or result["aic"] < best["aic"]):
+                best = result
+
+        if best is not None and previous_aic != float("inf") and previous_aic - best["aic"] < min_aic_gain:
+            break
+
+    if best is None:
+        return None
+
+    p, d, q = best["order"]
+    forecast = _integrate(best["diff_forecast"], series, d)
+    params = ([best["const"]] if d == 0 else []) + best["ar"] + best["ma"] + [best["sigma2"]]
+
+    return {
+        "order": tuple(best["order"]),
+        "aic": best["aic"],
+        "bic": best["bic"],
+        "params": params,
+        "ar": list(best["ar"]),
+        "ma": list(best["ma"]),
+        "sigma2": best["sigma2"],
+        "forecast": forecast,
+        "orders_evaluated": evaluated,
+        "search_time_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
@@ -0,0 +1,227 @@
+"""
+Stale-while-revalidate refreshing of stored SKU forecasts.
+
+/api/ml/forecast/<sku> serves whatever forecast document is stored, however
+old, and hands expired ones to a ForecastRefresher:
+
+- Refreshes run on a small thread pool; at most `max_pending` SKUs are queued
+  or running, extra requests are dropped (the stale document keeps being
+  served and the next request tries again).
+- Each SKU is refreshed at most once at a time.  Within a process an in-flight
+  set dedups requests; across gunicorn workers a `refreshClaimedAt` stamp on
+  the forecast document is claimed atomically, and expires after
+  FORECAST_REFRESH_CLAIM_SECONDS in case a worker dies mid-refresh.
+- warm_up() schedules forecasts that expire within the next
+  FORECAST_WARMUP_HORIZON_HOURS (and any already expired), oldest first, so
+  users rarely hit an expired document at all.  A background thread runs it
+  every FORECAST_WARMUP_INTERVAL_SECONDS (0 disables the thread).
+"""
+
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+FORECAST_TTL_HOURS = float(os.getenv("FORECAST_TTL_HOURS", "24"))
+REFRESH_WORKERS = int(os.getenv("FORECAST_REFRESH_WORKERS", "2"))
+REFRESH_MAX_PENDING = int(os.getenv("FORECAST_REFRESH_MAX_PENDING", "256"))
+REFRESH_CLAIM_SECONDS = float(os.getenv("FORECAST_REFRESH_CLAIM_SECONDS", "600"))
+WARMUP_HORIZON_HOURS = float(os.getenv("FORECAST_WARMUP_HORIZON_HOURS", "2"))
+WARMUP_LIMIT = int(os.getenv("FORECAST_WARMUP_LIMIT", "200"))
+WARMUP_INTERVAL_SECONDS = float(os.getenv("FORECAST_WARMUP_INTERVAL_SECONDS", "900"))
+
+
+class ForecastRefresher:
+    """
+    Args:
+        build_fn: callable(product) -> forecast document
+        products_collection / forecasts_collection: zero-argument callables
+            returning the collection, looked up on every use so each process
+            works through its own MongoClient
+    """
+
+    def __init__(self, build_fn, products_collection, forecasts_collection,
+                 ttl_hours=FORECAST_TTL_HOURS, workers=REFRESH_WORKERS,
+                 max_pending=REFRESH_MAX_PENDING, claim_seconds=REFRESH_CLAIM_SECONDS,
+                 warmup_interval=WARMUP_INTERVAL_SECONDS):
+        self.build_fn = build_fn
+        self.products = products_collection
+        self.forecasts = forecasts_collection
+        self.ttl = timedelta(hours=ttl_hours)
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.claim_seconds = claim_seconds
+        self.warmup_interval = warmup_interval
+
+        self._lock = threading.Lock()
+        self._inflight = set()
+        self._executor = None
+        self._executor_pid = None
+        self._thread = None
+        self._counters = {
+            "scheduled": 0,
+            "deduped": 0,
+            "claimed_elsewhere": 0,
+            "rejected": 0,
+            "completed": 0,
+            "failed": 0,
+            "warmups": 0,
+        }
+        self.last_error = None
+        self.last_warmup = None
+
+    # ── Freshness ─────────────────────────────────────────────────────
+
+    def is_fresh(self, forecast, now=None):
+        updated_at = forecast.get("updatedAt")
+        return isinstance(updated_at, datetime) and updated_at >= (now or datetime.now()) - self.ttl
+
+    # ── Scheduling ────────────────────────────────────────────────────
+
+    def _get_executor(self):
+        # Owned by the current process (recreated in forked workers)
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="forecast-refresh")
+            self._executor_pid = os.getpid()
+            self._inflight = set()
+        return self._executor
+
+    def _bump(self, counter):
+        self._counters[counter] += 1
+
+    def _claim(self, sku, now):
+        """Atomically stamp the stored forecast so other workers skip this SKU."""
+        expired_claim = now - timedelta(seconds=self.claim_seconds)
+        result = self.forecasts().update_one(
+            {"sku": sku, "$or": [
+                {"refreshClaimedAt": {"$exists": False}},
+                {"refreshClaimedAt": {"$lt": expired_claim}},
+            ]},
+            {"$set": {"refreshClaimedAt": now}},
+        )
+        return result.matched_count == 1
+
+    def schedule(self, sku):
+        """
+        Queue a background refresh for `sku`.
+
+        Returns:
+            True if a refresh was scheduled, False if one is already running
+            (here or in another worker) or the queue is full
+        """
+        with self._lock:
+            executor = self._get_executor()
+            if sku in self._inflight:
+                self._bump("deduped")
+                return False
+            if len(self._inflight) >= self.max_pending:
+                self._bump("rejected")
+                return False
+            self._inflight.add(sku)
+
+        try:
+            claimed = self._claim(sku, datetime.now())
+        except Exception as e:
+            claimed = False
+            self.last_error = str(e)
+        if not claimed:
+            with self._lock:
+                self._inflight.discard(sku)
+                self._bump("claimed_elsewhere")
+            return False
+
+        with self._lock:
+            self._bump("scheduled")
+        executor.submit(self._refresh, sku)
+        return True
+
+    def _refresh(self, sku):
+        try:
+            product = self.products().find_one({"sku": sku})
+            if product is None:
+                self.forecasts().update_one({"sku": sku}, {"$unset": {"refreshClaimedAt": ""}})
+                return
+            forecast_doc = self.build_fn(product)
+            self.forecasts().update_one(
+                {"sku": sku},
+                {"$set": forecast_doc, "$unset": {"refreshClaimedAt": ""}},
+                upsert=True,
+            )
+            with self._lock:
+                self._bump("completed")
+        except Exception as e:
+            with self._lock:
+                self._bump("failed")
+            self.last_error = f"{sku}: {e}"
+            traceback.print_exc()
+            # Leave the claim to expire so a failing SKU is not retried in a tight loop
+        finally:
+            with self._lock:
+                self._inflight.discard(sku)
+
+    # ── Warm-up ───────────────────────────────────────────────────────
+
+    def warm_up(self, horizon_hours=WARMUP_HORIZON_HOURS, limit=WARMUP_LIMIT):
+        """
+        Schedule refreshes for forecasts expiring within `horizon_hours`
+        (expired ones included), oldest first.
+
+        Returns:
+            {"candidates", "scheduled", "skipped"}
+        """
+        now = datetime.now()
+        expires_before = now - self.ttl + timedelta(hours=horizon_hours)
+        cursor = (self.forecasts()
+                  .find({"updatedAt": {"$lt": expires_before}}, {"_id": 0, "sku": 1})
+                  .sort("updatedAt", 1)
+                  .limit(max(0, int(limit))))
+
+        candidates = scheduled = 0
+        for doc in cursor:
+            if not doc.get("sku"):
+                continue
+            candidates += 1
+            if self.schedule(doc["sku"]):
+                scheduled += 1
+
+        with self._lock:
+            self._bump("warmups")
+        self.last_warmup = {
+            "at": now.isoformat(),
+            "candidates": candidates,
+            "scheduled": scheduled,
+            "skipped": candidates - scheduled,
+        }
+        return self.last_warmup
+
+    def ensure_warmup_thread(self):
+        # Started lazily so each forked gunicorn worker runs its own
+        if self.warmup_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run_warmups, name="forecast-warmup", daemon=True)
+                self._thread.start()
+
+    def _run_warmups(self):
+        while True:
+            time.sleep(self.warmup_interval)
+            try:
+                self.warm_up()
+            except Exception as e:
+                self.last_error = str(e)
+                traceback.print_exc()
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counters,
+                "inflight": len(self._inflight),
+                "max_pending": self.max_pending,
+                "workers": self.workers,
+                "ttl_hours": self.ttl.total_seconds() / 3600,
+                "last_warmup": self.last_warmup,
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,168 @@
+"""
+Request/phase latency instrumentation for the ML API.
+
+- Per-route request histograms are recorded by Flask hooks (init_app).
+- Code inside a route wraps its expensive phases in `timed("phase")`, which
+  records a histogram labelled with the phase and the current route.
+- render_prometheus() produces the Prometheus text exposition format served on
+  /api/metrics.
+- log_event() is structured (one JSON object per line), sampled logging that
+  replaces print() in the hot path.  It is off unless ML_LOG_SAMPLE_RATE > 0.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+# Bucket upper bounds in seconds (Prometheus convention)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LOG_SAMPLE_RATE = float(os.getenv("ML_LOG_SAMPLE_RATE", "0"))
+
+logger = logging.getLogger("ml_api")
+if LOG_SAMPLE_RATE > 0 and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        histogram.observe(value)
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            items = sorted(self._histograms.items())
+        described = set()
+        for (name, labels), histogram in items:
+            if name not in described:
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                described.add(name)
+            counts, total, count = histogram.snapshot()
+            label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            sep = "," if label_str else ""
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{label_str}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{label_str}{sep}le="+Inf"}} {count}')
+            plain = f"{{{label_str}}}" if label_str else ""
+            lines.append(f"{name}_sum{plain} {total}")
+            lines.append(f"{name}_count{plain} {count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON-friendly view: count, mean and per-bucket counts per series."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+        out = []
+        for (name, labels), histogram in items:
+            counts, total, count = histogram.snapshot()
+            out.append({
+                "metric": name,
+                "labels": dict(labels),
+                "count": count,
+                "sum_seconds": round(total, 6),
+                "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+                "buckets": dict(zip([str(b) for b in histogram.buckets] + ["+Inf"], counts)),
+            })
+        return out
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+registry.describe("ml_request_duration_seconds", "End-to-end request latency per route")
+registry.describe("ml_phase_duration_seconds", "Latency of one processing phase inside a route")
+
+
+def _current_route():
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return "background"
+
+
+@contextmanager
+def timed(phase):
+    """Record how long the wrapped block takes as ml_phase_duration_seconds{phase, route}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe("ml_phase_duration_seconds", time.perf_counter() - start,
+                         phase=phase, route=_current_route())
+
+
+def log_event(event, **fields):
+    """Emit one sampled JSON log line (no-op unless ML_LOG_SAMPLE_RATE > 0)."""
+    if LOG_SAMPLE_RATE <= 0 or random.random() >= LOG_SAMPLE_RATE:
+        return
+    record = {"ts": round(time.time(), 3), "event": event, "route": _current_route()}
+    record.update(fields)
+    logger.info(json.dumps(record, default=str))
+
+
+def init_app(app):
+    """Install request timing hooks on the Flask app."""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(g, "_metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            registry.observe("ml_request_duration_seconds", time.perf_counter() - start,
+                             route=route, method=request.method, status=str(response.status_code))
+        return response
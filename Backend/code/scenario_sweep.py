@@ -0,0 +1,145 @@
+"""
+Multi-scenario sweep for /api/ml/scenario-planning.
+
+A sweep evaluates a grid of adjustments (demand multiplier × sales spike ×
+lead-time delta × stock delta) against one baseline forecast:
+
+- The baseline is forecast once.  Demand adjustments scale dailySales and
+  weeklySales together, the synthetic history is linear in that level
+  (series_generator) and the ARIMA candidates have no constant term, so a
+  scenario's forecast is the baseline forecast times
+  demandMultiplier × salesSpike; no further fits are needed.
+- generate_alerts() is evaluated for every scenario at once on an
+  (n_scenarios, steps) array with forecast_batch.alert_decisions, the same
+  rules (and rounding) the single-forecast path uses.
+- The result is a column list plus one row per scenario instead of one full
+  forecast document per scenario.
+"""
+
+import itertools
+import os
+
+import numpy as np
+
+from forecast_batch import RISK_LEVELS as ALERT_RISK_LEVELS, alert_decisions
+
+# Largest grid (product of the axis lengths) accepted per request
+MAX_SWEEP_SCENARIOS = int(os.getenv("SCENARIO_SWEEP_MAX_SCENARIOS", "5000"))
+
+# Request key -> (default, type)
+SWEEP_AXES = {
+    "demandMultiplier": (1.0, float),
+    "salesSpike": (1.0, float),
+    "leadTimeDelta": (0, int),
+    "stockDelta": (0, int),
+}
+
+RISK_LEVELS = np.array(ALERT_RISK_LEVELS, dtype=object)
+
+SWEEP_COLUMNS = [
+    "demandMultiplier", "salesSpike", "leadTimeDelta", "stockDelta",
+    "currentStock", "leadTime", "totalDemand", "demandChangePercent",
+    "etaDays", "riskLevel", "recommendedReorder", "reorderPoint", "avgDailyDemand",
+]
+
+
+def scenario_grid(sweep, adjustments=None):
+    """
+    Cartesian product of the sweep axes.
+
+    Args:
+        sweep: {axis: [values]}; axes not given fall back to `adjustments`
+               (the single-scenario values) and then to the defaults
+        adjustments: Single-scenario adjustments dict
+
+    Returns:
+        {axis: 1-D array} with one entry per scenario
+    """
+    adjustments = adjustments or {}
+    unknown = set(sweep) - set(SWEEP_AXES)
+    if unknown:
+        raise ValueError(f"Unknown sweep axes: {', '.join(sorted(unknown))}")
+
+    values = []
+    for axis, (default, cast) in SWEEP_AXES.items():
+        axis_values = sweep.get(axis, [adjustments.get(axis, default)])
+        if not isinstance(axis_values, list):
+            axis_values = [axis_values]
+        if not axis_values:
+            raise ValueError(f"Sweep axis {axis} is empty")
+        values.append([cast(v) for v in axis_values])
+
+    n_scenarios = int(np.prod([len(v) for v in values]))
+    if n_scenarios > MAX_SWEEP_SCENARIOS:
+        raise ValueError(f"At most {MAX_SWEEP_SCENARIOS} scenarios per sweep (got {n_scenarios})")
+
+    columns = zip(*itertools.product(*values))
+    return {axis: np.array(col, dtype=cast) for (axis, (_, cast)), col in zip(SWEEP_AXES.items(), columns)}
+
+
+def sweep_alerts(forecast, scale, stock, lead_time):
+    """
+    generate_alerts() for many scenarios at once.
+
+    Args:
+        forecast: Baseline daily forecast, shape (steps,)
+        scale: Demand scale per scenario, shape (n,)
+        stock: Starting stock per scenario, shape (n,)
+        lead_time: Lead time per scenario, shape (n,)
+
+    Returns:
+        Dict of (n,) arrays: total_demand, eta_days, risk_level,
+        recommended_reorder, reorder_point, avg_daily_demand
+    """
+    forecast = np.asarray(forecast, dtype=float)
+    scale = np.asarray(scale, dtype=float)
+
+    decisions = alert_decisions(scale[:, None] * forecast[None, :], stock, lead_time)
+    return {
+        "total_demand": decisions["total"],
+        "eta_days": np.array(decisions["eta"], dtype=object),
+        "risk_level": RISK_LEVELS[decisions["level"]],
+        "recommended_reorder": np.array(decisions["recommended_reorder"]),
+        "reorder_point": np.array(decisions["reorder_point"]),
+        "avg_daily_demand": np.array(decisions["avg_daily_demand"]),
+    }
+
+
+def run_sweep(baseline_forecast, baseline, grid):
+    """
+    Evaluate every scenario in `grid` against one baseline forecast.
+
+    Args:
+        baseline_forecast: Baseline daily forecast (from one forecast_with_arima call)
+        baseline: Baseline parameters ({currentStock, leadTime, ...})
+        grid: Output of scenario_grid()
+
+    Returns:
+        {"columns": SWEEP_COLUMNS, "rows": [[...], ...], "riskCounts": {...}}
+    """
+    scale = grid["demandMultiplier"] * grid["salesSpike"]
+    stock = baseline["currentStock"] + grid["stockDelta"]
+    lead_time = baseline["leadTime"] + grid["leadTimeDelta"]
+
+    alerts = sweep_alerts(baseline_forecast, scale, stock, lead_time)
+
+    baseline_total = float(np.sum(baseline_forecast))
+    if baseline_total > 0:
+        change = np.round((alerts["total_demand"] - baseline_total) / baseline_total * 100, 2)
+    else:
+        change = np.zeros(len(scale))
+
+    columns = [
+        grid["demandMultiplier"], grid["salesSpike"], grid["leadTimeDelta"], grid["stockDelta"],
+        stock, lead_time, np.round(alerts["total_demand"], 2), change,
+        alerts["eta_days"], alerts["risk_level"], alerts["recommended_reorder"],
+        alerts["reorder_point"], alerts["avg_daily_demand"],
+    ]
+    rows = [list(row) for row in zip(*(np.asarray(c).tolist() for c in columns))]
+
+    levels, counts = np.unique(alerts["risk_level"].astype(str), return_counts=True)
+    return {
+        "columns": SWEEP_COLUMNS,
+        "rows": rows,
+        "riskCounts": {level: int(count) for level, count in zip(levels, counts)},
+    }
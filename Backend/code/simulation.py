@@ -0,0 +1,155 @@
+"""
+Monte Carlo stock-out simulation around an ARIMA point forecast.
+
+Demand paths are the point forecast plus forecast errors sampled from the
+fitted model's error distribution.  For ARIMA(p, d, q) with innovation
+variance sigma2, the h-step error of the differenced series is
+sum_j psi_j * e_(T+h-j) (psi = MA(inf) weights of the ARMA part); undoing the
+differencing is a cumulative sum along the horizon.  Both steps are folded
+into one (steps, steps) lower-triangular matrix, so a batch of paths is one
+standard-normal draw and one matrix product, and stock depletion is a cumulative
+sum over each path.
+
+Paths are drawn in batches until SIMULATION_PATHS is reached or the per-SKU
+SIMULATION_BUDGET_MS is spent (at least one batch always runs).  From the paths:
+
+- stock-out probability by day: share of paths whose cumulative demand has
+  reached the current stock,
+- ETA quantiles: first stock-out day per path (None = beyond the horizon),
+- service-level reorder quantities: demand quantiles over the lead time
+  (reorder point) and over lead time + review period (order-up-to level).
+"""
+
+import math
+import os
+import time
+
+import numpy as np
+from statsmodels.tsa.arima_process import arma2ma
+
+from series_generator import HISTORY_PROFILE
+
+SIMULATION_PATHS = int(os.getenv("SIMULATION_PATHS", "2000"))
+SIMULATION_BATCH_PATHS = int(os.getenv("SIMULATION_BATCH_PATHS", "500"))
+SIMULATION_BUDGET_MS = float(os.getenv("SIMULATION_BUDGET_MS", "25"))
+SIMULATION_REVIEW_DAYS = int(os.getenv("SIMULATION_REVIEW_DAYS", "7"))
+SERVICE_LEVELS = (0.90, 0.95, 0.99)
+ETA_QUANTILES = {"p10": 0.10, "p50": 0.50, "p90": 0.90}
+
+
+def fallback_error_model(forecast):
+    """
+    White-noise errors for forecasts without a fitted ARIMA (fallback method):
+    the standard deviation of the ±noise uniform multiplier used for the
+    synthetic history, applied to the mean forecast level.
+    """
+    level = float(np.mean(forecast)) if len(forecast) else 0.0
+    sigma = HISTORY_PROFILE["noise"] / math.sqrt(3) * level
+    return {"order": [0, 0, 0], "ar": [], "ma": [], "sigma2": sigma ** 2, "source": "fallback"}
+
+
+def error_matrix(error_model, steps):
+    """(steps, steps) matrix mapping unit innovations to demand-level forecast errors."""
+    _, d, _ = error_model["order"]
+    psi = arma2ma(np.r_[1, -np.asarray(error_model["ar"], dtype=float)],
+                  np.r_[1, np.asarray(error_model["ma"], dtype=float)], lags=steps)
+    lag = np.subtract.outer(np.arange(steps), np.arange(steps))
+    matrix = np.where(lag >= 0, psi[np.clip(lag, 0, steps - 1)], 0.0)
+    for _ in range(d):
+        matrix = np.cumsum(matrix, axis=0)
+    return matrix * math.sqrt(max(float(error_model["sigma2"]), 0.0))
+
+
+def simulate_stockout(forecast, current_stock, lead_time, error_model=None, n_paths=None,
+                      budget_ms=None, batch_paths=None, review_days=SIMULATION_REVIEW_DAYS,
+                      service_levels=SERVICE_LEVELS, rng=None):
+    """
+    Simulate demand paths for one SKU.
+
+    Args:
+        forecast: Point forecast, shape (steps,)
+        current_stock: Stock on hand
+        lead_time: Replenishment lead time in days
+        error_model: {order, ar, ma, sigma2} from forecast_with_arima metadata
+                     (fallback_error_model() when None)
+        n_paths / budget_ms / batch_paths: Path target, time budget and batch size
+        review_days: Review period added to the lead time for the order-up-to level
+        service_levels: Cycle service levels to size reorders for
+        rng: Optional seeded np.random.Generator
+
+    Returns:
+        Dict with stockout_probability (per day), eta_quantiles, service_levels,
+        paths, elapsed_ms and the error model used
+    """
+    started = time.perf_counter()
+    forecast = np.asarray(forecast, dtype=float)
+    steps = len(forecast)
+    if steps == 0:
+        return None
+
+    rng = np.random.default_rng() if rng is None else rng
+    n_paths = SIMULATION_PATHS if n_paths is None else int(n_paths)
+    budget_ms = SIMULATION_BUDGET_MS if budget_ms is None else float(budget_ms)
+    batch_paths = max(1, SIMULATION_BATCH_PATHS if batch_paths is None else int(batch_paths))
+    error_model = error_model or fallback_error_model(forecast)
+
+    matrix_t = error_matrix(error_model, steps).T
+    lead_days = min(max(int(math.ceil(lead_time)), 1), steps)
+    protection_days = min(max(int(math.ceil(lead_time + review_days)), 1), steps)
+
+    stockouts_by_day = np.zeros(steps)
+    first_stockout, lead_demand, protection_demand = [], [], []
+    simulated = 0
+
+    while simulated < n_paths:
+        size = min(batch_paths, n_paths - simulated)
+        paths = np.maximum(forecast + rng.standard_normal((size, steps)) @ matrix_t, 0)
+        consumed = np.cumsum(paths, axis=1)
+
+        out = consumed >= current_stock
+        stockouts_by_day += out.sum(axis=0)
+        first_stockout.append(np.where(out.any(axis=1), out.argmax(axis=1) + 1, np.inf))
+        lead_demand.append(consumed[:, lead_days - 1])
+        protection_demand.append(consumed[:, protection_days - 1])
+        simulated += size
+
+        if (time.perf_counter() - started) * 1000 >= budget_ms:
+            break
+
+    first_stockout = np.concatenate(first_stockout)
+    lead_demand = np.concatenate(lead_demand)
+    protection_demand = np.concatenate(protection_demand)
+
+    eta = np.quantile(first_stockout, list(ETA_QUANTILES.values()), method="inverted_cdf")
+    lead_mean = float(lead_demand.mean())
+    levels = []
+    for level in service_levels:
+        reorder_point = float(np.quantile(lead_demand, level))
+        order_up_to = float(np.quantile(protection_demand, level))
+        levels.append({
+            "service_level": level,
+            "reorder_point": int(math.ceil(reorder_point)),
+            "safety_stock": int(math.ceil(max(reorder_point - lead_mean, 0))),
+            "order_up_to": int(math.ceil(order_up_to)),
+            "order_quantity": int(math.ceil(max(order_up_to - current_stock, 0))),
+        })
+
+    probability = stockouts_by_day / simulated
+    return {
+        "paths": simulated,
+        "paths_target": n_paths,
+        "budget_ms": budget_ms,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "stockout_probability": np.round(probability, 4).tolist(),
+        "stockout_probability_horizon": round(float(probability[-1]), 4),
+        "eta_quantiles": {name: (int(v) if np.isfinite(v) else None) for name, v in zip(ETA_QUANTILES, eta)},
+        "lead_time_days": lead_days,
+        "review_days": review_days,
+        "lead_time_demand_mean": round(lead_mean, 2),
+        "service_levels": levels,
+        "error_model": {
+            "order": list(error_model["order"]),
+            "sigma": round(math.sqrt(max(float(error_model["sigma2"]), 0.0)), 4),
+            "source": error_model.get("source", "arima"),
+        },
+    }
@@ -5,7 +5,8 @@
 
 from app import app, load_models
 
-# Pre-load ML models exactly once before Gunicorn forks workers
+# Pre-load ML models exactly once before Gunicorn forks workers.
+# load_models() does not touch MongoDB: each worker opens its own pool on first use.
 load_models()
 
 if __name__ == '__main__':
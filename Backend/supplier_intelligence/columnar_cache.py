@@ -0,0 +1,218 @@
+"""
+Columnar cache for the processed supplier data used by the blueprint fallbacks.
+
+The source (the loader's typed Parquet output when present, otherwise the
+processed CSV) is parsed once per change, not once per request:
+
+- Rows are sorted by (supplier, order_date) and written as an uncompressed
+  Arrow IPC file, which is memory-mapped on load (zero-copy, shared between
+  workers through the page cache).
+- A JSON sidecar holds the precomputed per-supplier risk overview and a
+  supplier -> [start, stop) row-range index into the Arrow file.
+- Both files record the source's (mtime, size); a changed source rebuilds
+  them on the next request.
+
+pyarrow is optional.  Without it the sorted frame and the same aggregates and
+index are kept in memory, which still avoids re-parsing on every request.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:
+    pa = None
+
+try:
+    from .supplier_data_loader import (
+        PROCESSED_CSV_PATH, PROCESSED_PARQUET_PATH, HAS_PARQUET, read_processed_supplier_data,
+    )
+except ImportError:
+    from supplier_data_loader import (
+        PROCESSED_CSV_PATH, PROCESSED_PARQUET_PATH, HAS_PARQUET, read_processed_supplier_data,
+    )
+CACHE_DIR = os.getenv(
+    "SUPPLIER_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".columnar_cache"),
+)
+
+HISTORY_COLUMNS = ["order_date", "delay_days", "rejection_ratio", "fulfillment_ratio"]
+
+
+def _risk_overview_rows(df):
+    """Per-supplier aggregates and risk scores (the CSV branch of risk_overview)."""
+    suppliers = df.groupby('supplier').agg({
+        'delay_days':       'mean',
+        'fulfillment_ratio':'mean',
+        'rejection_ratio':  'mean',
+        'category':         'first',
+        'base_price':       'mean',
+        'payment_risk':     'max'
+    }).reset_index()
+
+    results = []
+    for row in suppliers.itertuples(index=False):
+        delay      = round(float(row.delay_days), 1)
+        fulfillment= round(float(row.fulfillment_ratio) * 100, 1)
+        rejection  = round(float(row.rejection_ratio)  * 100, 1)
+        risk_score = min(100, round(
+            (rejection  / 100) * 40 +
+            (max(0, 100 - fulfillment) / 100) * 35 +
+            min(1, delay / 14) * 25
+        ))
+        risk_level = 'High' if risk_score >= 60 else ('Medium' if risk_score >= 30 else 'Low')
+
+        results.append({
+            "supplier":        row.supplier,
+            "category":        row.category,
+            "avg_delay":       delay,
+            "avg_fulfillment": fulfillment,
+            "avg_rejection":   rejection,
+            "risk_score":      risk_score,
+            "risk_level":      risk_level,
+            "source":          "csv"
+        })
+
+    results.sort(key=lambda x: x['risk_score'], reverse=True)
+    return results
+
+
+class SupplierColumnarCache:
+    def __init__(self, source_path=PROCESSED_CSV_PATH, cache_dir=CACHE_DIR):
+        self.source_path = source_path
+        self.cache_dir = cache_dir
+        base = os.path.splitext(os.path.basename(source_path))[0]
+        self.arrow_path = os.path.join(cache_dir, base + ".arrow")
+        self.meta_path = os.path.join(cache_dir, base + ".meta.json")
+
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._overview = None
+        self._ranges = None
+        self._table = None     # pyarrow.Table (memory-mapped) or pandas DataFrame
+        self.builds = 0
+
+    # ── Public API ────────────────────────────────────────────────────
+
+    def available(self):
+        return os.path.exists(self.source_path)
+
+    def risk_overview(self):
+        """Precomputed per-supplier risk rows, highest risk first."""
+        self._ensure_fresh()
+        return self._overview
+
+    def history(self, supplier, limit=10):
+        """Last `limit` orders for one supplier by order_date, or [] if unknown."""
+        self._ensure_fresh()
+        span = self._ranges.get(supplier)
+        if span is None:
+            return []
+        start, stop = span
+        start = max(start, stop - limit)
+        if pa is not None:
+            return self._table.slice(start, stop - start).select(HISTORY_COLUMNS).to_pylist()
+        return self._table.iloc[start:stop][HISTORY_COLUMNS].to_dict('records')
+
+    # ── Freshness ─────────────────────────────────────────────────────
+
+    def _source_fingerprint(self):
+        stat = os.stat(self.source_path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _ensure_fresh(self):
+        fingerprint = self._source_fingerprint()
+        if fingerprint == self._fingerprint:
+            return
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                return
+            if not self._load_persisted(fingerprint):
+                self._build(fingerprint)
+            self._fingerprint = fingerprint
+
+    def _load_persisted(self, fingerprint):
+        if pa is None or not (os.path.exists(self.meta_path) and os.path.exists(self.arrow_path)):
+            return False
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if meta.get("source_fingerprint") != fingerprint:
+                return False
+            self._table = pa_ipc.open_file(pa.memory_map(self.arrow_path, "r")).read_all()
+        except (OSError, ValueError, pa.ArrowException):
+            return False
+        self._overview = meta["risk_overview"]
+        self._ranges = {name: tuple(span) for name, span in meta["row_ranges"].items()}
+        return True
+
+    def _build(self, fingerprint):
+        df = read_processed_supplier_data(self.source_path)
+        # Parquet keeps typed columns; serve the same plain values as the CSV
+        for col in df.select_dtypes('category').columns:
+            df[col] = df[col].astype(object)
+        if pd.api.types.is_datetime64_any_dtype(df['order_date']):
+            df['order_date'] = df['order_date'].dt.strftime('%Y-%m-%d')
+        # Aggregate in file order so 'first' category matches the original
+        overview = _risk_overview_rows(df)
+
+        # Contiguous, date-ordered rows per supplier
+        df = (df.dropna(subset=['supplier'])
+                .sort_values(['supplier', 'order_date'], kind='mergesort')
+                .reset_index(drop=True))
+        names = df['supplier'].to_numpy()
+        ranges = {}
+        if len(names):
+            starts = np.flatnonzero(np.r_[True, names[1:] != names[:-1]])
+            stops = np.r_[starts[1:], len(names)]
+            ranges = {names[s]: (int(s), int(e)) for s, e in zip(starts, stops)}
+
+        self._overview = overview
+        self._ranges = ranges
+        self.builds += 1
+
+        if pa is None:
+            self._table = df
+            return
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_arrow = f"{self.arrow_path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_arrow, "wb") as sink:
+            with pa_ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_arrow, self.arrow_path)
+
+        tmp_meta = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta, "w") as f:
+            json.dump({
+                "source_fingerprint": fingerprint,
+                "risk_overview": overview,
+                "row_ranges": ranges,
+            }, f)
+        os.replace(tmp_meta, self.meta_path)
+
+        self._table = pa_ipc.open_file(pa.memory_map(self.arrow_path, "r")).read_all()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_supplier_cache():
+    """Process-wide cache for the processed supplier data (Parquet preferred)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if HAS_PARQUET and os.path.exists(PROCESSED_PARQUET_PATH):
+                    _cache = SupplierColumnarCache(PROCESSED_PARQUET_PATH)
+                else:
+                    _cache = SupplierColumnarCache(PROCESSED_CSV_PATH)
+    return _cache
@@ -0,0 +1,263 @@
+"""
+Compact, memory-mappable export of the supplier risk forests.
+
+A fitted sklearn RandomForestRegressor is flattened into a handful of node
+arrays shared by all trees (feature, threshold, left, right, value) plus the
+root offset of each tree.  The arrays are saved as .npy files and loaded with
+np.load(mmap_mode='r'), so loading is a few page mappings and every gunicorn
+worker shares the same physical pages.
+
+Predictions are identical to sklearn's: X is cast to float32 (as sklearn does
+before walking a tree) and compared against the float64 thresholds, and tree
+outputs are summed sequentially in estimator order before dividing by the
+number of trees.
+
+Layout of the export directory (models/compact/ by default):
+
+    meta.json              encoders, features, source version and file hashes,
+                           per-model entries
+    <group>/feature.npy    int16, -2 marks a leaf
+    <group>/threshold.npy  float64
+    <group>/left.npy       int32, global node offsets
+    <group>/right.npy      int32
+    <group>/value.npy      float64, (n_nodes, n_outputs)
+    <group>/roots.npy      int32, root offset of each tree
+
+train_risk_models.py refreshes the export after every training run.  After
+retraining with the per-target train_*_risk.py scripts, re-run this module;
+until then the registry sees that the pickles changed and ignores the export.
+
+Usage:
+    python compact_forest.py          # export the currently trained models
+"""
+
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+
+COMPACT_DIR_NAME = 'compact'
+META_FILE = 'meta.json'
+FORMAT_VERSION = 1
+ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+# Rows walked per block; bounds the (rows x trees) index matrix
+PREDICT_BLOCK_ROWS = 4096
+
+
+class CompactForest:
+    """Array-backed random forest regressor with an sklearn-compatible predict()."""
+
+    def __init__(self, arrays, feature_names=None, output=None):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.output = output
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        counts = np.array([t.node_count for t in trees], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        feature, threshold, left, right, value = [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            leaf = tree.children_left < 0
+            feature.append(np.where(leaf, -2, tree.feature))
+            threshold.append(tree.threshold)
+            # Leaves point at themselves so the traversal can run in lockstep
+            own = np.arange(tree.node_count) + offset
+            left.append(np.where(leaf, own, tree.children_left + offset))
+            right.append(np.where(leaf, own, tree.children_right + offset))
+            value.append(tree.value[:, :, 0])
+
+        arrays = {
+            'feature': np.concatenate(feature).astype(np.int16),
+            'threshold': np.concatenate(threshold).astype(np.float64),
+            'left': np.concatenate(left).astype(np.int32),
+            'right': np.concatenate(right).astype(np.int32),
+            'value': np.concatenate(value).astype(np.float64),
+            'roots': offsets.astype(np.int32),
+        }
+        names = getattr(model, 'feature_names_in_', None)
+        return cls(arrays, feature_names=names)
+
+    def _as_matrix(self, X):
+        if hasattr(X, 'columns') and self.feature_names is not None:
+            X = X[self.feature_names]
+        # sklearn casts to float32 before walking the trees
+        return np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+
+    def _leaves(self, X):
+        """Leaf index reached by every (row, tree) pair, shape (rows, trees)."""
+        n = len(X)
+        nodes = np.broadcast_to(self.roots, (n, self.n_trees)).ravel().copy()
+        rows = np.repeat(np.arange(n), self.n_trees)
+        # Only the (row, tree) pairs still at an internal node are advanced
+        active = np.flatnonzero(self.feature[nodes] >= 0)
+        while len(active):
+            current = nodes[active]
+            go_left = X[rows[active], self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = current
+            active = active[self.feature[current] >= 0]
+        return nodes.reshape(n, self.n_trees)
+
+    def predict_all(self, X):
+        """(n_samples, n_outputs) predictions."""
+        X = self._as_matrix(X)
+        out = np.zeros((len(X), self.value.shape[1]), dtype=np.float64)
+        for start in range(0, len(X), PREDICT_BLOCK_ROWS):
+            block = X[start:start + PREDICT_BLOCK_ROWS]
+            leaf_values = self.value[self._leaves(block)]     # (rows, trees, outputs)
+            acc = np.zeros((len(block), self.value.shape[1]), dtype=np.float64)
+            for t in range(self.n_trees):                     # sequential, like sklearn
+                acc += leaf_values[:, t]
+            out[start:start + len(block)] = acc / self.n_trees
+        return out
+
+    def predict(self, X):
+        y = self.predict_all(X)
+        if self.output is not None:
+            return y[:, self.output]
+        return y[:, 0] if y.shape[1] == 1 else y
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        digests = {}
+        for name in ARRAYS:
+            path = os.path.join(directory, name + '.npy')
+            tmp = f"{path}.{os.getpid()}.tmp.npy"
+            np.save(tmp, getattr(self, name))
+            os.replace(tmp, path)
+            digests[name] = hashlib.sha256(np.ascontiguousarray(getattr(self, name)).tobytes()).hexdigest()[:16]
+        return digests
+
+    @classmethod
+    def load(cls, directory, feature_names=None, output=None, mmap_mode='r'):
+        arrays = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode) for name in ARRAYS}
+        return cls(arrays, feature_names=feature_names, output=output)
+
+
+def _label_encoder(classes):
+    from sklearn.preprocessing import LabelEncoder
+    encoder = LabelEncoder()
+    encoder.classes_ = np.array(classes, dtype=object)
+    return encoder
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_models(model_dicts, out_dir, version=None, source_paths=()):
+    """
+    Export registry-style model dicts ({name: {model, le_supplier, le_category,
+    features}}) into out_dir.  Models that are outputs of one shared
+    multi-output forest are exported once.
+
+    source_paths are the model files the dicts were loaded from; their hashes
+    go into meta.json so the registry can tell when the export is out of date.
+    """
+    first = next(iter(model_dicts.values()))
+    groups = {}
+    entries = {}
+    for name, data in model_dicts.items():
+        model = data['model']
+        output = getattr(model, 'index', None)
+        source = getattr(model, 'model', model)
+        group = groups.setdefault(id(source), {'name': name if output is None else 'shared', 'model': source})
+        entries[name] = {'group': group['name'], 'output': output}
+
+    digests = {}
+    for group in groups.values():
+        compact = CompactForest.from_sklearn(group['model'])
+        digests[group['name']] = compact.save(os.path.join(out_dir, group['name']))
+
+    meta = {
+        'format': 'compact_forest',
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'exported_at': datetime.utcnow().isoformat() + 'Z',
+        'features': list(first['features']),
+        'le_supplier': [c.item() if isinstance(c, np.generic) else c for c in first['le_supplier'].classes_],
+        'le_category': [c.item() if isinstance(c, np.generic) else c for c in first['le_category'].classes_],
+        'models': entries,
+        'array_sha256': digests,
+        # Relative to the models directory (the parent of out_dir)
+        'sources': {
+            os.path.relpath(path, os.path.dirname(os.path.abspath(out_dir))): file_sha256(path)
+            for path in source_paths
+        },
+    }
+    # meta.json is written last; readers only reload when it changes
+    tmp = os.path.join(out_dir, f"{META_FILE}.{os.getpid()}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, META_FILE))
+    return meta
+
+
+def load_compact_models(meta_path):
+    """
+    Registry loader: model dicts in the same shape as the pickles / bundle.
+
+    Returns:
+        ({name: {model, le_supplier, le_category, features, version}}, version)
+    """
+    directory = os.path.dirname(meta_path)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    le_supplier = _label_encoder(meta['le_supplier'])
+    le_category = _label_encoder(meta['le_category'])
+
+    forests = {}
+    models = {}
+    for name, entry in meta['models'].items():
+        arrays = forests.get(entry['group'])
+        if arrays is None:
+            arrays = forests[entry['group']] = CompactForest.load(os.path.join(directory, entry['group']))
+        models[name] = {
+            'model': CompactForest(
+                {a: getattr(arrays, a) for a in ARRAYS},
+                feature_names=meta['features'], output=entry['output']),
+            'le_supplier': le_supplier,
+            'le_category': le_category,
+            'features': meta['features'],
+            'version': meta.get('version'),
+        }
+    return models, meta.get('version')
+
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from model_registry import MODEL_DIR, ModelRegistry
+
+    # Read the trained models directly (not a previous compact export)
+    source = ModelRegistry(MODEL_DIR, compact_dir=None)
+    model_dicts = {name: source.require(name) for name in source.files}
+    version = source.versions()['delay'].get('version')
+    source_paths = [os.path.join(MODEL_DIR, f) for f in source.source_files()]
+
+    out_dir = os.path.join(MODEL_DIR, COMPACT_DIR_NAME)
+    meta = export_models(model_dicts, out_dir, version=version, source_paths=source_paths)
+    print(f"Exported {len(meta['models'])} models (version {version}) to {out_dir}")
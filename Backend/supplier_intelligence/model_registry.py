@@ -0,0 +1,264 @@
+"""
+Load-once registry for the supplier risk models.
+
+The delay / quality / fulfillment RandomForests are deserialized on first use
+(or eagerly via preload() before gunicorn forks, so workers start from the
+parent's pages copy-on-write) and then served from memory.  Bundles and pickles
+are read with joblib.load(mmap_mode='r'), but that only avoids an extra copy
+while reading: sklearn's Tree.__setstate__ copies the node arrays into memory
+owned by the tree, so those forests are not shared between workers.  Only the
+compact export below stays memory mapped and shared.
+
+Sources, in order of preference:
+  1. models/compact/ (compact_forest.py export): flattened node arrays opened
+     with np.load(mmap_mode='r'), the smallest and fastest to load.  Used only
+     while it is current: meta.json records the SHA-256 of the files it was
+     exported from, and if any of them changed (or a bundle appeared since)
+     the export is ignored until it is regenerated;
+  2. supplier_risk_bundle.joblib from train_risk_models.py (one read, one
+     version for all three models);
+  3. the per-model pickles.
+
+A model is reloaded only when its file changes: the (mtime, size) fingerprint
+is checked at most every RISK_MODEL_CHECK_INTERVAL seconds, and a changed
+fingerprint with an unchanged SHA-256 does not trigger a reload.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import joblib
+
+try:
+    from .compact_forest import COMPACT_DIR_NAME, META_FILE, file_sha256, load_compact_models
+except ImportError:
+    from compact_forest import COMPACT_DIR_NAME, META_FILE, file_sha256, load_compact_models
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+MODEL_FILES = {
+    'delay': 'delay_risk_model.pkl',
+    'quality': 'quality_risk_model.pkl',
+    'fulfillment': 'fulfillment_risk_model.pkl',
+}
+
+BUNDLE_FILE = 'supplier_risk_bundle.joblib'
+
+CHECK_INTERVAL = float(os.getenv('RISK_MODEL_CHECK_INTERVAL', '5'))
+
+
+class OutputSlice:
+    """One target of a multi-output forest, exposed with a single-output predict()."""
+
+    def __init__(self, model, index):
+        self.model = model
+        self.index = index
+
+    def predict(self, X):
+        return self.model.predict(X)[:, self.index]
+
+
+def load_bundle(path):
+    """
+    Per-target model dicts ({model, le_supplier, le_category, features}) from a
+    training bundle, the same shape as the individual pickles.
+    """
+    bundle = joblib.load(path, mmap_mode='r')
+    if 'models' in bundle:
+        models = bundle['models']
+    else:
+        shared = bundle['multioutput_model']
+        models = {name: OutputSlice(shared, i) for name, i in bundle['outputs'].items()}
+    return {
+        name: {
+            'model': model,
+            'le_supplier': bundle['le_supplier'],
+            'le_category': bundle['le_category'],
+            'features': bundle['features'],
+            'version': bundle.get('version'),
+        }
+        for name, model in models.items()
+    }, bundle.get('version')
+
+
+def load_pickle(path):
+    return joblib.load(path, mmap_mode='r'), None
+
+
+class _Entry:
+    __slots__ = ('model', 'fingerprint', 'sha256', 'loaded_at', 'checked_at', 'source', 'version')
+
+    def __init__(self, model, fingerprint, sha256, source, version=None, loaded_at=None):
+        self.model = model
+        self.fingerprint = fingerprint
+        self.sha256 = sha256
+        self.source = source
+        self.version = version or sha256[:12]
+        self.loaded_at = loaded_at or time.time()
+        self.checked_at = time.monotonic()
+
+
+class ModelRegistry:
+    def __init__(self, models_dir=MODEL_DIR, files=MODEL_FILES, bundle_file=BUNDLE_FILE,
+                 compact_dir=COMPACT_DIR_NAME, check_interval=CHECK_INTERVAL):
+        self.models_dir = models_dir
+        self.files = dict(files)
+        self.bundle_file = bundle_file
+        self.compact_dir = compact_dir
+        self.check_interval = check_interval
+        self._entries = {}
+        self._files = {}
+        self._hashes = {}
+        self._stale_compact = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def path(self, name):
+        return os.path.join(self.models_dir, self.files[name])
+
+    def bundle_path(self):
+        return os.path.join(self.models_dir, self.bundle_file) if self.bundle_file else None
+
+    def compact_meta_path(self):
+        return os.path.join(self.models_dir, self.compact_dir, META_FILE) if self.compact_dir else None
+
+    def get(self, name):
+        """Return the loaded model dict for `name`, or None if its file is missing."""
+        entry = self._entries.get(name)
+        if entry is not None and time.monotonic() - entry.checked_at < self.check_interval:
+            return entry.model
+
+        with self._lock:
+            return self._refresh(name)
+
+    def require(self, name):
+        model = self.get(name)
+        if model is None:
+            raise FileNotFoundError(f"Risk model not found: {self.path(name)}")
+        return model
+
+    def preload(self):
+        """Load every model now (call before forking workers)."""
+        return {name: self.get(name) is not None for name in self.files}
+
+    def _refresh(self, name):
+        compact_path = self.compact_meta_path()
+        bundle_path = self.bundle_path()
+        if compact_path and os.path.exists(compact_path) and self._compact_is_current(compact_path):
+            file_entry = self._load_file(compact_path, load_compact_models)
+            model = file_entry.model.get(name) if file_entry else None
+        elif bundle_path and os.path.exists(bundle_path):
+            file_entry = self._load_file(bundle_path, load_bundle)
+            model = file_entry.model.get(name) if file_entry else None
+        else:
+            file_entry = self._load_file(self.path(name), load_pickle)
+            model = file_entry.model if file_entry else None
+
+        if file_entry is None:
+            entry = self._entries.get(name)
+            return entry.model if entry is not None else None
+
+        entry = self._entries.get(name)
+        if entry is None or entry.model is not model:
+            self._entries[name] = _Entry(model, file_entry.fingerprint, file_entry.sha256,
+                                         file_entry.source, file_entry.version, file_entry.loaded_at)
+        else:
+            entry.checked_at = time.monotonic()
+        return model
+
+    def _source_sha256(self, path):
+        """SHA-256 of `path`, recomputed only when its (mtime, size) changes; None if missing."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+        cached = self._hashes.get(path)
+        if cached is None or cached[0] != fingerprint:
+            cached = self._hashes[path] = (fingerprint, file_sha256(path))
+        return cached[1]
+
+    def _compact_is_current(self, meta_path):
+        """True if the compact export was made from the model files now on disk."""
+        try:
+            with open(meta_path) as f:
+                sources = json.load(f).get('sources') or {}
+        except (OSError, ValueError):
+            sources = {}
+
+        current = bool(sources)
+        for filename, sha256 in sources.items():
+            if self._source_sha256(os.path.join(self.models_dir, filename)) != sha256:
+                current = False
+        # A bundle trained after an export made from the pickles
+        bundle_path = self.bundle_path()
+        if bundle_path and self.bundle_file not in sources and os.path.exists(bundle_path):
+            current = False
+
+        if not current and self._stale_compact != meta_path:
+            print(f" Compact model export {meta_path} does not match the trained models; "
+                  f"ignoring it (re-run compact_forest.py)")
+        self._stale_compact = None if current else meta_path
+        return current
+
+    def source_files(self):
+        """{file relative to models_dir: SHA-256} of the non-compact files backing the models."""
+        sources = {}
+        for entry in self._entries.values():
+            if entry.model is not None:
+                sources[entry.source] = entry.sha256
+        return sources
+
+    def _load_file(self, path, loader):
+        """Cached contents of one model file, reloaded only when it really changed."""
+        cached = self._files.get(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            # Keep serving the last good model if the file disappears mid-deploy
+            return cached
+
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+        if cached is not None and cached.fingerprint == fingerprint:
+            return cached
+
+        sha256 = file_sha256(path)
+        if cached is not None and cached.sha256 == sha256:
+            # Touched but not changed
+            cached.fingerprint = fingerprint
+            return cached
+
+        loaded, version = loader(path)
+        if cached is not None:
+            self.reloads += 1
+        entry = _Entry(loaded, fingerprint, sha256, os.path.relpath(path, self.models_dir), version)
+        self._files[path] = entry
+        return entry
+
+    def versions(self):
+        """Active model versions (source file, version, mtime, load time)."""
+        out = {}
+        for name, filename in self.files.items():
+            entry = self._entries.get(name)
+            if entry is None or entry.model is None:
+                out[name] = {'file': filename, 'loaded': False}
+                continue
+            out[name] = {
+                'file': entry.source,
+                'loaded': True,
+                'version': entry.version,
+                'sha256': entry.sha256[:12],
+                'modified': datetime.utcfromtimestamp(entry.fingerprint[0] / 1e9).isoformat() + 'Z',
+                'size_bytes': entry.fingerprint[1],
+                'loaded_at': datetime.utcfromtimestamp(entry.loaded_at).isoformat() + 'Z',
+            }
+        return out
+
+    def stats(self):
+        return {'models': self.versions(), 'reloads': self.reloads}
+
+
+registry = ModelRegistry()
@@ -0,0 +1,168 @@
+"""
+Process-wide MongoDB connection manager.
+
+Every module (app.py, ai_assistant.py, supplier_intelligence) borrows its
+MongoClient from here instead of constructing its own, so each process keeps
+exactly one connection pool per URI.
+
+- Pool sizes come from MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE /
+  MONGO_MAX_IDLE_TIME_MS / MONGO_WAIT_QUEUE_TIMEOUT_MS.
+- Clients are created with connect=False and dropped in forked children, so a
+  client created before gunicorn forks is never shared across processes.
+- pool_stats() / health() report pool usage and round-trip latency.
+"""
+
+import os
+import threading
+import time
+
+from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+
+POOL_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000")),
+}
+
+_clients = {}
+_listeners = {}
+_lock = threading.Lock()
+_owner_pid = os.getpid()
+
+
+class _PoolUsageListener(ConnectionPoolListener):
+    """Counts connection lifecycle events for pool_stats()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checked_in = 0
+        self.checkout_failures = 0
+
+    def _bump(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_ready(self, event): pass
+
+    def connection_created(self, event): self._bump("created")
+    def connection_closed(self, event): self._bump("closed")
+    def connection_checked_out(self, event): self._bump("checked_out")
+    def connection_checked_in(self, event): self._bump("checked_in")
+    def connection_check_out_failed(self, event): self._bump("checkout_failures")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "open": self.created - self.closed,
+                "in_use": self.checked_out - self.checked_in,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checked_out,
+                "checkout_failures": self.checkout_failures,
+            }
+
+
+def _reset_after_fork():
+    """Forget clients inherited from the parent; each child builds its own pool."""
+    global _lock, _owner_pid
+    _lock = threading.Lock()
+    _clients.clear()
+    _listeners.clear()
+    _owner_pid = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _resolve_uri(uri):
+    uri = uri or os.getenv("MONGODB_URI")
+    if not uri:
+        raise EnvironmentError("MONGODB_URI environment variable is not set.")
+    return uri
+
+
+def get_client(uri=None):
+    """Return the shared MongoClient for `uri` (defaults to MONGODB_URI)."""
+    uri = _resolve_uri(uri)
+    if _owner_pid != os.getpid():
+        _reset_after_fork()
+
+    client = _clients.get(uri)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(uri)
+        if client is None:
+            listener = _PoolUsageListener()
+            client = MongoClient(uri, connect=False, event_listeners=[listener], **POOL_OPTIONS)
+            _clients[uri] = client
+            _listeners[uri] = listener
+        return client
+
+
+def get_database(uri=None, default_name="animesh"):
+    """
+    Database named in the URI, or `default_name` when the URI has none
+    (pymongo reports that as 'test').
+    """
+    client = get_client(uri)
+    try:
+        db = client.get_database()
+    except Exception:
+        db = None
+    if db is None or not db.name or db.name == "test":
+        db = client[default_name]
+    return db
+
+
+def pool_stats():
+    """Configured pool limits plus live usage counters for every client in this process."""
+    with _lock:
+        listeners = list(_listeners.items())
+    return {
+        "pid": os.getpid(),
+        "options": dict(POOL_OPTIONS),
+        "clients": [
+            {"host": _redact(uri), **listener.snapshot()}
+            for uri, listener in listeners
+        ],
+    }
+
+
+def health(uri=None):
+    """Ping the server and report round-trip latency."""
+    started = time.perf_counter()
+    try:
+        get_client(uri).admin.command("ping")
+        return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
+def close_all():
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _listeners.clear()
+
+
+def _redact(uri):
+    """Strip credentials before a URI is reported anywhere."""
+    if "@" not in uri:
+        return uri
+    scheme, _, rest = uri.partition("://")
+    return f"{scheme}://***@{rest.split('@', 1)[1]}"
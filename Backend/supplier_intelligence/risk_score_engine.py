@@ -1,28 +1,38 @@
-import pickle
 import os
 import numpy as np
 import pandas as pd
 
+try:
+    from .model_registry import ModelRegistry, registry as model_registry
+except ImportError:
+    from model_registry import ModelRegistry, registry as model_registry
+
 class RiskScoreEngine:
     def __init__(self, models_dir=None):
+        # Models come from the shared load-once registry; a custom directory
+        # gets its own registry
         if models_dir is None:
-            # Use relative path from current script location
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            models_dir = os.path.join(script_dir, "models")
-        self.models_dir = models_dir
-        self.delay_data = self._load_model("delay_risk_model.pkl")
-        self.quality_data = self._load_model("quality_risk_model.pkl")
-        self.fulfillment_data = self._load_model("fulfillment_risk_model.pkl")
-
-    def _load_model(self, filename):
-        path = os.path.join(self.models_dir, filename)
-        if os.path.exists(path):
-            with open(path, "rb") as f:
-                return pickle.load(f)
-        return None
+            self.registry = model_registry
+        else:
+            self.registry = ModelRegistry(models_dir)
+        self.models_dir = self.registry.models_dir
+
+    @property
+    def delay_data(self):
+        return self.registry.get('delay')
+
+    @property
+    def quality_data(self):
+        return self.registry.get('quality')
+
+    @property
+    def fulfillment_data(self):
+        return self.registry.get('fulfillment')
 
     def predict_risk(self, supplier_name, category, ordered_qty, base_price, payment_risk=0):
-        if not self.delay_data or not self.quality_data or not self.fulfillment_data:
+        # One consistent set of models for the whole prediction, even if a reload lands mid-call
+        delay_data, quality_data, fulfillment_data = self.delay_data, self.quality_data, self.fulfillment_data
+        if not delay_data or not quality_data or not fulfillment_data:
             return {"error": "Models not loaded"}
 
         # Prepare inputs using encoders from ANY model (assuming they are consistent or we use specific ones)
@@ -30,20 +40,20 @@ class RiskScoreEngine:
         
         try:
             # 1. Delay Risk
-            delay_feat = self._prepare_features(self.delay_data, supplier_name, category, ordered_qty, base_price, payment_risk)
-            delay_pred = self.delay_data['model'].predict(delay_feat)[0]
+            delay_feat = self._prepare_features(delay_data, supplier_name, category, ordered_qty, base_price, payment_risk)
+            delay_pred = delay_data['model'].predict(delay_feat)[0]
             # Normalize delay: 0 days = 0, 15+ days = 100
             delay_score = min(max(delay_pred * 6.6, 0), 100) 
 
             # 2. Quality Risk
-            quality_feat = self._prepare_features(self.quality_data, supplier_name, category, ordered_qty, base_price, payment_risk)
-            quality_pred = self.quality_data['model'].predict(quality_feat)[0]
+            quality_feat = self._prepare_features(quality_data, supplier_name, category, ordered_qty, base_price, payment_risk)
+            quality_pred = quality_data['model'].predict(quality_feat)[0]
             # Normalize rejection: 0% = 0, 10%+ = 100
             quality_score = min(max(quality_pred * 1000, 0), 100)
 
             # 3. Fulfillment Risk
-            fulfillment_feat = self._prepare_features(self.fulfillment_data, supplier_name, category, ordered_qty, base_price, payment_risk)
-            fulfillment_pred = self.fulfillment_data['model'].predict(fulfillment_feat)[0]
+            fulfillment_feat = self._prepare_features(fulfillment_data, supplier_name, category, ordered_qty, base_price, payment_risk)
+            fulfillment_pred = fulfillment_data['model'].predict(fulfillment_feat)[0]
             # Normalize failure: 1.0 (100% full) = 0, 0.8 or less = 100
             failure_rate = 1.0 - fulfillment_pred
             fulfillment_score = min(max(failure_rate * 500, 0), 100)
@@ -69,6 +79,62 @@ class RiskScoreEngine:
         except Exception as e:
             return {"error": str(e)}
 
+    def predict_risk_batch(self, suppliers, categories, ordered_qty, base_price, payment_risk):
+        """
+        Vectorized predict_risk for many rows: one feature matrix and one
+        predict call per model, scoring and labelling done on arrays.
+
+        Args are equal-length sequences (one entry per row).
+
+        Returns:
+            DataFrame with risk_score, label, delay, quality, fulfillment
+            (same values predict_risk gives row by row)
+        """
+        # One consistent set of models for the whole batch
+        delay_data, quality_data, fulfillment_data = self.delay_data, self.quality_data, self.fulfillment_data
+        if not delay_data or not quality_data or not fulfillment_data:
+            raise RuntimeError("Models not loaded")
+
+        suppliers = pd.Index(suppliers, dtype=object)
+        categories = pd.Index(categories, dtype=object)
+        numeric = {
+            'ordered_qty':  np.asarray(ordered_qty, dtype=float),
+            'base_price':   np.asarray(base_price, dtype=float),
+            # Original dtype, as predict_risk passes it (fractional risk is not truncated)
+            'payment_risk': np.asarray(payment_risk),
+        }
+
+        # Models normally share encoders; only re-encode when they differ
+        features_by_encoders = {}
+        def features_for(model_data):
+            key = (id(model_data['le_supplier']), id(model_data['le_category']))
+            if key not in features_by_encoders:
+                features_by_encoders[key] = pd.DataFrame({
+                    'supplier_id': _encode(model_data['le_supplier'], suppliers),
+                    'category_id': _encode(model_data['le_category'], categories),
+                    **numeric,
+                }, columns=FEATURE_COLUMNS)
+            return features_by_encoders[key]
+
+        delay_pred = np.asarray(delay_data['model'].predict(features_for(delay_data)), dtype=float)
+        quality_pred = np.asarray(quality_data['model'].predict(features_for(quality_data)), dtype=float)
+        fulfillment_pred = np.asarray(fulfillment_data['model'].predict(features_for(fulfillment_data)), dtype=float)
+
+        delay_score = np.clip(delay_pred * 6.6, 0, 100)
+        quality_score = np.clip(quality_pred * 1000, 0, 100)
+        fulfillment_score = np.clip((1.0 - fulfillment_pred) * 500, 0, 100)
+
+        final_score = (delay_score * 0.4) + (quality_score * 0.3) + (fulfillment_score * 0.3)
+        label = np.select([final_score > 70, final_score > 40], ['High', 'Medium'], 'Low')
+
+        return pd.DataFrame({
+            'risk_score':  np.round(final_score, 2),
+            'label':       label,
+            'delay':       np.round(delay_score, 2),
+            'quality':     np.round(quality_score, 2),
+            'fulfillment': np.round(fulfillment_score, 2),
+        })
+
     def _prepare_features(self, model_data, supplier, category, qty, price, pay_risk):
         # We need to handle unseen labels gracefully if using LabelEncoder in production
         # For simplicity in this project, we'll try to transform or use a default if it fails
@@ -91,110 +157,87 @@ if __name__ == "__main__":
     result = engine.predict_risk("Apex Logistics", "Electronics", 500, 50)
     print(result)
 
-# ─── ADD THESE TWO FUNCTIONS TO THE BOTTOM OF risk_score_engine.py ───
+from datetime import datetime
 
-import os, joblib, pandas as pd
-from pymongo import MongoClient
-from datetime import datetime, timedelta
+try:
+    from .snapshot_store import get_snapshot_store
+except ImportError:
+    from snapshot_store import get_snapshot_store
 
-MODEL_DIR = os.path.join(os.path.dirname(__file__), 'models')
+MODEL_DIR = model_registry.models_dir
 
 def _load_models():
-    delay_model   = joblib.load(os.path.join(MODEL_DIR, 'delay_risk_model.pkl'))
-    quality_model = joblib.load(os.path.join(MODEL_DIR, 'quality_risk_model.pkl'))
-    fulfil_model  = joblib.load(os.path.join(MODEL_DIR, 'fulfillment_risk_model.pkl'))
+    # Served from memory; only re-read from disk when a model file changes
+    delay_model   = model_registry.require('delay')
+    quality_model = model_registry.require('quality')
+    fulfil_model  = model_registry.require('fulfillment')
     return delay_model, quality_model, fulfil_model
 
-def get_all_supplier_scores(mongo_uri, db_name='sangrahak'):
-    """
-    Queries MongoDB for all supplier transaction records,
-    runs ML inference on each, returns list of scored dicts.
-    """
-    client = MongoClient(mongo_uri)
-    # Extract DB name from URI or use provided name
-    db = client.get_database()
-    if not db.name or db.name == 'test':
-        db = client[db_name]
-    
-    print(f"Aggregating supplier scores from DB: {db.name}")
-
-    # Aggregate raw performance metrics per supplier from transactions
-    pipeline = [
-        { '$group': {
-            '_id': '$supplier',
-            'category':    { '$first': '$category' },
-            'avgDelay':    { '$avg': '$delay_days' },
-            'qualityRej':  { '$avg': '$quality_rejection_rate' },
-            'fulfillPct':  { '$avg': '$fulfillment_rate' },
-            'orderCount':  { '$sum': 1 },
-        }},
-        { '$match': { '_id': { '$ne': None } } } # Filter out null suppliers
-    ]
-    raw = list(db.transactions.aggregate(pipeline))
-
-    delay_m, quality_m, fulfil_m = _load_models()
-    results = []
-
-    for r in raw:
-        supplier_name = r['_id']
-        category_name = r.get('category', 'Unknown')
-        
-        try:
-            s_id = delay_m['le_supplier'].transform([supplier_name])[0]
-        except:
-            s_id = 0
-            
-        try:
-            c_id = delay_m['le_category'].transform([category_name])[0]
-        except:
-            c_id = 0
+FEATURE_COLUMNS = ['supplier_id', 'category_id', 'ordered_qty', 'base_price', 'payment_risk']
 
-        features = pd.DataFrame([{
-            'supplier_id': s_id,
-            'category_id': c_id,
-            'ordered_qty': r.get('orderCount', 100),
-            'base_price': 500,
-            'payment_risk': 0
-        }], columns=['supplier_id', 'category_id', 'ordered_qty', 'base_price', 'payment_risk'])
-
-        delay_pred = float(delay_m['model'].predict(features)[0])
-        quality_pred = float(quality_m['model'].predict(features)[0])
-        fulfillment_pred = float(fulfil_m['model'].predict(features)[0])
-
-        delay_score   = round(min(max(delay_pred * 6.6, 0), 100))
-        quality_score = round(min(max(quality_pred * 1000, 0), 100))
-        fulfil_score  = round(min(max((1.0 - fulfillment_pred) * 500, 0), 100))
-
-        overall = round(delay_score * 0.40 + quality_score * 0.30 +
-                        fulfil_score * 0.30)
-
-        status = ('CRITICAL' if overall >= 70 else
-                  'HIGH'     if overall >= 45 else
-                  'MEDIUM'   if overall >= 25 else 'LOW')
-
-        results.append({
-            'supplierName':    r['_id'],
-            'category':        category_name,
-            'delayRiskScore':  delay_score,
-            'qualityRiskScore':quality_score,
-            'fulfillmentRate': (100 - fulfil_score), # Show as fulfillment % (positive metric)
-            'overallRiskScore':overall,
-            'status':          status,
-            'lastUpdated':     datetime.utcnow().isoformat() + 'Z',
-        })
+def _encode(label_encoder, values):
+    """LabelEncoder codes for many values at once; unseen labels map to 0."""
+    codes = pd.Index(label_encoder.classes_).get_indexer(pd.Index(values, dtype=object))
+    return np.where(codes < 0, 0, codes)
+
+def score_supplier_aggregates(raw, models):
+    """
+    Score per-supplier aggregates in one pass: a single feature matrix and
+    one predict call per model, with scoring and bucketing done on arrays.
 
-    results.sort(key=lambda x: x['overallRiskScore'], reverse=True)
-    return results
-
-def get_supplier_history(supplier_name, mongo_uri, db_name='sangrahak'):
-    """Returns 30-day daily risk trend for one supplier."""
-    client = MongoClient(mongo_uri)
-    db     = client[db_name]
-    cutoff = datetime.utcnow() - timedelta(days=45)
-    
-    docs = list(db.supplier_risk_snapshots.find(
-        { 'supplierName': supplier_name, 'date': { '$gte': cutoff } },
-        { '_id':0, 'date':1, 'delay':1, 'qualityRisk':1, 'fulfillment':1, 'overallScore':1 }
-    ).sort('date', 1))
-
-    return docs
+    Args:
+        raw: Aggregated rows with '_id' (supplier), 'category' and 'orderCount'
+        models: (delay, quality, fulfillment) model dicts from _load_models()
+    """
+    delay_m, quality_m, fulfil_m = models
+    if not raw:
+        return []
+
+    suppliers = [r['_id'] for r in raw]
+    categories = [r.get('category', 'Unknown') for r in raw]
+
+    features = pd.DataFrame({
+        'supplier_id':  _encode(delay_m['le_supplier'], suppliers),
+        'category_id':  _encode(delay_m['le_category'], categories),
+        'ordered_qty':  [r.get('orderCount', 100) for r in raw],
+        'base_price':   500,
+        'payment_risk': 0,
+    }, columns=FEATURE_COLUMNS)
+
+    delay_pred       = np.asarray(delay_m['model'].predict(features), dtype=float)
+    quality_pred     = np.asarray(quality_m['model'].predict(features), dtype=float)
+    fulfillment_pred = np.asarray(fulfil_m['model'].predict(features), dtype=float)
+
+    # np.round rounds half to even, like the built-in round() used before
+    delay_score   = np.round(np.clip(delay_pred * 6.6, 0, 100)).astype(int)
+    quality_score = np.round(np.clip(quality_pred * 1000, 0, 100)).astype(int)
+    fulfil_score  = np.round(np.clip((1.0 - fulfillment_pred) * 500, 0, 100)).astype(int)
+
+    overall = np.round(delay_score * 0.40 + quality_score * 0.30 +
+                       fulfil_score * 0.30).astype(int)
+
+    status = np.select([overall >= 70, overall >= 45, overall >= 25],
+                       ['CRITICAL', 'HIGH', 'MEDIUM'], 'LOW')
+
+    # Stable descending sort, same order as list.sort(reverse=True)
+    order = np.argsort(-overall, kind='stable')
+    last_updated = datetime.utcnow().isoformat() + 'Z'
+
+    delay_score, quality_score, fulfil_score, overall, status = (
+        delay_score.tolist(), quality_score.tolist(), fulfil_score.tolist(),
+        overall.tolist(), status.tolist())
+
+    return [{
+        'supplierName':    suppliers[i],
+        'category':        categories[i],
+        'delayRiskScore':  delay_score[i],
+        'qualityRiskScore':quality_score[i],
+        'fulfillmentRate': (100 - fulfil_score[i]), # Show as fulfillment % (positive metric)
+        'overallRiskScore':overall[i],
+        'status':          status[i],
+        'lastUpdated':     last_updated,
+    } for i in order.tolist()]
+
+def get_supplier_history(supplier_name, mongo_uri, db_name='sangrahak', days=45, bucket='auto'):
+    """Returns the risk trend for one supplier (daily/weekly buckets for long windows)."""
+    return get_snapshot_store(mongo_uri, db_name).history(supplier_name, days=days, bucket=bucket)
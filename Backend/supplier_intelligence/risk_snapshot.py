@@ -0,0 +1,365 @@
+"""
+Materialized supplier risk scores, refreshed incrementally in the background.
+
+/api/supplier/risk-overview and /api/supplier/kpis used to re-aggregate the
+whole `transactions` collection and re-run inference on every request.  A
+SupplierRiskSnapshot instead keeps running per-supplier sums and counts and
+an `_id` watermark:
+
+- The first build aggregates everything up to the newest `_id` server-side.
+- Each refresh reads only transactions with `_id` above the watermark, merges
+  them into the running totals and rescores just the suppliers that changed
+  (all of them if the risk models were reloaded).
+- ObjectIds only grow per writer: a document from a writer whose clock lags,
+  or one whose insert commits late, can land below the watermark.  Refreshes
+  therefore re-read the last RISK_SNAPSHOT_OVERLAP_SECONDS of `_id`s and skip
+  the ones already counted.  Non-ObjectId `_id`s get no overlap window.
+- Every RISK_SNAPSHOT_FULL_REBUILD_SECONDS a full rebuild picks up edits,
+  deletes and anything that arrived further behind the watermark.
+
+Each successful refresh publishes an immutable SnapshotView (scores, KPIs,
+timestamp and pre-serialized JSON for the list and dashboard payloads), so
+reads are a single attribute lookup.  A refresh that finds nothing new
+reuses the previous scores and JSON but still moves the timestamp, so the
+age reported to clients measures staleness, not time since the last change.  Forced refreshes are coalesced: callers arriving
+while one is running share its result.  Changed rows are also upserted into
+the `supplier_risk_scores` collection for other consumers.
+"""
+
+import json
+import os
+import threading
+import time
+import traceback
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from pymongo import UpdateOne
+try:
+    from .mongo_manager import get_database
+    from .model_registry import registry as model_registry
+    from .risk_score_engine import _load_models, score_supplier_aggregates
+    from .single_flight import SingleFlight
+except ImportError:
+    from mongo_manager import get_database
+    from model_registry import registry as model_registry
+    from risk_score_engine import _load_models, score_supplier_aggregates
+    from single_flight import SingleFlight
+
+REFRESH_SECONDS = float(os.getenv("RISK_SNAPSHOT_REFRESH_SECONDS", "60"))
+FULL_REBUILD_SECONDS = float(os.getenv("RISK_SNAPSHOT_FULL_REBUILD_SECONDS", "3600"))
+OVERLAP_SECONDS = float(os.getenv("RISK_SNAPSHOT_OVERLAP_SECONDS", "300"))
+SCORES_COLLECTION = "supplier_risk_scores"
+
+# Transaction field -> (running sum slot, running count slot)
+METRIC_FIELDS = {
+    "delay_days": (1, 2),
+    "quality_rejection_rate": (3, 4),
+    "fulfillment_rate": (5, 6),
+}
+TRANSACTION_PROJECTION = {"supplier": 1, "category": 1, **{field: 1 for field in METRIC_FIELDS}}
+
+SnapshotView = namedtuple("SnapshotView", [
+    "scores", "scores_json", "kpis", "dashboard_json", "as_of", "refreshed_at", "watermark",
+])
+
+
+def compute_supplier_kpis(scores):
+    """Dashboard KPIs derived from a scored supplier list in a single pass."""
+    active_risk = 0
+    delay_total = 0
+    quality_total = 0
+    for s in scores:
+        if s['status'] in ('HIGH', 'CRITICAL'):
+            active_risk += 1
+        delay_total += s['delayRiskScore']
+        quality_total += s['qualityRiskScore']
+
+    if scores:
+        # Normalized display factors for KPIs
+        avg_delay    = round(delay_total / len(scores) * 0.15, 1)
+        quality_fail = round(quality_total / len(scores) * 0.05, 1)
+    else:
+        avg_delay, quality_fail = 0, 0
+
+    return {
+        'activeRiskEvents':       active_risk,
+        'avgDeliveryDelayDays':   avg_delay,
+        'qualityFailurePercent':  quality_fail,
+        'procurementLossRiskINR': active_risk * 10000,
+    }
+
+
+def _is_number(value):
+    # $avg ignores missing and non-numeric values (booleans included)
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _avg(total, count):
+    return total / count if count else None
+
+
+def _overlap_floor(watermark, seconds):
+    """Lowest `_id` an incremental refresh re-reads, or None to read strictly above the watermark."""
+    if isinstance(watermark, ObjectId) and seconds > 0:
+        return ObjectId.from_datetime(watermark.generation_time - timedelta(seconds=seconds))
+    return None
+
+
+class SupplierRiskSnapshot:
+    def __init__(self, mongo_uri, db_name='sangrahak', refresh_seconds=REFRESH_SECONDS,
+                 full_rebuild_seconds=FULL_REBUILD_SECONDS, overlap_seconds=OVERLAP_SECONDS):
+        self.mongo_uri = mongo_uri
+        self.db_name = db_name
+        self.refresh_seconds = refresh_seconds
+        self.full_rebuild_seconds = full_rebuild_seconds
+        self.overlap_seconds = overlap_seconds
+
+        # supplier -> [category, delay_sum, delay_n, rej_sum, rej_n, fulfil_sum, fulfil_n, orders]
+        self._totals = {}
+        self._scores = {}
+        self._watermark = None
+        # `_id`s at or above the overlap floor that are already in _totals
+        self._recent_ids = set()
+        self._model_versions = None
+        self._last_full_build = 0.0
+
+        self._view = None
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._thread = None
+        self.refreshes = 0
+        self.full_builds = 0
+        self.last_error = None
+        self.last_refresh_ms = None
+
+    # ── Reads ─────────────────────────────────────────────────────────
+
+    def get(self):
+        """Current SnapshotView; builds synchronously only on the very first call."""
+        view = self._view
+        if view is None:
+            with self._lock:
+                if self._view is None:
+                    self._refresh_locked(force_full=True)
+                view = self._view
+        self._ensure_refresher()
+        return view
+
+    def stats(self):
+        view = self._view
+        return {
+            "suppliers": len(view.scores) if view else 0,
+            "as_of": view.as_of if view else None,
+            "watermark": str(view.watermark) if view and view.watermark is not None else None,
+            "refreshes": self.refreshes,
+            "full_builds": self.full_builds,
+            "last_refresh_ms": self.last_refresh_ms,
+            "last_error": self.last_error,
+            "coalesced_refreshes": self._flight.stats(),
+        }
+
+    # ── Refresh ───────────────────────────────────────────────────────
+
+    def refresh(self, force_full=False):
+        """Refresh now; concurrent callers share one in-flight refresh."""
+        return self._flight.do(("refresh", force_full), self._refresh, force_full)
+
+    def _refresh(self, force_full):
+        with self._lock:
+            self._refresh_locked(force_full)
+        return self._view
+
+    def _refresh_locked(self, force_full=False):
+        started = time.perf_counter()
+        db = get_database(self.mongo_uri, default_name=self.db_name)
+        models = _load_models()
+        versions = tuple(v.get('version') for v in model_registry.versions().values())
+
+        full = (force_full or self._view is None
+                or time.monotonic() - self._last_full_build >= self.full_rebuild_seconds)
+        if full:
+            changed = self._full_build(db)
+        else:
+            changed = self._incremental(db)
+
+        if versions != self._model_versions:
+            changed = set(self._totals)
+            self._model_versions = versions
+
+        rescore = bool(changed) or self._view is None
+        if rescore:
+            rescored = score_supplier_aggregates(
+                [self._aggregate_row(name) for name in changed], models)
+            for row in rescored:
+                self._scores[row['supplierName']] = row
+            self._persist(db, rescored, prune=full)
+        self._publish(rescore)
+
+        self.refreshes += 1
+        self.last_error = None
+        self.last_refresh_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _full_build(self, db):
+        newest = list(db.transactions.find({}, {'_id': 1}).sort('_id', -1).limit(1))
+        watermark = newest[0]['_id'] if newest else None
+
+        pipeline = []
+        if watermark is not None:
+            pipeline.append({'$match': {'_id': {'$lte': watermark}}})
+        group = {
+            '_id': '$supplier',
+            'category': {'$first': '$category'},
+            'orderCount': {'$sum': 1},
+        }
+        for field in METRIC_FIELDS:
+            group[f'{field}_sum'] = {'$sum': f'${field}'}
+            group[f'{field}_n'] = {'$sum': {'$cond': [{'$isNumber': f'${field}'}, 1, 0]}}
+        pipeline += [{'$group': group}, {'$match': {'_id': {'$ne': None}}}]
+
+        totals = {}
+        for r in db.transactions.aggregate(pipeline, allowDiskUse=True):
+            acc = [r.get('category'), 0.0, 0, 0.0, 0, 0.0, 0, r['orderCount']]
+            for field, (sum_slot, count_slot) in METRIC_FIELDS.items():
+                acc[sum_slot] = r.get(f'{field}_sum') or 0.0
+                acc[count_slot] = r.get(f'{field}_n') or 0
+            totals[r['_id']] = acc
+
+        floor = _overlap_floor(watermark, self.overlap_seconds)
+        if floor is None:
+            recent = set()
+        else:
+            recent = {d['_id'] for d in db.transactions.find(
+                {'_id': {'$gte': floor, '$lte': watermark}}, {'_id': 1})}
+
+        self._totals = totals
+        self._scores = {}
+        self._watermark = watermark
+        self._recent_ids = recent
+        self._last_full_build = time.monotonic()
+        self.full_builds += 1
+        return set(totals)
+
+    def _incremental(self, db):
+        floor = _overlap_floor(self._watermark, self.overlap_seconds)
+        if self._watermark is None:
+            query = {}
+        elif floor is None:
+            query = {'_id': {'$gt': self._watermark}}
+        else:
+            query = {'_id': {'$gte': floor}}
+
+        changed = set()
+        cursor = db.transactions.find(query, TRANSACTION_PROJECTION).sort('_id', 1).batch_size(5000)
+        for doc in cursor:
+            doc_id = self._watermark = doc['_id']
+            if doc_id in self._recent_ids:
+                continue
+            if isinstance(doc_id, ObjectId):
+                self._recent_ids.add(doc_id)
+            supplier = doc.get('supplier')
+            if supplier is None:
+                continue
+            acc = self._totals.get(supplier)
+            if acc is None:
+                acc = self._totals[supplier] = [doc.get('category'), 0.0, 0, 0.0, 0, 0.0, 0, 0]
+            for field, (sum_slot, count_slot) in METRIC_FIELDS.items():
+                value = doc.get(field)
+                if _is_number(value):
+                    acc[sum_slot] += value
+                    acc[count_slot] += 1
+            acc[7] += 1
+            changed.add(supplier)
+
+        floor = _overlap_floor(self._watermark, self.overlap_seconds)
+        self._recent_ids = {i for i in self._recent_ids if floor is not None and i >= floor}
+        return changed
+
+    def _aggregate_row(self, supplier):
+        acc = self._totals[supplier]
+        return {
+            '_id': supplier,
+            'category': acc[0],
+            'avgDelay': _avg(acc[1], acc[2]),
+            'qualityRej': _avg(acc[3], acc[4]),
+            'fulfillPct': _avg(acc[5], acc[6]),
+            'orderCount': acc[7],
+        }
+
+    def _publish(self, rescored=True):
+        now = datetime.utcnow().isoformat() + 'Z'
+        if rescored or self._view is None:
+            scores = sorted(self._scores.values(), key=lambda x: x['overallRiskScore'], reverse=True)
+            kpis = compute_supplier_kpis(scores)
+            scores_json = json.dumps(scores)
+        else:
+            scores, kpis, scores_json = self._view.scores, self._view.kpis, self._view.scores_json
+        self._view = SnapshotView(
+            scores=scores,
+            scores_json=scores_json,
+            kpis=kpis,
+            dashboard_json='{"scores": %s, "kpis": %s, "asOf": %s}' % (
+                scores_json, json.dumps(kpis), json.dumps(now)),
+            as_of=now,
+            refreshed_at=time.time(),
+            watermark=self._watermark,
+        )
+
+    def _persist(self, db, rows, prune=False):
+        """Write-through to supplier_risk_scores; failures never block the in-memory snapshot."""
+        try:
+            ops = []
+            for row in rows:
+                aggregate = self._aggregate_row(row['supplierName'])
+                doc = dict(row)
+                doc.update({
+                    'avgDelay': aggregate['avgDelay'],
+                    'qualityRej': aggregate['qualityRej'],
+                    'fulfillPct': aggregate['fulfillPct'],
+                    'orderCount': aggregate['orderCount'],
+                })
+                ops.append(UpdateOne({'_id': row['supplierName']}, {'$set': doc}, upsert=True))
+            collection = db[SCORES_COLLECTION]
+            if ops:
+                collection.bulk_write(ops, ordered=False)
+            if prune:
+                collection.delete_many({'_id': {'$nin': list(self._totals)}})
+        except Exception as e:
+            self.last_error = f"persist: {e}"
+
+    # ── Background refresher ──────────────────────────────────────────
+
+    def _ensure_refresher(self):
+        # Started lazily so each forked gunicorn worker runs its own
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="supplier-risk-refresher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the last good snapshot
+                self.last_error = str(e)
+                traceback.print_exc()
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_snapshot(mongo_uri, db_name='sangrahak'):
+    """Process-wide SupplierRiskSnapshot for a database."""
+    key = (mongo_uri, db_name)
+    snapshot = _snapshots.get(key)
+    if snapshot is None:
+        with _snapshots_lock:
+            snapshot = _snapshots.setdefault(key, SupplierRiskSnapshot(mongo_uri, db_name))
+    return snapshot
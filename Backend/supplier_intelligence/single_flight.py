@@ -0,0 +1,43 @@
+"""
+Request coalescing: concurrent calls with the same key share one execution.
+
+The first caller for a key runs the function; callers arriving while it is
+in flight block on the same Future and receive its result (or exception)
+instead of repeating the Mongo aggregation and model inference.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future.result()
+
+    def stats(self):
+        return {"executions": self.executions, "shared": self.shared, "in_flight": len(self._inflight)}
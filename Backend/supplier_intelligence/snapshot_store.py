@@ -0,0 +1,195 @@
+"""
+Read path for the per-supplier risk history in `supplier_risk_snapshots`.
+
+- ensure_indexes() creates the (supplierName, date) compound index and checks
+  that it is present; history queries hint it once verified, so a lookup is an
+  index range scan no matter how many years of snapshots are stored.  The
+  first history() call in each process runs it, so nothing connects to
+  MongoDB before gunicorn forks.
+- Only the charted fields are projected.
+- Long windows are downsampled server-side: snapshots are grouped into daily
+  or weekly buckets with $dateTrunc and averaged, so the response size depends
+  on the window and bucket, not on how often snapshots were written.
+  Servers without $dateTrunc (MongoDB < 5.0) get the same buckets computed
+  from the projected documents.
+- The database comes from the URI when it names one (see mongo_manager).
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+try:
+    from .mongo_manager import get_database
+except ImportError:
+    from mongo_manager import get_database
+
+HISTORY_COLLECTION = "supplier_risk_snapshots"
+HISTORY_INDEX = [("supplierName", ASCENDING), ("date", ASCENDING)]
+HISTORY_INDEX_NAME = "supplierName_1_date_1"
+HISTORY_FIELDS = ("delay", "qualityRisk", "fulfillment", "overallScore")
+HISTORY_PROJECTION = {"_id": 0, "date": 1, **{field: 1 for field in HISTORY_FIELDS}}
+
+DEFAULT_DAYS = 45
+MAX_DAYS = int(os.getenv("SUPPLIER_HISTORY_MAX_DAYS", "3650"))
+# bucket='auto': raw snapshots up to RAW_DAYS, daily buckets up to DAILY_DAYS, weekly beyond
+RAW_DAYS = int(os.getenv("SUPPLIER_HISTORY_RAW_DAYS", "90"))
+DAILY_DAYS = int(os.getenv("SUPPLIER_HISTORY_DAILY_DAYS", "365"))
+
+BUCKETS = ("auto", "raw", "day", "week")
+
+
+def resolve_bucket(days, bucket="auto"):
+    """Concrete bucket ('raw', 'day' or 'week') for a window of `days`."""
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    if bucket != "auto":
+        return bucket
+    if days <= RAW_DAYS:
+        return "raw"
+    return "day" if days <= DAILY_DAYS else "week"
+
+
+def _bucket_pipeline(supplier_name, cutoff, unit):
+    trunc = {"date": "$date", "unit": unit}
+    if unit == "week":
+        trunc["startOfWeek"] = "monday"
+    return [
+        {"$match": {"supplierName": supplier_name, "date": {"$gte": cutoff}}},
+        {"$group": {
+            "_id": {"$dateTrunc": trunc},
+            **{field: {"$avg": f"${field}"} for field in HISTORY_FIELDS},
+            "samples": {"$sum": 1},
+        }},
+        {"$sort": {"_id": 1}},
+        {"$project": {
+            "_id": 0,
+            "date": "$_id",
+            **{field: {"$round": [f"${field}", 2]} for field in HISTORY_FIELDS},
+            "samples": 1,
+        }},
+    ]
+
+
+def _bucket_locally(docs, unit):
+    """The $dateTrunc buckets computed in pandas (pre-5.0 servers)."""
+    if not docs:
+        return []
+    df = pd.DataFrame(docs, columns=["date", *HISTORY_FIELDS])
+    df[list(HISTORY_FIELDS)] = df[list(HISTORY_FIELDS)].apply(pd.to_numeric, errors="coerce")
+    if unit == "week":
+        key = df["date"].dt.to_period("W-SUN").dt.start_time
+    else:
+        key = df["date"].dt.floor("D")
+    grouped = df.groupby(key)
+    out = grouped[list(HISTORY_FIELDS)].mean().round(2)
+    out["samples"] = grouped.size()
+    out = out.astype(object).where(out.notna(), None)
+    return [
+        {"date": date.to_pydatetime(), **row}
+        for date, row in zip(out.index, out.to_dict("records"))
+    ]
+
+
+class SnapshotStore:
+    def __init__(self, mongo_uri, db_name="sangrahak"):
+        self.mongo_uri = mongo_uri
+        self.db_name = db_name
+        self._lock = threading.Lock()
+        self.index_checked = False
+        self.index_verified = False
+        self.index_error = None
+        self.supports_date_trunc = True
+
+    @property
+    def collection(self):
+        return get_database(self.mongo_uri, default_name=self.db_name)[HISTORY_COLLECTION]
+
+    def ensure_indexes(self):
+        """Create the (supplierName, date) index if needed and verify it exists."""
+        with self._lock:
+            self.index_checked = True
+            try:
+                collection = self.collection
+                collection.create_index(HISTORY_INDEX, name=HISTORY_INDEX_NAME)
+                wanted = [(field, direction) for field, direction in HISTORY_INDEX]
+                self.index_verified = any(
+                    [tuple(k) for k in spec["key"][:len(wanted)]] == wanted
+                    for spec in collection.index_information().values()
+                )
+                self.index_error = None if self.index_verified else "index not found after create_index"
+            except Exception as e:
+                self.index_verified = False
+                self.index_error = str(e)
+        return self.index_verified
+
+    def history(self, supplier_name, days=DEFAULT_DAYS, bucket="auto", now=None):
+        """
+        Risk trend for one supplier over the last `days` days, oldest first.
+
+        Returns:
+            [{date, delay, qualityRisk, fulfillment, overallScore}, ...]; bucketed
+            rows are averages and also carry 'samples'
+        """
+        days = max(1, min(int(days), MAX_DAYS))
+        unit = resolve_bucket(days, bucket)
+        cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+
+        if not self.index_checked:
+            self.ensure_indexes()
+        try:
+            return self._query(supplier_name, cutoff, unit, hint=self.index_verified)
+        except OperationFailure:
+            if not self.index_verified:
+                raise
+            # Index dropped since startup: recreate it and answer without the hint
+            self.ensure_indexes()
+            return self._query(supplier_name, cutoff, unit, hint=False)
+
+    def _query(self, supplier_name, cutoff, unit, hint):
+        collection = self.collection
+        options = {"hint": HISTORY_INDEX} if hint else {}
+
+        if unit != "raw" and self.supports_date_trunc:
+            try:
+                return list(collection.aggregate(_bucket_pipeline(supplier_name, cutoff, unit), **options))
+            except OperationFailure as e:
+                # 168 InvalidPipelineOperator / 15952 unknown group operator: no $dateTrunc
+                if e.code not in (168, 15952, 31325):
+                    raise
+                self.supports_date_trunc = False
+
+        cursor = collection.find(
+            {"supplierName": supplier_name, "date": {"$gte": cutoff}},
+            HISTORY_PROJECTION,
+        ).sort("date", 1)
+        if hint:
+            cursor = cursor.hint(HISTORY_INDEX)
+        docs = list(cursor)
+        return docs if unit == "raw" else _bucket_locally(docs, unit)
+
+    def stats(self):
+        return {
+            "index": HISTORY_INDEX_NAME,
+            "index_verified": self.index_verified,
+            "index_error": self.index_error,
+            "server_side_buckets": self.supports_date_trunc,
+        }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_snapshot_store(mongo_uri, db_name="sangrahak"):
+    """Process-wide SnapshotStore for a database."""
+    key = (mongo_uri, db_name)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(key, SnapshotStore(mongo_uri, db_name))
+    return store
@@ -1,51 +1,219 @@
 import pandas as pd
 import numpy as np
 import os
+import tempfile
 
-def load_supplier_data(file_path="supplier_transactions.csv"):
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Data file not found at {file_path}")
-    
-    df = pd.read_csv(file_path)
-    
+try:
+    import pyarrow  # noqa: F401  (Parquet engine)
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DATA_PATH = os.path.join(DATA_DIR, "supplier_transactions.csv")
+PROCESSED_CSV_PATH = os.path.join(DATA_DIR, "processed_supplier_data.csv")
+PROCESSED_PARQUET_PATH = os.path.join(DATA_DIR, "processed_supplier_data.parquet")
+
+# Rows per read_csv chunk; only one chunk of raw text is held at a time.
+# Processing then holds one supplier's rows at a time (see _supplier_frames).
+CHUNK_SIZE = int(os.getenv("SUPPLIER_LOADER_CHUNK_SIZE", "250000"))
+
+# Compact dtypes for the raw export (dates are parsed separately)
+RAW_DTYPES = {
+    "order_id": "string",
+    "supplier": "category",
+    "category": "category",
+    "ordered_qty": "int32",
+    "delivered_qty": "int32",
+    "rejected_qty": "int32",
+    "actual_price": "float64",
+    "complaints": "int16",
+    "payment_status": "category",
+}
+DATE_COLUMNS = ["order_date", "promised_date", "actual_date"]
+CATEGORICAL_COLUMNS = ["supplier", "category", "payment_status"]
+
+# Simple mapping: On-Time=0, Under Review=1, Delayed=2
+PAYMENT_RISK = {"On-Time": 0, "Under Review": 1, "Delayed": 2}
+
+
+def _row_features(chunk):
+    """Per-row derived features; all vectorized, no Python call per row."""
     # Convert dates
-    df['order_date'] = pd.to_datetime(df['order_date'])
-    df['promised_date'] = pd.to_datetime(df['promised_date'])
-    df['actual_date'] = pd.to_datetime(df['actual_date'])
-    
-    # Compute derived features
+    for col in DATE_COLUMNS:
+        chunk[col] = pd.to_datetime(chunk[col])
+
     # 1. Delay Days
-    df['delay_days'] = (df['actual_date'] - df['promised_date']).dt.days
-    
+    chunk['delay_days'] = (chunk['actual_date'] - chunk['promised_date']).dt.days
+
     # 2. Fulfillment Ratio
-    df['fulfillment_ratio'] = df['delivered_qty'] / df['ordered_qty']
-    
+    chunk['fulfillment_ratio'] = chunk['delivered_qty'] / chunk['ordered_qty']
+
     # 3. Rejection Ratio
-    df['rejection_ratio'] = df['rejected_qty'] / df.apply(lambda x: max(x['delivered_qty'], 1), axis=1)
-    
+    chunk['rejection_ratio'] = chunk['rejected_qty'] / np.maximum(chunk['delivered_qty'], 1)
+
     # 4. Price Deviation
-    df['price_deviation'] = (df['actual_price'] - df['base_price']) / df['base_price']
-    
+    chunk['price_deviation'] = (chunk['actual_price'] - chunk['base_price']) / chunk['base_price']
+    return chunk
+
+
+def _common_dtype(a, b):
+    # int64 in one chunk and float64 (missing dates) in another -> float64
+    if a == b or not (isinstance(a, np.dtype) and isinstance(b, np.dtype)):
+        return a
+    return np.result_type(a, b)
+
+
+def _spill_partitions(file_path, chunksize, spill_dir):
+    """
+    Pass 1: derive the per-row features chunk by chunk and spill each chunk's
+    rows into per-supplier pickles, so no more than one chunk is in memory.
+
+    Returns (supplier (None for rows without one) -> spill paths in file order, categories per categorical
+    column, unified dtype per column, whether every payment_status is known).
+    """
+    parts = {}
+    categories = {col: set() for col in CATEGORICAL_COLUMNS}
+    dtypes = {}
+    payment_known = True
+    spilled = 0
+
+    reader = pd.read_csv(file_path, dtype=RAW_DTYPES, chunksize=chunksize)
+    for chunk in reader:
+        chunk = _row_features(chunk)
+        for col in CATEGORICAL_COLUMNS:
+            categories[col].update(chunk[col].cat.categories)
+        for col, dtype in chunk.dtypes.items():
+            dtypes[col] = _common_dtype(dtypes[col], dtype) if col in dtypes else dtype
+        payment_known = payment_known and chunk['payment_status'].map(PAYMENT_RISK).notna().all()
+
+        for supplier, rows in chunk.groupby('supplier', observed=True, sort=False, dropna=False):
+            path = os.path.join(spill_dir, f"{spilled}.pkl")
+            rows.to_pickle(path)
+            spilled += 1
+            parts.setdefault(None if pd.isna(supplier) else supplier, []).append(path)
+    return parts, categories, dtypes, payment_known
+
+
+def _supplier_features(rows, supplier_known=True, payment_known=True):
+    """Pass 2: features that need a supplier's full history, in order_date order."""
+    rows = rows.sort_values('order_date', kind='stable').reset_index(drop=True)
+
     # 5. Delay Trend (rolling mean of delays per supplier)
-    df = df.sort_values(['supplier', 'order_date'])
-    df['delay_trend'] = df.groupby('supplier')['delay_days'].transform(lambda x: x.rolling(window=3, min_periods=1).mean())
-    
     # 6. Complaint Frequency
-    df['complaint_frequency'] = df.groupby('supplier')['complaints'].transform(lambda x: x.rolling(window=5, min_periods=1).sum())
-    
+    if supplier_known:
+        rows['delay_trend'] = rows['delay_days'].rolling(window=3, min_periods=1).mean()
+        rows['complaint_frequency'] = rows['complaints'].rolling(window=5, min_periods=1).sum()
+    else:
+        # Rows without a supplier have no history to roll over
+        rows['delay_trend'] = np.nan
+        rows['complaint_frequency'] = np.nan
+
     # 7. Payment Risk
-    # Simple mapping: On-Time=0, Under Review=1, Delayed=2
-    risk_map = {"On-Time": 0, "Under Review": 1, "Delayed": 2}
-    df['payment_risk'] = df['payment_status'].map(risk_map)
-    
-    return df
+    rows['payment_risk'] = rows['payment_status'].map(PAYMENT_RISK).astype("float64")
+    if payment_known:
+        rows['payment_risk'] = rows['payment_risk'].astype("int8")
+    return rows
+
+
+def _supplier_frames(file_path=RAW_DATA_PATH, chunksize=CHUNK_SIZE):
+    """
+    Yield the processed data one supplier at a time, suppliers in alphabetical
+    order (rows without a supplier last), each sorted by order_date.
+
+    Peak memory is one raw chunk while spilling, then the largest supplier's
+    rows, instead of the whole export.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Data file not found at {file_path}")
+
+    with tempfile.TemporaryDirectory(prefix="supplier_spill_") as spill_dir:
+        parts, categories, dtypes, payment_known = _spill_partitions(file_path, chunksize, spill_dir)
+
+        # Every frame gets the same dtypes so they can be appended to one file
+        final_dtypes = dict(dtypes)
+        for col in CATEGORICAL_COLUMNS:
+            final_dtypes[col] = pd.CategoricalDtype(sorted(categories[col]))
+
+        if not parts:
+            # Header-only export
+            empty = _row_features(pd.read_csv(file_path, dtype=RAW_DTYPES))
+            if final_dtypes:
+                empty = empty.astype(final_dtypes)
+            yield _supplier_features(empty)
+            return
+
+        suppliers = sorted(s for s in parts if s is not None)
+        if None in parts:
+            suppliers.append(None)
+        for supplier in suppliers:
+            rows = pd.concat([pd.read_pickle(path) for path in parts.pop(supplier)], ignore_index=True)
+            yield _supplier_features(rows.astype(final_dtypes),
+                                     supplier_known=supplier is not None,
+                                     payment_known=payment_known)
+
+
+def process_supplier_data(file_path=RAW_DATA_PATH, path=PROCESSED_PARQUET_PATH, chunksize=CHUNK_SIZE):
+    """
+    Process the raw export straight to disk without materializing it: each
+    supplier's rows are appended through a ParquetWriter (or to the CSV when
+    no Parquet engine is installed).  Returns the path written.
+    """
+    frames = _supplier_frames(file_path, chunksize)
+    if HAS_PARQUET and path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for frame in frames:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return path
+
+    path = os.path.splitext(path)[0] + ".csv"
+    for i, frame in enumerate(frames):
+        frame.to_csv(path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+    return path
+
+
+def load_supplier_data(file_path=RAW_DATA_PATH, chunksize=CHUNK_SIZE):
+    """The processed data as one in-memory DataFrame (process_supplier_data streams it to disk instead)."""
+    return pd.concat(list(_supplier_frames(file_path, chunksize)), ignore_index=True)
+
+
+def save_processed_data(df, path=PROCESSED_PARQUET_PATH):
+    """Write typed Parquet (CSV only when no Parquet engine is installed). Returns the path written."""
+    if HAS_PARQUET and path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+        return path
+    path = os.path.splitext(path)[0] + ".csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def read_processed_supplier_data(path=None):
+    """Processed supplier data, preferring the typed Parquet file over the CSV."""
+    if path is None:
+        if HAS_PARQUET and os.path.exists(PROCESSED_PARQUET_PATH):
+            path = PROCESSED_PARQUET_PATH
+        else:
+            path = PROCESSED_CSV_PATH
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
 
 if __name__ == "__main__":
     # Test loading
     try:
-        data = load_supplier_data("d:/Major/AI-Based-Inevtnory-Control-and-Depot-Management/Backend/supplier_intelligence/supplier_transactions.csv")
+        path = process_supplier_data(RAW_DATA_PATH)
         print("Data loaded and processed successfully.")
-        print(data.head())
-        data.to_csv("d:/Major/AI-Based-Inevtnory-Control-and-Depot-Management/Backend/supplier_intelligence/processed_supplier_data.csv", index=False)
+        print(f"Saved to {path}")
     except Exception as e:
         print(f"Error: {e}")
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
-import pandas as pd
-import os
+
+try:
+    from .columnar_cache import get_supplier_cache
+except ImportError:
+    from columnar_cache import get_supplier_cache
 
 supplier_routes = Blueprint('supplier_routes', __name__)
 
@@ -16,31 +19,21 @@ def init_db(database):
 
 # ─── HELPER: Compute risk metrics from MongoDB product records ────────────────
 
-def _compute_risk_from_products(products):
+def _risk_metrics(total, out_of_stock, understocked, lead_sum, top_category):
     """
-    Derives supplier risk metrics entirely from the live MongoDB products
-    collection.  No fake CSV data is needed.
-
-    Fields used from each product document:
-      stock        – current total stock
-      reorderPoint – trigger level below which stock is "understocked"
-      leadTime     – how many days this supplier takes to deliver (delay proxy)
-      status       – 'out-of-stock' | 'low-stock' | 'in-stock' | 'overstock'
-      category     – product category
+    Turns per-supplier product counters into the risk payload.
+
+      total        – number of products
+      out_of_stock – products with stock == 0 (or missing)
+      understocked – products with stock < reorderPoint
+      lead_sum     – sum of leadTime (7 days when missing), a delivery delay proxy
+      top_category – most common category among this supplier's products
     """
-    total = len(products)
     if total == 0:
         return None
 
-    out_of_stock  = sum(1 for p in products if (p.get('stock') or 0) == 0)
-    low_stock     = sum(1 for p in products if p.get('status') == 'low-stock')
-    understocked  = sum(
-        1 for p in products
-        if (p.get('stock') or 0) < (p.get('reorderPoint') or 0)
-    )
-
     # avg_delay:  use leadTime as a direct proxy for supplier delivery delay
-    avg_lead = sum(p.get('leadTime') or 7 for p in products) / total
+    avg_lead = lead_sum / total
 
     # avg_fulfillment:  % of products that are adequately stocked
     adequately_stocked = total - understocked
@@ -66,21 +59,52 @@ def _compute_risk_from_products(products):
     else:
         risk_level = 'Low'
 
-    # Most common category among this supplier's products
-    cats = [p.get('category', 'General') for p in products if p.get('category')]
-    top_category = max(set(cats), key=cats.count) if cats else 'General'
-
     return {
         "avg_delay":       round(avg_lead, 1),
         "avg_fulfillment": fulfillment_pct,
         "avg_rejection":   rejection_pct,
         "risk_score":      risk_score,
         "risk_level":      risk_level,
-        "category":        top_category,
+        "category":        top_category or 'General',
         "total_products":  total,
     }
 
 
+# Per-supplier counters computed inside MongoDB.  Products are reduced to
+# (supplier, category) groups first, so memory is bounded by the number of
+# supplier/category pairs rather than the size of the catalogue.
+SUPPLIER_METRICS_PIPELINE = [
+    {'$match': {'supplier': {'$type': 'string'}}},
+    {'$project': {
+        '_id': 0,
+        'supplier': {'$trim': {'input': '$supplier'}},
+        'category': {'$cond': [{'$eq': [{'$ifNull': ['$category', '']}, '']}, None, '$category']},
+        'oos':   {'$cond': [{'$eq': [{'$ifNull': ['$stock', 0]}, 0]}, 1, 0]},
+        'under': {'$cond': [{'$lt': [{'$ifNull': ['$stock', 0]}, {'$ifNull': ['$reorderPoint', 0]}]}, 1, 0]},
+        'lead':  {'$cond': [{'$eq': [{'$ifNull': ['$leadTime', 0]}, 0]}, 7, '$leadTime']},
+    }},
+    {'$match': {'supplier': {'$ne': ''}}},
+    {'$group': {
+        '_id':   {'supplier': '$supplier', 'category': '$category'},
+        'count': {'$sum': 1},
+        'oos':   {'$sum': '$oos'},
+        'under': {'$sum': '$under'},
+        'lead':  {'$sum': '$lead'},
+    }},
+    # Rank named categories by product count so $first picks the top one
+    {'$addFields': {'rank': {'$cond': [{'$eq': ['$_id.category', None]}, -1, '$count']}}},
+    {'$sort': {'_id.supplier': 1, 'rank': -1, '_id.category': 1}},
+    {'$group': {
+        '_id':      '$_id.supplier',
+        'category': {'$first': '$_id.category'},
+        'total':    {'$sum': '$count'},
+        'oos':      {'$sum': '$oos'},
+        'under':    {'$sum': '$under'},
+        'lead':     {'$sum': '$lead'},
+    }},
+]
+
+
 # ─── ROUTE: GET /api/supplier/risk-overview ───────────────────────────────────
 
 @supplier_routes.route('/risk-overview', methods=['GET'])
@@ -97,42 +121,25 @@ def risk_overview():
     try:
         # ── 1. Try MongoDB (live, real data) ──────────────────────────────────
         if _db is not None:
-            raw_products = list(_db.products.find(
-                {},
-                {
-                    '_id': 0,
-                    'supplier': 1, 'category': 1,
-                    'stock': 1,  'reorderPoint': 1,
-                    'leadTime': 1, 'status': 1
-                }
-            ))
-
-            # Keep only products that have a named supplier
-            live_products = [p for p in raw_products if p.get('supplier', '').strip()]
-
-            if live_products:
-                # Group by supplier name
-                supplier_map = {}
-                for p in live_products:
-                    name = p['supplier'].strip()
-                    supplier_map.setdefault(name, []).append(p)
-
-                results = []
-                for supplier_name, prods in supplier_map.items():
-                    metrics = _compute_risk_from_products(prods)
-                    if metrics:
-                        results.append({
-                            "supplier":         supplier_name,
-                            "category":         metrics["category"],
-                            "avg_delay":        metrics["avg_delay"],
-                            "avg_fulfillment":  metrics["avg_fulfillment"],
-                            "avg_rejection":    metrics["avg_rejection"],
-                            "risk_score":       metrics["risk_score"],
-                            "risk_level":       metrics["risk_level"],
-                            "total_products":   metrics["total_products"],
-                            "source":           "live"          # handy for debugging
-                        })
+            grouped = _db.products.aggregate(SUPPLIER_METRICS_PIPELINE, allowDiskUse=True)
+
+            results = []
+            for g in grouped:
+                metrics = _risk_metrics(g['total'], g['oos'], g['under'], g['lead'], g['category'])
+                if metrics:
+                    results.append({
+                        "supplier":         g['_id'],
+                        "category":         metrics["category"],
+                        "avg_delay":        metrics["avg_delay"],
+                        "avg_fulfillment":  metrics["avg_fulfillment"],
+                        "avg_rejection":    metrics["avg_rejection"],
+                        "risk_score":       metrics["risk_score"],
+                        "risk_level":       metrics["risk_level"],
+                        "total_products":   metrics["total_products"],
+                        "source":           "live"          # handy for debugging
+                    })
 
+            if results:
                 # Sort highest-risk suppliers to the top
                 results.sort(key=lambda x: x['risk_score'], reverse=True)
 
@@ -143,47 +150,15 @@ def risk_overview():
                 })
 
         # ── 2. Fallback → CSV (in case DB is empty or unavailable) ───────────
-        DATA_PATH = os.path.join(os.path.dirname(__file__), "processed_supplier_data.csv")
-        if not os.path.exists(DATA_PATH):
+        # Served from the columnar cache; the CSV is only re-parsed when it changes
+        cache = get_supplier_cache()
+        if not cache.available():
             return jsonify({
                 "success": False,
                 "error":   "No supplier data available. Add products with supplier names to get started."
             }), 404
 
-        df = pd.read_csv(DATA_PATH)
-        suppliers = df.groupby('supplier').agg({
-            'delay_days':       'mean',
-            'fulfillment_ratio':'mean',
-            'rejection_ratio':  'mean',
-            'category':         'first',
-            'base_price':       'mean',
-            'payment_risk':     'max'
-        }).reset_index()
-
-        results = []
-        for _, row in suppliers.iterrows():
-            delay      = round(row['delay_days'], 1)
-            fulfillment= round(row['fulfillment_ratio'] * 100, 1)
-            rejection  = round(row['rejection_ratio']  * 100, 1)
-            risk_score = min(100, round(
-                (rejection  / 100) * 40 +
-                (max(0, 100 - fulfillment) / 100) * 35 +
-                min(1, delay / 14) * 25
-            ))
-            risk_level = 'High' if risk_score >= 60 else ('Medium' if risk_score >= 30 else 'Low')
-
-            results.append({
-                "supplier":        row['supplier'],
-                "category":        row['category'],
-                "avg_delay":       delay,
-                "avg_fulfillment": fulfillment,
-                "avg_rejection":   rejection,
-                "risk_score":      risk_score,
-                "risk_level":      risk_level,
-                "source":          "csv"
-            })
-
-        results.sort(key=lambda x: x['risk_score'], reverse=True)
+        results = cache.risk_overview()
         return jsonify({"success": True, "suppliers": results, "source": "csv"})
 
     except Exception as e:
@@ -237,22 +212,21 @@ def supplier_history(supplier_name):
                 return jsonify({"success": True, "supplier": supplier_name, "trend": trend, "source": "mongodb"})
 
         # Fallback → CSV
-        DATA_PATH = os.path.join(os.path.dirname(__file__), "processed_supplier_data.csv")
-        if not os.path.exists(DATA_PATH):
+        cache = get_supplier_cache()
+        if not cache.available():
             return jsonify({"success": False, "error": "No data available"}), 404
 
-        df = pd.read_csv(DATA_PATH)
-        history = df[df['supplier'] == supplier_name].sort_values('order_date').tail(10)
+        history = cache.history(supplier_name, limit=10)
 
-        if history.empty:
+        if not history:
             return jsonify({"success": False, "error": "Supplier not found"}), 404
 
-        trend = history.apply(lambda r: {
+        trend = [{
             "date":        r['order_date'],
             "delay":       r['delay_days'],
             "rejection":   round(r['rejection_ratio'] * 100, 2),
             "fulfillment": round(r['fulfillment_ratio'] * 100, 2)
-        }, axis=1).tolist()
+        } for r in history]
 
         return jsonify({"success": True, "supplier": supplier_name, "trend": trend, "source": "csv"})
 
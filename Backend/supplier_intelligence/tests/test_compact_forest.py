@@ -0,0 +1,119 @@
+"""
+Parity of the compact forest export with the sklearn forests it replaces, and
+the registry's fallback when the export is older than the trained models.
+
+Run from Backend/supplier_intelligence:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compact_forest import COMPACT_DIR_NAME, CompactForest, export_models, load_compact_models
+from model_registry import BUNDLE_FILE, ModelRegistry, load_bundle
+
+FEATURES = ['supplier_id', 'category_id', 'ordered_qty', 'base_price', 'payment_risk']
+TARGETS = ['delay', 'quality', 'fulfillment']
+
+
+def _training_data(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        'supplier_id': rng.integers(0, 6, n),
+        'category_id': rng.integers(0, 4, n),
+        'ordered_qty': rng.integers(1, 2000, n),
+        'base_price': rng.uniform(1, 200, n).round(2),
+        'payment_risk': rng.integers(0, 3, n),
+    }, columns=FEATURES)
+    Y = pd.DataFrame({
+        'delay': X['ordered_qty'] / 100 + X['payment_risk'] * 2 + rng.normal(0, 1, n),
+        'quality': X['base_price'] / 1000 + rng.uniform(0, 0.05, n),
+        'fulfillment': 1 - X['supplier_id'] / 20 + rng.normal(0, 0.02, n),
+    })
+    return X, Y
+
+
+def _probe(n=3000, seed=1):
+    # Inside and just outside the training ranges
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'supplier_id': rng.integers(0, 8, n),
+        'category_id': rng.integers(0, 6, n),
+        'ordered_qty': rng.integers(0, 2500, n),
+        'base_price': rng.uniform(0, 250, n).round(2),
+        'payment_risk': rng.integers(0, 4, n),
+    }, columns=FEATURES)
+
+
+def _forest(X, y):
+    return RandomForestRegressor(n_estimators=15, random_state=42).fit(X, y)
+
+
+def _write_bundle(model_dir, multioutput=False, seed=0):
+    X, Y = _training_data(seed=seed)
+    le_supplier = LabelEncoder().fit([f"S{i}" for i in range(6)])
+    le_category = LabelEncoder().fit([f"C{i}" for i in range(4)])
+    bundle = {'version': f"test-{seed}", 'features': FEATURES,
+              'le_supplier': le_supplier, 'le_category': le_category}
+    if multioutput:
+        bundle['multioutput_model'] = _forest(X, Y.to_numpy())
+        bundle['outputs'] = {name: i for i, name in enumerate(TARGETS)}
+    else:
+        bundle['models'] = {name: _forest(X, Y[name]) for name in TARGETS}
+    os.makedirs(model_dir, exist_ok=True)
+    path = os.path.join(model_dir, BUNDLE_FILE)
+    joblib.dump(bundle, path)
+    return path
+
+
+def test_single_output_forest_matches_sklearn():
+    X, Y = _training_data()
+    model = _forest(X, Y['delay'])
+    compact = CompactForest.from_sklearn(model)
+
+    probe = _probe()
+    assert np.array_equal(compact.predict(probe), model.predict(probe))
+
+
+@pytest.mark.parametrize("multioutput", [False, True])
+def test_exported_models_match_bundle(tmp_path, multioutput):
+    bundle_path = _write_bundle(str(tmp_path), multioutput=multioutput)
+    original, _ = load_bundle(bundle_path)
+
+    meta = export_models(original, str(tmp_path / COMPACT_DIR_NAME), version="test-0",
+                         source_paths=[bundle_path])
+    compact, version = load_compact_models(str(tmp_path / COMPACT_DIR_NAME / "meta.json"))
+
+    assert version == "test-0"
+    assert list(meta['sources']) == [BUNDLE_FILE]
+    probe = _probe()
+    for name in TARGETS:
+        expected = original[name]['model'].predict(probe)
+        assert np.array_equal(compact[name]['model'].predict(probe), expected), name
+        assert list(compact[name]['le_supplier'].classes_) == list(original[name]['le_supplier'].classes_)
+
+
+def test_registry_ignores_export_older_than_bundle(tmp_path):
+    model_dir = str(tmp_path)
+    bundle_path = _write_bundle(model_dir, seed=0)
+    original, _ = load_bundle(bundle_path)
+    export_models(original, os.path.join(model_dir, COMPACT_DIR_NAME), version="test-0",
+                  source_paths=[bundle_path])
+
+    registry = ModelRegistry(model_dir, check_interval=0)
+    assert isinstance(registry.require('delay')['model'], CompactForest)
+
+    # Retrain without refreshing the export: the registry must serve the new bundle
+    _write_bundle(model_dir, seed=1)
+    served = registry.require('delay')
+    assert not isinstance(served['model'], CompactForest)
+    assert served['version'] == "test-1"
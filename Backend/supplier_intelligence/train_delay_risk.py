@@ -1,22 +1,18 @@
-import pandas as pd
-import numpy as np
 import pickle
 import os
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
+from supplier_data_loader import PROCESSED_CSV_PATH, PROCESSED_PARQUET_PATH, read_processed_supplier_data
 
 def train_delay_model():
     
-    # Use relative path from current script location
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    data_path = os.path.join(script_dir, "processed_supplier_data.csv")
-    
-    if not os.path.exists(data_path):
+    if not (os.path.exists(PROCESSED_PARQUET_PATH) or os.path.exists(PROCESSED_CSV_PATH)):
         print("Processed data not found. Run loader first.")
         return
 
-    df = pd.read_csv(data_path)
+    # Typed Parquet from the loader when available, otherwise the CSV
+    df = read_processed_supplier_data()
     
     # Feature engineering for ML
     le_supplier = LabelEncoder()
@@ -37,6 +33,7 @@ def train_delay_model():
     model.fit(X_train, y_train)
     
     # Save model and encoders
+    script_dir = os.path.dirname(os.path.abspath(__file__))
     model_dir = os.path.join(script_dir, "models")
     os.makedirs(model_dir, exist_ok=True)
     
@@ -0,0 +1,205 @@
+"""
+Unified trainer for the three supplier risk models.
+
+The processed data is loaded, label-encoded and split once, then the delay,
+quality and fulfillment targets are trained either
+
+  - in parallel as three independent forests (default; identical to the
+    per-target train_*_risk.py scripts), or
+  - as one multi-output forest (--mode multioutput), which shares one set of
+    trees across targets (smaller and faster, but not identical predictions).
+
+Everything is written to a single versioned bundle,
+models/supplier_risk_bundle.joblib, which ModelRegistry loads in one read, and
+the compact export in models/compact/ (compact_forest.py) is regenerated from
+it so the backend never serves forests from an older training run.
+Wall-clock time is reported for each stage.
+
+Usage:
+    python train_risk_models.py [--mode parallel|multioutput] [--n-jobs N] [--legacy-pickles]
+"""
+
+import argparse
+import hashlib
+import os
+import pickle
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import joblib
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from supplier_data_loader import PROCESSED_CSV_PATH, PROCESSED_PARQUET_PATH, read_processed_supplier_data
+from model_registry import MODEL_DIR, MODEL_FILES, BUNDLE_FILE, load_bundle
+from compact_forest import COMPACT_DIR_NAME, export_models
+
+FEATURES = ['supplier_id', 'category_id', 'ordered_qty', 'base_price', 'payment_risk']
+
+# Registry name -> training target column
+TARGETS = {
+    'delay': 'delay_days',
+    'quality': 'rejection_ratio',
+    'fulfillment': 'fulfillment_ratio',
+}
+
+N_ESTIMATORS = 100
+RANDOM_STATE = 42
+
+
+class StageTimer:
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        self.timings[name] = round(elapsed, 3)
+        print(f"   {name:<12} {elapsed:>8.2f}s")
+
+
+def _fit_forest(X, y, n_jobs=1):
+    model = RandomForestRegressor(n_estimators=N_ESTIMATORS, random_state=RANDOM_STATE, n_jobs=n_jobs)
+    model.fit(X, y)
+    return model
+
+
+def _data_version(df):
+    """Timestamp plus a short hash of the training data."""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha256(row_hashes.tobytes()).hexdigest()[:8]
+    return f"{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}-{digest}"
+
+
+def train_risk_models(mode='parallel', n_jobs=-1, model_dir=MODEL_DIR, legacy_pickles=False):
+    """
+    Train all three targets and write the bundle.
+
+    Returns:
+        The bundle dict (also saved to model_dir/supplier_risk_bundle.joblib)
+    """
+    timer = StageTimer()
+    total_start = time.perf_counter()
+
+    with timer.stage("load"):
+        if not (os.path.exists(PROCESSED_PARQUET_PATH) or os.path.exists(PROCESSED_CSV_PATH)):
+            raise FileNotFoundError("Processed data not found. Run supplier_data_loader.py first.")
+        df = read_processed_supplier_data()
+
+    with timer.stage("encode"):
+        le_supplier = LabelEncoder()
+        le_category = LabelEncoder()
+        df['supplier_id'] = le_supplier.fit_transform(df['supplier'])
+        df['category_id'] = le_category.fit_transform(df['category'])
+        X = df[FEATURES]
+        Y = df[list(TARGETS.values())]
+
+    with timer.stage("split"):
+        X_train, X_test, Y_train, Y_test = train_test_split(X, Y, test_size=0.2, random_state=RANDOM_STATE)
+
+    metrics = {}
+    with timer.stage("train"):
+        if mode == 'multioutput':
+            shared = _fit_forest(X_train, Y_train.to_numpy(), n_jobs=n_jobs)
+            models = None
+        else:
+            # One worker per target; each forest is the same as the per-target scripts produce
+            # n_jobs follows joblib: N > 0 workers, -1 all CPUs, -2 all but one, ...
+            cpus = os.cpu_count() or 1
+            requested = n_jobs if n_jobs > 0 else max(1, cpus + 1 + n_jobs)
+            workers = min(requested, len(TARGETS))
+            fitted = Parallel(n_jobs=workers)(
+                delayed(_fit_forest)(X_train, Y_train[target]) for target in TARGETS.values()
+            )
+            models = dict(zip(TARGETS, fitted))
+
+    with timer.stage("evaluate"):
+        if models is None:
+            predictions = shared.predict(X_test)
+            for i, (name, target) in enumerate(TARGETS.items()):
+                metrics[name] = {'r2_holdout': round(float(r2_score(Y_test[target], predictions[:, i])), 4)}
+        else:
+            for name, target in TARGETS.items():
+                predictions = models[name].predict(X_test)
+                metrics[name] = {'r2_holdout': round(float(r2_score(Y_test[target], predictions)), 4)}
+
+    bundle = {
+        'format': 'supplier_risk_bundle',
+        'format_version': 1,
+        'version': _data_version(df[FEATURES + list(TARGETS.values())]),
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'mode': mode,
+        'features': FEATURES,
+        'targets': dict(TARGETS),
+        'le_supplier': le_supplier,
+        'le_category': le_category,
+        'training_rows': int(len(X_train)),
+        'metrics': metrics,
+    }
+    if models is None:
+        bundle['multioutput_model'] = shared
+        bundle['outputs'] = {name: i for i, name in enumerate(TARGETS)}
+    else:
+        bundle['models'] = models
+
+    with timer.stage("save"):
+        os.makedirs(model_dir, exist_ok=True)
+        bundle['timings'] = dict(timer.timings)
+        # Uncompressed so the registry can memory-map the tree arrays
+        tmp_path = os.path.join(model_dir, BUNDLE_FILE + ".tmp")
+        joblib.dump(bundle, tmp_path)
+        os.replace(tmp_path, os.path.join(model_dir, BUNDLE_FILE))
+
+        if legacy_pickles and models is not None:
+            for name, model in models.items():
+                with open(os.path.join(model_dir, MODEL_FILES[name]), "wb") as f:
+                    pickle.dump({
+                        "model": model,
+                        "le_supplier": le_supplier,
+                        "le_category": le_category,
+                        "features": FEATURES
+                    }, f)
+
+    with timer.stage("compact"):
+        bundle_path = os.path.join(model_dir, BUNDLE_FILE)
+        model_dicts, _ = load_bundle(bundle_path)
+        export_models(model_dicts, os.path.join(model_dir, COMPACT_DIR_NAME),
+                      version=bundle['version'], source_paths=[bundle_path])
+
+    bundle['timings'] = dict(timer.timings, total=round(time.perf_counter() - total_start, 3))
+    return bundle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train all supplier risk models into one bundle")
+    parser.add_argument("--mode", choices=["parallel", "multioutput"], default="parallel")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Parallel workers (1 = sequential)")
+    parser.add_argument("--legacy-pickles", action="store_true",
+                        help="Also write the per-model .pkl files")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print(f" TRAINING SUPPLIER RISK MODELS ({args.mode})")
+    print("=" * 60)
+    bundle = train_risk_models(mode=args.mode, n_jobs=args.n_jobs, legacy_pickles=args.legacy_pickles)
+
+    print("-" * 60)
+    print(f"   {'total':<12} {bundle['timings']['total']:>8.2f}s")
+    for name, m in bundle['metrics'].items():
+        print(f"   {name:<12} R² (holdout) = {m['r2_holdout']}")
+    print(f"\n Bundle {bundle['version']} saved to: {os.path.join(MODEL_DIR, BUNDLE_FILE)}")
+    return bundle
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ Verification script to test all 3 supplier risk models
 """
 import os
 from risk_score_engine import RiskScoreEngine
+from model_registry import MODEL_DIR
 
 def verify_models():
     print("=" * 60)
@@ -10,7 +11,7 @@ def verify_models():
     print("=" * 60)
     
     # Check if model files exist
-    models_dir = "d:/Major/Backend/supplier_intelligence/models"
+    models_dir = MODEL_DIR
     required_models = [
         "delay_risk_model.pkl",
         "quality_risk_model.pkl",